@@ -0,0 +1,90 @@
+"""
+Scaling benchmark for MetaTracker.track_concurrent
+
+Tracks the same set of new files with 1 to 16 workers, in thread and process mode, against a file
+backed SQLite database in WAL mode (or any database given with --db-url, e.g. a local
+PostgreSQL), and reports files per second. Everything runs offline with a stub science file
+parser.
+
+Usage:
+    python -m benchmarks.bench_concurrent [--files 5000] [--workers 1 2 4 8 16] [--db-url URL]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import event
+
+from benchmarks.utils import stub_science_file_parser, synthetic_filename
+from metatracker.database import create_engine
+from metatracker.database.tables import create_tables
+from metatracker.database.tables.base_table import Base
+from metatracker.tracker.tracker import MetaTracker
+
+MODES = ["thread", "process"]
+
+
+def enable_wal(engine: type) -> None:
+    """Put every SQLite connection of the engine in WAL mode"""
+
+    @event.listens_for(engine, "connect")
+    def set_journal_mode(dbapi_connection: type, connection_record: type) -> None:
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+        dbapi_connection.execute("PRAGMA synchronous=NORMAL")
+
+
+def run_benchmark(db_url: str, files: list, workers: int, mode: str) -> dict:
+    """Time track_concurrent() of files on an empty catalog"""
+
+    engine = create_engine(db_url, pool_size=workers + 1)
+    if engine.dialect.name == "sqlite":
+        enable_wal(engine)
+    Base.metadata.drop_all(engine)
+    create_tables(engine)
+
+    tracker = MetaTracker(engine, stub_science_file_parser)
+    items = [(file, f"s3://bench/{file.name}", "bench", {"processing_status": "SUCCESS"}) for file in files]
+
+    start = time.perf_counter()
+    results = tracker.track_concurrent(items, workers=workers, mode=mode)
+    seconds = time.perf_counter() - start
+
+    errors = sum(result["error"] is not None for result in results)
+    tracker.close()
+    engine.dispose()
+
+    return {"mode": mode, "workers": workers, "seconds": seconds, "per_second": len(files) / seconds, "errors": errors}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--db-url", help="Database to benchmark against, defaults to a SQLite file in WAL mode")
+    args = parser.parse_args()
+
+    print(f"{'mode':>8} {'workers':>8} {'seconds':>8} {'files/s':>9} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        db_url = args.db_url or f"sqlite:///{directory / 'bench.db'}"
+
+        files = []
+        for seconds in range(args.files):
+            file = directory / synthetic_filename(seconds)
+            file.write_text("Test")
+            files.append(file)
+
+        for mode in args.modes:
+            for workers in args.workers:
+                result = run_benchmark(db_url, files, workers, mode)
+                print(
+                    f"{result['mode']:>8} {result['workers']:>8} {result['seconds']:>8.2f}"
+                    f" {result['per_second']:>9.1f} {result['errors']:>7}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark exporting the catalog with metatracker.export
+
+Seeds a file backed SQLite database with a catalog of 1M / 10M files, then exports it to
+gzipped NDJSON, CSV and (when pyarrow is installed) Parquet, reporting the throughput, the size
+of the file and how much the peak memory of the process grew during the export.
+
+Usage:
+    python -m benchmarks.bench_export [--sizes 1000000 10000000] [--batch-size 10000]
+"""
+
+import argparse
+import importlib.util
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.utils import seed_catalog
+from metatracker.database import create_engine
+from metatracker.database.tables import create_tables
+from metatracker.export import export_catalog
+
+FILENAMES = ["catalog.ndjson.gz", "catalog.csv.gz", "catalog.parquet"]
+
+
+def peak_memory_mb() -> float:
+    """Peak resident memory of the process so far (Linux reports kilobytes)"""
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_benchmark(directory: Path, amount_of_files: int, batch_size: int) -> list:
+    """Time export_catalog() to every format"""
+
+    engine = create_engine(f"sqlite:///{directory / f'bench_{amount_of_files}.db'}")
+    create_tables(engine)
+    seed_catalog(engine, amount_of_files)
+
+    results = []
+    for filename in FILENAMES:
+        if filename.endswith(".parquet") and importlib.util.find_spec("pyarrow") is None:
+            continue
+
+        path = directory / f"{amount_of_files}_{filename}"
+        peak_before = peak_memory_mb()
+        start = time.perf_counter()
+        written = export_catalog(engine, path, batch_size=batch_size)
+        seconds = time.perf_counter() - start
+        assert written == amount_of_files
+
+        results.append(
+            {
+                "files": amount_of_files,
+                "format": filename.split(".", 1)[1],
+                "seconds": seconds,
+                "rows_per_second": written / seconds,
+                "size_mb": path.stat().st_size / 1024 / 1024,
+                "peak_growth_mb": peak_memory_mb() - peak_before,
+            }
+        )
+        path.unlink()
+
+    engine.dispose()
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000000, 10000000])
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'files':>10} {'format':>10} {'seconds':>9} {'rows/s':>10} {'size (MB)':>10} {'peak +MB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for amount_of_files in args.sizes:
+            for result in run_benchmark(Path(directory), amount_of_files, args.batch_size):
+                print(
+                    f"{result['files']:>10} {result['format']:>10} {result['seconds']:>9.1f}"
+                    f" {result['rows_per_second']:>10.0f} {result['size_mb']:>10.1f} {result['peak_growth_mb']:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
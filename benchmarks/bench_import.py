@@ -0,0 +1,106 @@
+"""
+Benchmark the cold import of metatracker.tracker.tracker
+
+Imports the module in fresh interpreters with ``python -X importtime`` and reports the
+cumulative import time of the module and its slowest direct dependencies. Exits with status 1
+when the median import time is over the budget, or when modules that should only be loaded on
+first use (the ORM, dialects other than the one in use, the process pool) are imported.
+
+Usage:
+    python -m benchmarks.bench_import [--runs 10] [--budget-ms 500]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+MODULE = "metatracker.tracker.tracker"
+
+# Modules that are loaded when the first tracker is created (or never), not on import
+DEFERRED_MODULES = [
+    "sqlalchemy.orm",
+    "sqlalchemy.dialects.mysql",
+    "sqlalchemy.dialects.postgresql",
+    "concurrent.futures.process",
+]
+
+
+def import_times(module: str) -> tuple:
+    """Import a module in a fresh interpreter
+    ({imported module: cumulative microseconds}, [direct dependencies], [deferred modules that were imported])
+    """
+
+    check = f"import sys; print(' '.join(name for name in {DEFERRED_MODULES!r} if name in sys.modules))"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}; {check}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    dependencies = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            # Header line
+            continue
+
+        # Drop the space after the separator, leaving the indentation
+        name = name[1:]
+
+        times[name.strip()] = int(cumulative)
+        # Modules are listed after their dependencies, which are indented by two more spaces
+        if not name.startswith("  "):
+            if name.strip() == module:
+                break
+            # Another top level import (e.g. site), drop its dependencies
+            dependencies = []
+        elif not name.startswith("   "):
+            dependencies.append(name.strip())
+
+    return times, dependencies, completed.stdout.split()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default=MODULE)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=500.0)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    totals = [times[args.module] / 1000 for times, _, _ in runs]
+    median = statistics.median(totals)
+
+    print(f"{args.module}: median {median:.1f} ms, best {min(totals):.1f} ms over {args.runs} runs")
+    print(f"{'dependency':>40} {'median (ms)':>12}")
+
+    dependencies = runs[0][1]
+    medians = {
+        dependency: statistics.median(times.get(dependency, 0) / 1000 for times, _, _ in runs)
+        for dependency in dependencies
+    }
+    for dependency in sorted(medians, key=medians.get, reverse=True)[: args.top]:
+        print(f"{dependency:>40} {medians[dependency]:>12.1f}")
+
+    failed = False
+    deferred = sorted({name for _, _, imported in runs for name in imported})
+    if deferred:
+        print(f"Imported on import, expected on first use: {', '.join(deferred)}")
+        failed = True
+
+    if median > args.budget_ms:
+        print(f"Over budget: {median:.1f} ms > {args.budget_ms:.1f} ms")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
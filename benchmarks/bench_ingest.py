@@ -0,0 +1,158 @@
+"""
+Ingestion benchmark suite for MetaTracker
+
+Runs create_tables(), track(), add_to_status_table() and get_failed_files() against in-memory
+and file backed SQLite databases seeded with catalogs of different sizes, and reports calls per
+second, latency percentiles and SQL statements per call. Everything runs offline with a stub
+science file parser.
+
+Usage:
+    python -m benchmarks.bench_ingest [--sizes 0 10000 100000] [--calls 200] [--output results.json]
+
+Compare two runs (e.g. two commits) by diffing their JSON output.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import sqlalchemy
+
+from benchmarks.utils import StatementCounter, Timings, seed_catalog, stub_science_file_parser, synthetic_filename
+from metatracker.database import create_engine
+from metatracker.database.tables import create_tables
+from metatracker.tracker.tracker import MetaTracker
+
+BACKENDS = ["sqlite-memory", "sqlite-file"]
+
+
+def get_engine(backend: str, directory: Path, name: str) -> type:
+    """Create an engine for a benchmark backend"""
+
+    if backend == "sqlite-memory":
+        return create_engine("sqlite://")
+
+    return create_engine(f"sqlite:///{directory / f'{name}.db'}")
+
+
+def bench_create_tables(backend: str, directory: Path, calls: int) -> list:
+    """Time create_tables() on empty databases and on databases that are already set up"""
+
+    results = []
+    for benchmark in ("create_tables", "create_tables_existing"):
+        timings = Timings()
+        for i in range(calls):
+            engine = get_engine(backend, directory, f"{benchmark}_{i}")
+            if benchmark == "create_tables_existing":
+                create_tables(engine)
+
+            timings.counter = StatementCounter(engine)
+            with timings:
+                create_tables(engine)
+
+            engine.dispose()
+
+        results.append({"benchmark": benchmark, **timings.summary()})
+
+    return results
+
+
+def bench_catalog(backend: str, directory: Path, seed_size: int, calls: int) -> list:
+    """Time track(), add_to_status_table() and get_failed_files() on a seeded catalog"""
+
+    engine = get_engine(backend, directory, f"catalog_{seed_size}")
+    create_tables(engine)
+    seed_catalog(engine, seed_size)
+
+    tracker = MetaTracker(engine, stub_science_file_parser)
+    tracker.reference_data_cache.ensure_loaded()
+    counter = StatementCounter(engine)
+
+    results = []
+
+    # track() new files, each one a new science product
+    timings = Timings(counter)
+    files_directory = directory / f"files_{backend}_{seed_size}"
+    files_directory.mkdir()
+    for seconds in range(seed_size, seed_size + calls):
+        file = files_directory / synthetic_filename(seconds)
+        file.write_text("Test")
+        with timings:
+            tracker.track(
+                file, s3_key=f"s3://bench/{file.name}", s3_bucket="bench", status={"processing_status": "SUCCESS"}
+            )
+    results.append({"benchmark": "track", **timings.summary()})
+
+    # add_to_status_table() updates of existing statuses
+    timings = Timings(counter)
+    for science_file_id in range(1, calls + 1):
+        with timings:
+            tracker.add_to_status_table(tracker.session, science_file_id=science_file_id, processing_status="FAILED")
+    results.append({"benchmark": "add_to_status_table", **timings.summary()})
+
+    # get_failed_files() over the whole catalog
+    timings = Timings(counter)
+    for _ in range(max(1, calls // 20)):
+        with timings:
+            tracker.get_failed_files()
+    results.append({"benchmark": "get_failed_files", **timings.summary()})
+
+    engine.dispose()
+
+    return results
+
+
+def get_metadata() -> dict:
+    """Describe the environment the benchmarks ran in"""
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "platform": platform.platform(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 10000, 100000])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backends:
+            for result in bench_create_tables(backend, Path(directory), max(1, args.calls // 20)):
+                results.append({"backend": backend, "seed_size": 0, **result})
+
+            for seed_size in args.sizes:
+                for result in bench_catalog(backend, Path(directory), seed_size, args.calls):
+                    results.append({"backend": backend, "seed_size": seed_size, **result})
+
+    print(f"{'benchmark':>22} {'backend':>14} {'seed':>8} {'calls/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'stmts':>6}")
+    for result in results:
+        print(
+            f"{result['benchmark']:>22} {result['backend']:>14} {result['seed_size']:>8}"
+            f" {result['per_second']:>9.1f} {result['latency_ms']['p50']:>9.2f} {result['latency_ms']['p95']:>9.2f}"
+            f" {result['statements_per_call']:>6.1f}"
+        )
+
+    if args.output:
+        args.output.write_text(json.dumps({"metadata": get_metadata(), "results": results}, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
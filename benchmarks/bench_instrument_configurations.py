@@ -0,0 +1,80 @@
+"""
+Benchmark MetaTracker.get_instrument_configurations
+
+Reports the number of SQL statements and the latency of loading the instrument
+configurations for an increasing number of configuration rows.
+
+Usage:
+    python -m benchmarks.bench_instrument_configurations
+"""
+
+import itertools
+import time
+
+from sqlalchemy import event
+
+from metatracker.database import create_engine, create_session
+from metatracker.database.tables import create_tables
+from metatracker.database.tables.instrument_configuration_table import InstrumentConfigurationTable
+from metatracker.tracker.tracker import MetaTracker
+
+CONFIGURATION_COUNTS = [10, 100, 1000, 10000]
+REPEATS = 5
+
+
+def seed_configurations(session: type, amount_of_configurations: int) -> None:
+    """Add synthetic instrument configurations on top of the default ones"""
+
+    instrument_pairs = itertools.cycle([(1, None), (2, None), (1, 2)])
+
+    with session.begin() as sql_session:
+        first_id = sql_session.query(InstrumentConfigurationTable).count() + 1
+        for configuration_id in range(first_id, first_id + amount_of_configurations):
+            instrument_1_id, instrument_2_id = next(instrument_pairs)
+            sql_session.add(
+                InstrumentConfigurationTable(
+                    instrument_configuration_id=configuration_id,
+                    instrument_1_id=instrument_1_id,
+                    instrument_2_id=instrument_2_id,
+                )
+            )
+
+
+def run_benchmark(amount_of_configurations: int) -> dict:
+    """Time get_instrument_configurations and count the statements it executes"""
+
+    engine = create_engine("sqlite://")
+    create_tables(engine)
+    session = create_session(engine)
+    seed_configurations(session, amount_of_configurations)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    timings = []
+    for _ in range(REPEATS):
+        statements.clear()
+        start = time.perf_counter()
+        MetaTracker.get_instrument_configurations(session)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "configurations": amount_of_configurations,
+        "queries": len(statements),
+        "best_ms": min(timings) * 1000,
+        "mean_ms": sum(timings) / len(timings) * 1000,
+    }
+
+
+def main() -> None:
+    print(f"{'configurations':>15} {'queries':>8} {'best (ms)':>10} {'mean (ms)':>10}")
+    for amount_of_configurations in CONFIGURATION_COUNTS:
+        result = run_benchmark(amount_of_configurations)
+        print(
+            f"{result['configurations']:>15} {result['queries']:>8} {result['best_ms']:>10.2f}"
+            f" {result['mean_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
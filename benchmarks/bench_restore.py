@@ -0,0 +1,81 @@
+"""
+Benchmark restoring an exported catalog with metatracker.restore
+
+Seeds a file backed SQLite database with a catalog of 1M / 10M files, exports it with
+metatracker.export, then times importing every export into an empty database.
+
+Usage:
+    python -m benchmarks.bench_restore [--sizes 1000000 10000000] [--formats csv.gz parquet]
+"""
+
+import argparse
+import importlib.util
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.utils import seed_catalog
+from metatracker.database import create_engine
+from metatracker.database.tables import create_tables
+from metatracker.export import export_catalog
+from metatracker.restore import import_catalog
+
+
+def run_benchmark(directory: Path, amount_of_files: int, formats: list, batch_size: int) -> list:
+    """Time import_catalog() of an export in every format"""
+
+    engine = create_engine(f"sqlite:///{directory / f'bench_{amount_of_files}.db'}")
+    create_tables(engine)
+    seed_catalog(engine, amount_of_files)
+
+    results = []
+    for file_format in formats:
+        if file_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+            continue
+
+        path = directory / f"{amount_of_files}_catalog.{file_format}"
+        export_catalog(engine, path)
+
+        restored_path = directory / f"restored_{amount_of_files}.db"
+        restored = create_engine(f"sqlite:///{restored_path}")
+        start = time.perf_counter()
+        counts = import_catalog(restored, path, batch_size=batch_size)
+        seconds = time.perf_counter() - start
+        assert counts["padre_science_file"] == amount_of_files
+
+        results.append(
+            {
+                "files": amount_of_files,
+                "format": file_format,
+                "seconds": seconds,
+                "rows_per_second": sum(counts.values()) / seconds,
+            }
+        )
+        restored.dispose()
+        restored_path.unlink()
+        path.unlink()
+
+    engine.dispose()
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000000, 10000000])
+    parser.add_argument("--formats", nargs="+", default=["ndjson.gz", "csv.gz", "parquet"])
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'files':>10} {'format':>10} {'seconds':>9} {'rows/s':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for amount_of_files in args.sizes:
+            for result in run_benchmark(Path(directory), amount_of_files, args.formats, args.batch_size):
+                print(
+                    f"{result['files']:>10} {result['format']:>10} {result['seconds']:>9.1f}"
+                    f" {result['rows_per_second']:>10.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark MetaTracker.track against a growing science product table
+
+Seeds a file backed SQLite database with 10k / 100k / 1M science products and reports the
+latency of tracking new files, with and without the science product natural key index.
+
+Usage:
+    python -m benchmarks.bench_science_product_index [--sizes 10000 100000 1000000] [--files 200]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+
+from benchmarks.utils import seed_science_products, stub_science_file_parser, synthetic_filename
+from metatracker.database import create_engine
+from metatracker.database.tables import create_tables
+from metatracker.database.tables.science_product_table import ScienceProductTable
+from metatracker.tracker.tracker import MetaTracker
+
+
+def get_natural_key_index() -> type:
+    """The natural key index of the science product table, looked up by name"""
+
+    table = ScienceProductTable.__table__
+    name = f"ix_{table.name}_natural_key"
+    for index in table.indexes:
+        if index.name == name:
+            return index
+
+    raise ValueError(f"{table.name} has no index {name}")
+
+
+NATURAL_KEY_INDEX = get_natural_key_index()
+
+
+def run_benchmark(directory: Path, amount_of_products: int, amount_of_files: int, with_index: bool) -> dict:
+    """Time track() for new files on top of amount_of_products existing products"""
+
+    engine = create_engine(f"sqlite:///{directory / f'bench_{amount_of_products}_{with_index}.db'}")
+    create_tables(engine)
+    if not with_index:
+        # Drop the index from the database and the metadata, as if it had never been defined
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP INDEX {NATURAL_KEY_INDEX.name}"))
+        ScienceProductTable.__table__.indexes.discard(NATURAL_KEY_INDEX)
+    seed_science_products(engine, amount_of_products)
+
+    tracker = MetaTracker(engine, stub_science_file_parser)
+
+    # Half of the files belong to existing products, half to new ones
+    timings = []
+    for i in range(amount_of_files):
+        seconds = amount_of_products - amount_of_files // 2 + i
+        file = directory / synthetic_filename(seconds)
+        file.write_text("Test")
+
+        start = time.perf_counter()
+        tracker.track(file, s3_key=f"s3://bench/{file.name}", s3_bucket="bench")
+        timings.append(time.perf_counter() - start)
+
+        file.unlink()
+
+    engine.dispose()
+    ScienceProductTable.__table__.indexes.add(NATURAL_KEY_INDEX)
+    timings.sort()
+
+    return {
+        "products": amount_of_products,
+        "index": with_index,
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p95_ms": timings[int(len(timings) * 0.95)] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--files", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'products':>10} {'index':>6} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for amount_of_products in args.sizes:
+            for with_index in (False, True):
+                result = run_benchmark(Path(directory), amount_of_products, args.files, with_index)
+                print(
+                    f"{result['products']:>10} {result['index']!s:>6} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
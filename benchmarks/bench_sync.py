@@ -0,0 +1,81 @@
+"""
+Benchmark re-running a backfill with MetaTracker.sync_manifest
+
+Seeds a file backed SQLite database with a catalog of 10k / 100k / 1M files, then syncs a
+manifest listing the same files (all unchanged) and a manifest with 1% changed and 1% new
+files. Everything runs offline with a stub science file parser.
+
+Usage:
+    python -m benchmarks.bench_sync [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.utils import seed_catalog, stub_science_file_parser, synthetic_filename
+from metatracker.database import create_engine
+from metatracker.database.tables import create_tables
+from metatracker.tracker.tracker import MetaTracker
+
+MODIFIED_TIME = 1735689600
+
+
+def manifest_rows(amount_of_files: int, changed_every: int = 0, new_files: int = 0) -> list:
+    """Manifest rows of the seeded files, every changed_every-th one with a new size, plus new files"""
+
+    last_modified = datetime.fromtimestamp(MODIFIED_TIME, timezone.utc).isoformat()
+
+    rows = []
+    for seconds in range(amount_of_files + new_files):
+        size = 8 if changed_every and seconds % changed_every == 0 else 4
+        rows.append(("bench", f"raw/{synthetic_filename(seconds)}", size, last_modified))
+
+    return rows
+
+
+def run_benchmark(directory: Path, amount_of_files: int) -> dict:
+    """Time sync_manifest() of an unchanged and of a partly changed listing"""
+
+    engine = create_engine(f"sqlite:///{directory / f'bench_{amount_of_files}.db'}")
+    create_tables(engine)
+    seed_catalog(engine, amount_of_files, file_modified_timestamp=datetime.fromtimestamp(MODIFIED_TIME))
+
+    tracker = MetaTracker(engine, stub_science_file_parser)
+    result = {"files": amount_of_files}
+
+    start = time.perf_counter()
+    summary = tracker.sync_manifest(manifest_rows(amount_of_files))
+    result["unchanged_seconds"] = time.perf_counter() - start
+    assert summary["unchanged"] == amount_of_files
+
+    rows = manifest_rows(amount_of_files, changed_every=100, new_files=amount_of_files // 100)
+    start = time.perf_counter()
+    summary = tracker.sync_manifest(rows)
+    result["changed_seconds"] = time.perf_counter() - start
+    result["tracked"] = len(summary["results"])
+
+    engine.dispose()
+
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'files':>10} {'unchanged (s)':>14} {'2% changed (s)':>15} {'tracked':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for amount_of_files in args.sizes:
+            result = run_benchmark(Path(directory), amount_of_files)
+            print(
+                f"{result['files']:>10} {result['unchanged_seconds']:>14.2f} {result['changed_seconds']:>15.2f}"
+                f" {result['tracked']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
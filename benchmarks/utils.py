@@ -0,0 +1,159 @@
+"""
+Shared helpers for the MetaTracker benchmarks
+"""
+
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy import event, insert
+
+from metatracker.database.tables.science_file_table import ScienceFileTable
+from metatracker.database.tables.science_product_table import ScienceProductTable
+from metatracker.database.tables.status_table import StatusTable
+
+START_TIME = datetime(2025, 1, 1)
+SEED_CHUNK_SIZE = 10000
+
+
+def stub_science_file_parser(file: Path) -> dict:
+    """Parse bench_<seconds>.dat filenames without any mission specific dependency"""
+
+    seconds = int(file.stem.split("_")[1])
+
+    return {
+        "instrument": "meddea",
+        "mode": "bench",
+        "test": False,
+        "time": SimpleNamespace(value=START_TIME + timedelta(seconds=seconds)),
+        "level": "raw",
+        "version": None,
+        "descriptor": None,
+    }
+
+
+def synthetic_filename(seconds: int) -> str:
+    """Filename accepted by stub_science_file_parser"""
+
+    return f"bench_{seconds}.dat"
+
+
+def seed_science_products(engine: type, amount_of_products: int) -> None:
+    """Insert synthetic science products, one second apart"""
+
+    with engine.begin() as connection:
+        for first in range(0, amount_of_products, SEED_CHUNK_SIZE):
+            connection.execute(
+                insert(ScienceProductTable),
+                [
+                    {
+                        "instrument_configuration_id": 1,
+                        "mode": "bench",
+                        "reference_timestamp": START_TIME + timedelta(seconds=seconds),
+                    }
+                    for seconds in range(first, min(first + SEED_CHUNK_SIZE, amount_of_products))
+                ],
+            )
+
+
+def seed_catalog(
+    engine: type, amount_of_files: int, failed_every: int = 10, file_modified_timestamp: datetime = None
+) -> None:
+    """Insert synthetic science products, science files and statuses (one in failed_every FAILED)"""
+
+    seed_science_products(engine, amount_of_files)
+
+    now = datetime.now()
+    file_modified_timestamp = file_modified_timestamp or now
+    with engine.begin() as connection:
+        for first in range(0, amount_of_files, SEED_CHUNK_SIZE):
+            seconds_range = range(first, min(first + SEED_CHUNK_SIZE, amount_of_files))
+            connection.execute(
+                insert(ScienceFileTable),
+                [
+                    {
+                        "science_product_id": seconds + 1,
+                        "file_type": "dat",
+                        "file_level": "raw",
+                        "filename": Path(synthetic_filename(seconds)).stem,
+                        "file_version": None,
+                        "file_extension": ".dat",
+                        "file_path": f"/bench/{synthetic_filename(seconds)}",
+                        "s3_key": f"s3://bench/{synthetic_filename(seconds)}",
+                        "s3_bucket": "bench",
+                        "file_size": 4,
+                        "file_modified_timestamp": file_modified_timestamp,
+                        "is_public": True,
+                    }
+                    for seconds in seconds_range
+                ],
+            )
+            connection.execute(
+                insert(StatusTable),
+                [
+                    {
+                        "science_file_id": seconds + 1,
+                        "processing_status": "FAILED" if seconds % failed_every == 0 else "SUCCESS",
+                        "original_processing_timestamp": now,
+                        "last_processing_timestamp": now,
+                        "reprocessed_count": 0,
+                    }
+                    for seconds in seconds_range
+                ],
+            )
+
+
+class StatementCounter:
+    """Count the SQL statements executed by an engine"""
+
+    def __init__(self, engine: type) -> None:
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self.on_execute)
+
+    def on_execute(self, *args) -> None:
+        self.count += 1
+
+
+class Timings:
+    """Collect per-call latencies and the statements they executed
+
+    ``counter`` can be swapped between calls when every call runs against a new engine.
+    """
+
+    def __init__(self, counter: StatementCounter = None) -> None:
+        self.counter = counter
+        self.latencies = []
+        self.statements = 0
+
+    def __enter__(self) -> "Timings":
+        self.start_count = self.counter.count
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.latencies.append(time.perf_counter() - self.start)
+        self.statements += self.counter.count - self.start_count
+
+    def summary(self) -> dict:
+        """Calls per second, latency percentiles (ms) and statements per call"""
+
+        latencies = sorted(self.latencies)
+        calls = len(latencies)
+        total = sum(latencies)
+
+        def percentile(fraction: float) -> float:
+            return latencies[min(calls - 1, int(calls * fraction))] * 1000
+
+        return {
+            "calls": calls,
+            "per_second": calls / total if total else None,
+            "latency_ms": {
+                "mean": total / calls * 1000,
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": latencies[-1] * 1000,
+            },
+            "statements_per_call": self.statements / calls,
+        }
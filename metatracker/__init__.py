@@ -3,33 +3,58 @@ import logging
 
 from metatracker.config import load_config
 
-# Set up basic config for logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by the application (see configure_logging), not on import
 log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
 
-# Format Logging
-color_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+# Loaded on first use, see __getattr__
+_configuration = None
 
-# Set Up Console Logging
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(color_formatter)
-log.addHandler(console_handler)
 
+def configure_logging(level: int = logging.INFO) -> None:
+    """
+    Log to the console
+
+    :param level: Logging level
+    :type level: int
+    """
+
+    # Set up basic config for logging
+    logging.basicConfig(level=level)
+
+    # Format Logging
+    color_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 
-CONFIGURATION = load_config()
+    # Set Up Console Logging
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(color_formatter)
+    log.addHandler(console_handler)
 
 
 def get_config():
     """
     Get config
     """
-    return CONFIGURATION
+    global _configuration
+
+    if _configuration is None:
+        _configuration = load_config()
+
+    return _configuration
 
 
 def set_config(config: dict) -> None:
     """
     Set config
     """
-    global CONFIGURATION
+    global _configuration
+
+    _configuration = load_config(config)
+
+
+def __getattr__(name: str):
+    # CONFIGURATION is loaded on first access rather than on import
+    if name == "CONFIGURATION":
+        return get_config()
 
-    CONFIGURATION = load_config(config)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,8 +2,10 @@
 Module to handle database operations
 """
 
+from typing import Optional
+
 from sqlalchemy import create_engine as sqlalchemy_create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
 
 
 # Function to check if you can connect to the database with SQLAlchemy
@@ -17,23 +19,131 @@ def check_connection(engine: type) -> bool:
     :rtype: bool
     """
 
-    return bool(engine.connect())
+    with engine.connect() as connection:
+        return not connection.closed
 
 
-def create_engine(db_host: str) -> type:
+def create_engine(
+    db_host: str,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+    pool_pre_ping: bool = False,
+    pool_recycle: int = -1,
+) -> type:
     """
     Create Engine
 
+    Pool settings that are left as None use the SQLAlchemy defaults, which also keeps them
+    out of the way of pools that don't accept them (e.g. in-memory SQLite).
+
     :param db_host: Database Host
     :type db_host: str
+    :param pool_size: Number of connections kept open in the pool
+    :type pool_size: int
+    :param max_overflow: Number of connections allowed on top of pool_size
+    :type max_overflow: int
+    :param pool_pre_ping: Test connections before handing them out of the pool
+    :type pool_pre_ping: bool
+    :param pool_recycle: Recycle connections older than this many seconds (-1 to never recycle)
+    :type pool_recycle: int
     :return: SQLAlchemy Engine
     :rtype: type
     """
 
-    engine = sqlalchemy_create_engine(db_host)
+    pool_settings = {"pool_pre_ping": pool_pre_ping, "pool_recycle": pool_recycle}
+    if pool_size is not None:
+        pool_settings["pool_size"] = pool_size
+    if max_overflow is not None:
+        pool_settings["max_overflow"] = max_overflow
+
+    engine = sqlalchemy_create_engine(db_host, **pool_settings)
+
+    if engine.dialect.name == "sqlite":
+        enable_sqlite_transactions(engine)
+
+    return engine
+
+
+def enable_sqlite_transactions(engine: type) -> None:
+    """
+    Let SQLAlchemy emit BEGIN itself on SQLite
+
+    The pysqlite driver delays BEGIN until the first write, so a SAVEPOINT opened before any write
+    starts the transaction and releasing it commits. Emitting BEGIN ourselves keeps savepoints
+    nested inside the transaction.
+
+    :param engine: SQLAlchemy Engine
+    :type engine: type
+    :return: None
+    :rtype: None
+    """
+
+    @event.listens_for(engine, "connect")
+    def disable_driver_transactions(dbapi_connection: type, connection_record: type) -> None:
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def emit_begin(connection: type) -> None:
+        connection.exec_driver_sql("BEGIN")
+
+
+def create_async_engine(
+    db_host: str,
+    pool_size: Optional[int] = None,
+    max_overflow: Optional[int] = None,
+    pool_pre_ping: bool = False,
+    pool_recycle: int = -1,
+) -> type:
+    """
+    Create Async Engine
+
+    Same as create_engine, for an asyncio driver (e.g. ``sqlite+aiosqlite://`` or
+    ``postgresql+asyncpg://``). Needs the ``sqlalchemy[asyncio]`` extra.
+
+    :param db_host: Database Host
+    :type db_host: str
+    :param pool_size: Number of connections kept open in the pool
+    :type pool_size: int
+    :param max_overflow: Number of connections allowed on top of pool_size
+    :type max_overflow: int
+    :param pool_pre_ping: Test connections before handing them out of the pool
+    :type pool_pre_ping: bool
+    :param pool_recycle: Recycle connections older than this many seconds (-1 to never recycle)
+    :type pool_recycle: int
+    :return: SQLAlchemy AsyncEngine
+    :rtype: type
+    """
+
+    from sqlalchemy.ext.asyncio import create_async_engine as sqlalchemy_create_async_engine
+
+    pool_settings = {"pool_pre_ping": pool_pre_ping, "pool_recycle": pool_recycle}
+    if pool_size is not None:
+        pool_settings["pool_size"] = pool_size
+    if max_overflow is not None:
+        pool_settings["max_overflow"] = max_overflow
+
+    engine = sqlalchemy_create_async_engine(db_host, **pool_settings)
+
+    if engine.dialect.name == "sqlite":
+        enable_sqlite_transactions(engine.sync_engine)
+
     return engine
 
 
+async def check_async_connection(engine: type) -> bool:
+    """
+    Check Async Connection
+
+    :param engine: SQLAlchemy AsyncEngine
+    :type engine: type
+    :return: Connection Status
+    :rtype: bool
+    """
+
+    async with engine.connect() as connection:
+        return not connection.closed
+
+
 # Function to create a database session
 def create_session(engine: type) -> type:
     """
@@ -45,8 +155,28 @@ def create_session(engine: type) -> type:
     :rtype: type
     """
 
+    # The ORM is imported on first use, it isn't needed to import the package
+    from sqlalchemy.orm import sessionmaker
+
     session = sessionmaker(bind=engine)
     return session
 
 
+def create_async_session(engine: type) -> type:
+    """
+    Create Async Session
+
+    Objects are not expired on commit, as reloading them would need an await.
+
+    :param engine: SQLAlchemy AsyncEngine
+    :type engine: type
+    :return: SQLAlchemy async_sessionmaker
+    :rtype: type
+    """
+
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    return async_sessionmaker(bind=engine, expire_on_commit=False)
+
+
 # Function to create a database
@@ -2,10 +2,20 @@
 Setup Tables
 """
 
-from sqlalchemy import inspect
-
-from metatracker import CONFIGURATION, log
+import hashlib
+import json
+import weakref
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import Integer, and_, bindparam, delete, func, insert, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateColumn
+
+from metatracker import log
 from metatracker.database import create_session
+from metatracker.database.upsert import insert_many_or_ignore, supports_on_conflict
 
 from . import file_level_table as FileLevelTable
 from . import file_type_table as FileTypeTable
@@ -14,7 +24,79 @@ from . import instrument_table as InstrumentTable
 from . import science_file_table as ScienceFileTable
 from . import science_product_table as ScienceProductTable
 from . import status_table as StatusTable
-from metatracker.database.tables.status_table import status_origin_association
+from .registry import MissionTables, get_mission_configuration, get_mission_tables, register_mission
+
+__all__ = [
+    "FileLevelTable",
+    "FileTypeTable",
+    "InstrumentConfigurationTable",
+    "InstrumentTable",
+    "MissionTables",
+    "SEED_NAME",
+    "ScienceFileTable",
+    "ScienceProductTable",
+    "StatusTable",
+    "create_columns",
+    "create_indexes",
+    "create_table",
+    "create_tables",
+    "get_class_name",
+    "get_columns",
+    "get_mission_configuration",
+    "get_mission_tables",
+    "get_seed_fingerprint",
+    "get_table_classes",
+    "get_table_from_class",
+    "get_table_modules",
+    "get_tables",
+    "get_tables_from_classes",
+    "is_table_empty",
+    "merge_duplicate_rows",
+    "merge_duplicate_science_products",
+    "merge_duplicate_statuses",
+    "notify_reference_data_changed",
+    "populate_file_level_table",
+    "populate_file_type_table",
+    "populate_instrument_configuration_table",
+    "populate_instrument_table",
+    "populate_reference_tables",
+    "read_seed_fingerprint",
+    "register_mission",
+    "register_reference_data_listener",
+    "remove_tables",
+    "table_exists",
+]
+
+# Objects (e.g. reference data caches) to notify when the reference tables change
+_reference_data_listeners = weakref.WeakSet()
+
+# Row of the seed table holding the fingerprint of what create_tables set up
+SEED_NAME = "create_tables"
+
+
+def register_reference_data_listener(listener: object) -> None:
+    """
+    Register a listener to be invalidated when the reference tables are (re)populated
+
+    :param listener: Object with an ``invalidate()`` method
+    :type listener: object
+    :return: None
+    :rtype: None
+    """
+
+    _reference_data_listeners.add(listener)
+
+
+def notify_reference_data_changed() -> None:
+    """
+    Invalidate all registered reference data listeners
+
+    :return: None
+    :rtype: None
+    """
+
+    for listener in list(_reference_data_listeners):
+        listener.invalidate()
 
 
 def get_class_name(class_object: type) -> str:
@@ -176,6 +258,8 @@ def populate_file_level_table(sql_session: type, file_levels: list, file_level_t
             else:
                 log.debug(f"{file_level['short_name']} already exists in File Level Table")
 
+    notify_reference_data_changed()
+
 
 def populate_file_type_table(sql_session: type, file_types: list, file_level_table: type) -> None:
     """
@@ -206,6 +290,8 @@ def populate_file_type_table(sql_session: type, file_types: list, file_level_tab
             else:
                 log.debug(f"{file_type['short_name']} already exists in File Type Table")
 
+    notify_reference_data_changed()
+
 
 def populate_instrument_table(sql_session: type, instruments: list, instrument_table: type) -> None:
     """
@@ -236,6 +322,8 @@ def populate_instrument_table(sql_session: type, instruments: list, instrument_t
             else:
                 log.debug(f"{instrument['short_name']} already exists in Instrument Table")
 
+    notify_reference_data_changed()
+
 
 def populate_instrument_configuration_table(
     sql_session: type, instrument_configurations: list, instrument_configuration_table: type
@@ -274,6 +362,8 @@ def populate_instrument_configuration_table(
                     " in Instrument Configuration Table"
                 )
 
+    notify_reference_data_changed()
+
 
 # Function to create table if it doesn't exist and match the table class
 def create_table(engine: type, table_class: type) -> None:
@@ -295,6 +385,212 @@ def create_table(engine: type, table_class: type) -> None:
         log.debug(f"Table {table_name} already exists, skipping creation.")
 
 
+def create_indexes(engine: type, mission=None) -> None:
+    """
+    Create the indexes of every table that are missing from the database.
+
+    ``create_all`` skips tables that already exist, so this migrates databases created before
+    an index was added to a table class.
+
+    :param engine: SQLAlchemy Engine
+    :type engine: sqlalchemy.engine.base.Engine
+    :param mission: Mission name or configuration, defaults to the current configuration
+    :type mission: str or metatracker.config.config.MetaTrackerConfiguration
+    :return: None
+    :rtype: None
+    """
+    inspector = inspect(engine)
+
+    for table_class in get_mission_tables(mission).table_classes:
+        table = get_table_from_class(table_class)
+        if not inspector.has_table(table.name):
+            continue
+
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                log.debug(f"Creating index {index.name} on {table.name}")
+                index.create(bind=engine)
+
+
+def create_columns(engine: type, mission=None) -> None:
+    """
+    Add the nullable columns of every table that are missing from the database.
+
+    ``create_all`` skips tables that already exist, so this migrates databases created before
+    a column (e.g. the lease of the status table) was added to a table class.
+
+    :param engine: SQLAlchemy Engine or Connection
+    :type engine: sqlalchemy.engine.base.Engine
+    :param mission: Mission name or configuration, defaults to the current configuration
+    :type mission: str or metatracker.config.config.MetaTrackerConfiguration
+    :return: None
+    :rtype: None
+    """
+    if isinstance(engine, Engine):
+        with engine.begin() as connection:
+            return create_columns(connection, mission)
+
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+
+    for table_class in get_mission_tables(mission).table_classes:
+        table = get_table_from_class(table_class)
+        if not inspector.has_table(table.name):
+            continue
+
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+
+            if not column.nullable and column.server_default is None:
+                raise ValueError(f"Cannot add the NOT NULL column {column.name} to the existing table {table.name}")
+
+            log.debug(f"Adding column {column.name} to {table.name}")
+            column_definition = CreateColumn(column).compile(dialect=engine.dialect)
+            engine.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_definition}"))
+
+
+def merge_duplicate_science_products(connection: type, tables: MissionTables) -> None:
+    """
+    Merge science products with the same natural key, and store missing modes as empty strings.
+
+    A missing mode (NULL, written before missing modes were stored as empty strings) is the same
+    as an empty mode. The science product with the lowest id is kept and the science files of
+    the others are pointed at it.
+
+    :param connection: SQLAlchemy Connection
+    :type connection: sqlalchemy.engine.Connection
+    :param tables: Tables of the mission
+    :type tables: MissionTables
+    :return: None
+    :rtype: None
+    """
+    science_product = get_table_from_class(tables.ScienceProductTable)
+    science_file = get_table_from_class(tables.ScienceFileTable)
+
+    natural_key = [
+        science_product.c.instrument_configuration_id,
+        func.coalesce(science_product.c.mode, ""),
+        science_product.c.reference_timestamp,
+    ]
+    duplicated = (
+        select(*[column.label(f"key_{i}") for i, column in enumerate(natural_key)])
+        .group_by(*natural_key)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    products = connection.execute(
+        select(science_product.c.science_product_id, *natural_key)
+        .join(duplicated, and_(*[column == duplicated.c[f"key_{i}"] for i, column in enumerate(natural_key)]))
+        .order_by(science_product.c.science_product_id)
+    )
+
+    kept_ids = {}
+    duplicates = []
+    for science_product_id, *key in products:
+        kept_id = kept_ids.setdefault(tuple(key), science_product_id)
+        if kept_id != science_product_id:
+            duplicates.append({"duplicate_id": science_product_id, "kept_id": kept_id})
+
+    if duplicates:
+        log.debug(f"Merging {len(duplicates)} duplicate science products")
+        connection.execute(
+            update(science_file)
+            .where(science_file.c.science_product_id == bindparam("duplicate_id"))
+            .values(science_product_id=bindparam("kept_id")),
+            duplicates,
+        )
+        connection.execute(
+            delete(science_product).where(science_product.c.science_product_id == bindparam("duplicate_id")),
+            duplicates,
+        )
+
+    connection.execute(update(science_product).where(science_product.c.mode.is_(None)).values(mode=""))
+
+
+def merge_duplicate_statuses(connection: type, tables: MissionTables) -> None:
+    """
+    Merge the statuses of science files with more than one status.
+
+    The latest status (the highest id) is kept, the origin files of the others are added to it.
+
+    :param connection: SQLAlchemy Connection
+    :type connection: sqlalchemy.engine.Connection
+    :param tables: Tables of the mission
+    :type tables: MissionTables
+    :return: None
+    :rtype: None
+    """
+    status = get_table_from_class(tables.StatusTable)
+    association = tables.status_origin_association
+
+    duplicated = select(status.c.science_file_id).group_by(status.c.science_file_id).having(func.count() > 1)
+    statuses = connection.execute(
+        select(status.c.status_id, status.c.science_file_id)
+        .where(status.c.science_file_id.in_(duplicated))
+        .order_by(status.c.status_id.desc())
+    )
+
+    kept_ids = {}
+    duplicates = []
+    for status_id, science_file_id in statuses:
+        kept_id = kept_ids.setdefault(science_file_id, status_id)
+        if kept_id != status_id:
+            duplicates.append({"duplicate_id": status_id, "kept_id": kept_id})
+
+    if not duplicates:
+        return
+
+    log.debug(f"Merging {len(duplicates)} duplicate statuses")
+    # The origin files of a duplicate that the kept status doesn't have yet
+    kept_id = bindparam("kept_id", type_=Integer)
+    connection.execute(
+        insert(association).from_select(
+            ["status_id", "origin_file_id"],
+            select(kept_id, association.c.origin_file_id).where(
+                association.c.status_id == bindparam("duplicate_id"),
+                association.c.origin_file_id.not_in(
+                    select(association.c.origin_file_id).where(association.c.status_id == kept_id)
+                ),
+            ),
+        ),
+        duplicates,
+    )
+    connection.execute(delete(association).where(association.c.status_id == bindparam("duplicate_id")), duplicates)
+    connection.execute(delete(status).where(status.c.status_id == bindparam("duplicate_id")), duplicates)
+
+
+def merge_duplicate_rows(engine: type, mission=None) -> None:
+    """
+    Merge the rows the unique indexes of create_indexes would reject.
+
+    Databases created before the science product natural key and the status science file
+    indexes were unique can hold duplicate science products and statuses, on which creating
+    those indexes fails. This merges them, so the indexes can be added.
+
+    :param engine: SQLAlchemy Engine or Connection
+    :type engine: sqlalchemy.engine.base.Engine
+    :param mission: Mission name or configuration, defaults to the current configuration
+    :type mission: str or metatracker.config.config.MetaTrackerConfiguration
+    :return: None
+    :rtype: None
+    """
+    if isinstance(engine, Engine):
+        with engine.begin() as connection:
+            return merge_duplicate_rows(connection, mission)
+
+    tables = get_mission_tables(mission)
+    inspector = inspect(engine)
+
+    if inspector.has_table(get_table_from_class(tables.ScienceProductTable).name):
+        merge_duplicate_science_products(engine, tables)
+
+    if inspector.has_table(get_table_from_class(tables.StatusTable).name):
+        merge_duplicate_statuses(engine, tables)
+
+
 def is_table_empty(sql_session, table_class: type) -> bool:
     """
     Check if a table is empty.
@@ -310,61 +606,162 @@ def is_table_empty(sql_session, table_class: type) -> bool:
         return session.query(table_class).first() is None
 
 
-def create_tables(engine: type) -> None:
+def get_seed_fingerprint(tables: MissionTables, configuration) -> str:
+    """
+    Fingerprint of the schema and reference data that create_tables sets up for a mission
+
+    :param tables: Tables of the mission
+    :type tables: MissionTables
+    :param configuration: Mission configuration
+    :type configuration: metatracker.config.config.MetaTrackerConfiguration
+    :return: SHA-256 hex digest
+    :rtype: str
+    """
+    schema = [
+        (
+            table.name,
+            [(column.name, str(column.type), column.nullable, column.primary_key) for column in table.columns],
+            sorted(str(index.name) for index in table.indexes),
+        )
+        for table in tables.metadata.sorted_tables
+    ]
+    seed = {
+        "file_levels": configuration.file_levels,
+        "file_types": configuration.file_types,
+        "instruments": configuration.instruments,
+        "instrument_configurations": configuration.instrument_configurations,
+    }
+
+    return hashlib.sha256(json.dumps([schema, seed], sort_keys=True, default=str).encode()).hexdigest()
+
+
+def read_seed_fingerprint(engine: type, tables: MissionTables) -> Optional[str]:
+    """
+    Read the fingerprint stored by the last create_tables, in a single query
+
+    :param engine: SQLAlchemy Engine
+    :type engine: sqlalchemy.engine.base.Engine
+    :param tables: Tables of the mission
+    :type tables: MissionTables
+    :return: Stored fingerprint, None if there is none (e.g. the seed table doesn't exist yet)
+    :rtype: str
+    """
+    try:
+        with engine.connect() as connection:
+            return connection.scalar(select(tables.seed.c.fingerprint).where(tables.seed.c.name == SEED_NAME))
+    except DBAPIError:
+        return None
+
+
+def populate_reference_tables(sql_session, tables: MissionTables, configuration) -> None:
+    """
+    Add the reference data of a configuration that is missing from the reference tables, with
+    one multi-row insert per table within an open transaction
+
+    Existing rows are left as they are.
+
+    :param sql_session: SQLAlchemy Session (not a session factory)
+    :type sql_session: sqlalchemy.orm.session.Session
+    :param tables: Tables of the mission
+    :type tables: MissionTables
+    :param configuration: Mission configuration
+    :type configuration: metatracker.config.config.MetaTrackerConfiguration
+    :return: None
+    :rtype: None
+    """
+    reference_data = [
+        (tables.FileLevelTable, configuration.file_levels),
+        (tables.FileTypeTable, configuration.file_types),
+        (tables.InstrumentTable, configuration.instruments),
+        (tables.InstrumentConfigurationTable, configuration.instrument_configurations),
+    ]
+
+    for table_class, rows in reference_data:
+        table = get_table_from_class(table_class)
+        primary_key = [column.name for column in table.primary_key]
+
+        # Every row gets every column, as a multi-row insert needs the same keys in each row
+        rows = [{column.name: row.get(column.name) for column in table.columns} for row in rows]
+
+        if not supports_on_conflict(sql_session, table_class, primary_key):
+            existing = set(sql_session.execute(select(*table.primary_key.columns)).tuples())
+            rows = [row for row in rows if tuple(row[name] for name in primary_key) not in existing]
+
+        log.debug(f"Populating {get_class_name(table_class)} with {len(rows)} rows")
+        insert_many_or_ignore(sql_session, table_class, rows, primary_key)
+
+
+def create_tables(engine: type, mission=None) -> None:
     """
     Set up tables in the database if they don't exist and populate them.
 
+    Tables, indexes and reference data are set up in a single transaction, after which a
+    fingerprint of the schema and reference data is stored. When the stored fingerprint is
+    current, create_tables returns after that single check. Databases created by older versions
+    are migrated on the way: missing columns are added and duplicate science products and
+    statuses merged before the unique indexes are created.
+
     :param engine: SQLAlchemy Engine
     :type engine: sqlalchemy.engine.base.Engine
+    :param mission: Mission name or configuration, defaults to the current configuration
+    :type mission: str or metatracker.config.config.MetaTrackerConfiguration
     :return: None
     :rtype: None
     """
-    # --- Create all tables at once, in order ---
-    from metatracker.database.tables.base_table import Base  # adjust import if needed
-    Base.metadata.create_all(engine)
+    configuration = get_mission_configuration(mission)
+    tables = get_mission_tables(configuration)
 
-    # --- Now do the population as before ---
-    session = create_session(engine)
+    fingerprint = get_seed_fingerprint(tables, configuration)
+    if read_seed_fingerprint(engine, tables) == fingerprint:
+        log.debug(f"Tables of {configuration.mission_name} are up to date, skipping creation.")
+        return
 
-    table_modules = get_table_modules()
-    table_classes = get_table_classes(table_modules)
+    with create_session(engine).begin() as sql_session:
+        connection = sql_session.connection()
 
-    for table_class in table_classes:
-        class_name = get_class_name(table_class)
-        if not is_table_empty(session, table_class):
-            log.debug(f"{class_name} already populated, skipping population.")
-            continue
+        # --- Create all tables at once, in order ---
+        tables.metadata.create_all(connection)
+
+        # --- Add columns and indexes that older databases are missing ---
+        create_columns(connection, configuration)
+        merge_duplicate_rows(connection, configuration)
+        create_indexes(connection, configuration)
 
-        if class_name == "FileLevelTable":
-            populate_file_level_table(session, CONFIGURATION.file_levels, table_class)
-        elif class_name == "FileTypeTable":
-            populate_file_type_table(session, CONFIGURATION.file_types, table_class)
-        elif class_name == "InstrumentTable":
-            populate_instrument_table(session, CONFIGURATION.instruments, table_class)
-        elif class_name == "InstrumentConfigurationTable":
-            populate_instrument_configuration_table(session, CONFIGURATION.instrument_configurations, table_class)
-            populate_instrument_configuration_table(session, CONFIGURATION.instrument_configurations, table_class)
+        # --- Add missing reference data ---
+        populate_reference_tables(sql_session, tables, configuration)
 
+        sql_session.execute(delete(tables.seed).where(tables.seed.c.name == SEED_NAME))
+        sql_session.execute(
+            insert(tables.seed).values(name=SEED_NAME, fingerprint=fingerprint, updated_at=datetime.now(timezone.utc))
+        )
 
-def remove_tables(engine: type) -> None:
+    notify_reference_data_changed()
+
+
+def remove_tables(engine: type, mission=None) -> None:
     """
     Remove all tables from the database
 
     :param engine: SQLAlchemy
     :type engine: sqlalchemy.engine.base.Engine
+    :param mission: Mission name or configuration, defaults to the current configuration
+    :type mission: str or metatracker.config.config.MetaTrackerConfiguration
     :return: None
     :rtype: None
     """
-    # Get Table Modules
-    table_modules = get_table_modules()
+    tables = get_mission_tables(mission)
 
-    # Get Table Classes
-    table_classes = get_table_classes(table_modules)
+    # The seed fingerprint goes first, so that create_tables sets everything up again
+    tables.seed.drop(bind=engine, checkfirst=True)
 
-    # Reverse Table Classes
-    table_classes.reverse()
+    # The association and lineage tables refer to the status and science file tables
+    for table in (tables.status_origin_association, tables.science_file_lineage):
+        log.debug(f"Removing {table.name} Table")
+        table.drop(bind=engine, checkfirst=True)
 
-    # Remove Tables
-    for table_class in table_classes:
+    # Remove Tables, in reverse order of creation
+    for table_class in reversed(tables.table_classes):
         log.debug(f"Removing {get_class_name(table_class)} Table")
         table_class.__table__.drop(bind=engine, checkfirst=True)
+
+    notify_reference_data_changed()
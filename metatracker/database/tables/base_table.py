@@ -1,5 +1,22 @@
 # SQLAclchemy Base.Base Table
+# Each mission configuration has its own declarative base (and so its own MetaData), created
+# when its tables are first used (see metatracker.database.tables.registry)
 
-from sqlalchemy.orm import declarative_base
 
-Base = declarative_base()
+def create_base() -> type:
+    """
+    Create a declarative base for the tables of one mission configuration
+    """
+    from sqlalchemy.orm import declarative_base
+
+    return declarative_base()
+
+
+def __getattr__(name: str):
+    # Base of the current configuration, built on first use
+    if name == "Base":
+        from metatracker.database.tables.registry import get_mission_tables
+
+        return get_mission_tables().Base
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
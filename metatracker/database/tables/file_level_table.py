@@ -6,39 +6,52 @@
 
 from sqlalchemy import Column, String
 
-from metatracker import CONFIGURATION
+from . import registry as Registry
 
-from . import base_table as Base
 
+def build_class(base: type, configuration) -> type:
+    """
+    Build the FileLevelTable class of a mission configuration
+    """
 
-class FileLevelTable(Base.Base):
-    # Name Of Table
-    __tablename__ = f"{CONFIGURATION.mission_name}_file_level"
+    class FileLevelTable(base):
+        # Name Of Table
+        __tablename__ = f"{configuration.mission_name}_file_level"
 
-    # Short Name Of File Level
-    short_name = Column(String, primary_key=True)
+        # Short Name Of File Level
+        short_name = Column(String, primary_key=True)
 
-    # Full Name Of File Level
-    full_name = Column(String)
+        # Full Name Of File Level
+        full_name = Column(String)
 
-    # Description Of File Level
-    description = Column(String)
+        # Description Of File Level
+        description = Column(String)
 
-    def __init__(self, full_name: str, short_name: str, description: str) -> None:
-        """
-        Constructor for File Level Table
-        """
+        def __init__(self, full_name: str, short_name: str, description: str) -> None:
+            """
+            Constructor for File Level Table
+            """
 
-        self.full_name = full_name
-        self.short_name = short_name
-        self.description = description
+            self.full_name = full_name
+            self.short_name = short_name
+            self.description = description
 
-    def __repr__(self) -> str:
-        return super().__repr__()
+        def __repr__(self) -> str:
+            return super().__repr__()
+
+    return FileLevelTable
 
 
 def return_class() -> type:
     """
     Return Class
     """
-    return FileLevelTable
+    return Registry.get_mission_tables().FileLevelTable
+
+
+def __getattr__(name: str):
+    # FileLevelTable of the current configuration, built on first use
+    if name == "FileLevelTable":
+        return return_class()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -6,42 +6,55 @@
 
 from sqlalchemy import Column, String
 
-from metatracker import CONFIGURATION
+from . import registry as Registry
 
-from . import base_table as Base
 
+def build_class(base: type, configuration) -> type:
+    """
+    Build the FileTypeTable class of a mission configuration
+    """
 
-class FileTypeTable(Base.Base):
-    # Name Of Table
-    __tablename__ = f"{CONFIGURATION.mission_name}_file_type"
+    class FileTypeTable(base):
+        # Name Of Table
+        __tablename__ = f"{configuration.mission_name}_file_type"
 
-    # Short Name Of File Type
-    short_name = Column(String, primary_key=True)
+        # Short Name Of File Type
+        short_name = Column(String, primary_key=True)
 
-    # Full Name Of File Type
-    full_name = Column(String)
+        # Full Name Of File Type
+        full_name = Column(String)
 
-    # Description Of File Type
-    description = Column(String)
+        # Description Of File Type
+        description = Column(String)
 
-    # Extension Of File Type
-    extension = Column(String)
+        # Extension Of File Type
+        extension = Column(String)
 
-    def __init__(self, short_name: str, full_name: str, description: str, extension: str) -> None:
-        """
-        Constructor for File Type Table
-        """
-        self.short_name = short_name
-        self.full_name = full_name
-        self.description = description
-        self.extension = extension
+        def __init__(self, short_name: str, full_name: str, description: str, extension: str) -> None:
+            """
+            Constructor for File Type Table
+            """
+            self.short_name = short_name
+            self.full_name = full_name
+            self.description = description
+            self.extension = extension
 
-    def __repr__(self) -> str:
-        return super().__repr__()
+        def __repr__(self) -> str:
+            return super().__repr__()
+
+    return FileTypeTable
 
 
 def return_class() -> type:
     """
     Return Class
     """
-    return FileTypeTable
+    return Registry.get_mission_tables().FileTypeTable
+
+
+def __getattr__(name: str):
+    # FileTypeTable of the current configuration, built on first use
+    if name == "FileTypeTable":
+        return return_class()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
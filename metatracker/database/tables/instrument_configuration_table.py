@@ -5,25 +5,38 @@
 
 from sqlalchemy import Column, ForeignKey, Integer
 
-from metatracker import CONFIGURATION
+from . import registry as Registry
 
-from . import base_table as Base
 
-table_dict = {
-    "__tablename__": f"{CONFIGURATION.mission_name}_instrument_configuration",
-    "instrument_configuration_id": Column(Integer, primary_key=True),
-}
+def build_class(base: type, configuration) -> type:
+    """
+    Build the InstrumentConfigurationTable class of a mission configuration, with one
+    instrument column per instrument of the mission
+    """
+
+    table_dict = {
+        "__tablename__": f"{configuration.mission_name}_instrument_configuration",
+        "instrument_configuration_id": Column(Integer, primary_key=True),
+    }
 
-for i in range(len(CONFIGURATION.instruments)):
-    table_dict[f"instrument_{i+1}_id"] = Column(
-        Integer, ForeignKey(f"{CONFIGURATION.mission_name}_instrument.instrument_id")
-    )
+    for i in range(len(configuration.instruments)):
+        table_dict[f"instrument_{i+1}_id"] = Column(
+            Integer, ForeignKey(f"{configuration.mission_name}_instrument.instrument_id")
+        )
 
-InstrumentConfigurationTable = type("InstrumentConfigurationTable", (Base.Base,), table_dict)
+    return type("InstrumentConfigurationTable", (base,), table_dict)
 
 
 def return_class() -> type:
     """
     Return Class
     """
-    return InstrumentConfigurationTable
+    return Registry.get_mission_tables().InstrumentConfigurationTable
+
+
+def __getattr__(name: str):
+    # InstrumentConfigurationTable of the current configuration, built on first use
+    if name == "InstrumentConfigurationTable":
+        return return_class()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,42 +7,55 @@
 
 from sqlalchemy import Column, Integer, String
 
-from metatracker import CONFIGURATION
+from . import registry as Registry
 
-from . import base_table as Base
 
+def build_class(base: type, configuration) -> type:
+    """
+    Build the InstrumentTable class of a mission configuration
+    """
 
-class InstrumentTable(Base.Base):
-    # Name Of Table
-    __tablename__ = f"{CONFIGURATION.mission_name}_instrument"
+    class InstrumentTable(base):
+        # Name Of Table
+        __tablename__ = f"{configuration.mission_name}_instrument"
 
-    # ID Of Instrument (Primary Key)
-    instrument_id = Column(Integer, primary_key=True)
+        # ID Of Instrument (Primary Key)
+        instrument_id = Column(Integer, primary_key=True)
 
-    # Full Name Of Instrument
-    full_name = Column(String)
+        # Full Name Of Instrument
+        full_name = Column(String)
 
-    # Short Name Of Instrument
-    short_name = Column(String)
+        # Short Name Of Instrument
+        short_name = Column(String)
 
-    # Description Of Instrument
-    description = Column(String)
+        # Description Of Instrument
+        description = Column(String)
 
-    def __init__(self, instrument_id: int, full_name: str, short_name: str, description: str) -> None:
-        """
-        Constructor for Instrument Table
-        """
-        self.instrument_id = instrument_id
-        self.full_name = full_name
-        self.short_name = short_name
-        self.description = description
+        def __init__(self, instrument_id: int, full_name: str, short_name: str, description: str) -> None:
+            """
+            Constructor for Instrument Table
+            """
+            self.instrument_id = instrument_id
+            self.full_name = full_name
+            self.short_name = short_name
+            self.description = description
 
-    def __repr__(self) -> str:
-        return super().__repr__()
+        def __repr__(self) -> str:
+            return super().__repr__()
+
+    return InstrumentTable
 
 
 def return_class() -> type:
     """
     Return Class
     """
-    return InstrumentTable
+    return Registry.get_mission_tables().InstrumentTable
+
+
+def __getattr__(name: str):
+    # InstrumentTable of the current configuration, built on first use
+    if name == "InstrumentTable":
+        return return_class()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
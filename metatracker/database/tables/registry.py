@@ -0,0 +1,160 @@
+"""
+Table classes per mission configuration
+
+Table names depend on the mission (e.g. ``padre_science_file``) and the instrument configuration
+table has a column per instrument, so the table classes are built from a configuration on first
+use instead of on import, each configuration with its own declarative base and ``MetaData``.
+Built tables are cached by the parts of the configuration that shape the schema.
+
+Configurations of other missions than the current one are registered with ``register_mission``,
+after which trackers and ``create_tables`` select them by mission name, so one process (and one
+engine) can serve several missions.
+"""
+
+import threading
+from typing import Union
+
+from metatracker.config import config as Config
+
+from . import base_table as Base
+from . import file_level_table as FileLevelTable
+from . import file_type_table as FileTypeTable
+from . import instrument_configuration_table as InstrumentConfigurationTable
+from . import instrument_table as InstrumentTable
+from . import science_file_table as ScienceFileTable
+from . import science_product_table as ScienceProductTable
+from . import seed_table as SeedTable
+from . import status_table as StatusTable
+
+_mission_tables = {}
+_mission_tables_lock = threading.Lock()
+
+# Registered mission configurations, by mission name
+_missions = {}
+
+
+class MissionTables:
+    """
+    Declarative base, ``MetaData`` and table classes of one mission configuration
+    """
+
+    def __init__(self, configuration) -> None:
+        self.configuration = configuration
+        self.mission_name = configuration.mission_name
+
+        self.Base = Base.create_base()
+        self.metadata = self.Base.metadata
+
+        self.FileLevelTable = FileLevelTable.build_class(self.Base, configuration)
+        self.FileTypeTable = FileTypeTable.build_class(self.Base, configuration)
+        self.InstrumentTable = InstrumentTable.build_class(self.Base, configuration)
+        self.InstrumentConfigurationTable = InstrumentConfigurationTable.build_class(self.Base, configuration)
+        self.ScienceProductTable = ScienceProductTable.build_class(self.Base, configuration)
+        self.ScienceFileTable = ScienceFileTable.build_class(self.Base, configuration)
+
+        self.status_origin_association = StatusTable.build_association_table(self.metadata, configuration)
+        self.science_file_lineage = StatusTable.build_lineage_table(self.metadata, configuration)
+        self.StatusTable = StatusTable.build_class(self.Base, configuration, self.status_origin_association)
+
+        self.seed = SeedTable.build_table(self.metadata, configuration)
+
+    @property
+    def table_classes(self) -> list:
+        """Table classes, in the order they are created and populated"""
+
+        return [
+            self.FileLevelTable,
+            self.FileTypeTable,
+            self.InstrumentTable,
+            self.InstrumentConfigurationTable,
+            self.ScienceProductTable,
+            self.ScienceFileTable,
+            self.StatusTable,
+        ]
+
+    def __repr__(self) -> str:
+        return f"MissionTables(mission_name={self.mission_name})"
+
+
+def schema_key(configuration) -> tuple:
+    """
+    Parts of a configuration that shape the schema, the cache key of its tables
+    """
+
+    return configuration.mission_name, len(configuration.instruments)
+
+
+def register_mission(configuration: Union[dict, Config.MetaTrackerConfiguration]) -> Config.MetaTrackerConfiguration:
+    """
+    Register the configuration of a mission, replacing an earlier configuration of the mission
+
+    :param configuration: Mission configuration, or a configuration dictionary as accepted by
+        ``set_config``
+    :type configuration: dict or metatracker.config.config.MetaTrackerConfiguration
+    :return: Registered configuration
+    :rtype: metatracker.config.config.MetaTrackerConfiguration
+    """
+
+    if not isinstance(configuration, Config.MetaTrackerConfiguration):
+        configuration = Config.MetaTrackerConfiguration(dict(configuration))
+
+    _missions[configuration.mission_name] = configuration
+
+    return configuration
+
+
+def get_mission_configuration(
+    mission: Union[None, str, dict, Config.MetaTrackerConfiguration] = None,
+) -> Config.MetaTrackerConfiguration:
+    """
+    Resolve a mission to its configuration
+
+    :param mission: Name of a registered mission (or of the current configuration), a
+        configuration or a configuration dictionary. Defaults to the current configuration.
+    :type mission: str, dict or metatracker.config.config.MetaTrackerConfiguration
+    :return: Mission configuration
+    :rtype: metatracker.config.config.MetaTrackerConfiguration
+    """
+
+    if isinstance(mission, Config.MetaTrackerConfiguration):
+        return mission
+
+    if isinstance(mission, dict):
+        return Config.MetaTrackerConfiguration(dict(mission))
+
+    from metatracker import get_config
+
+    if mission is None:
+        return get_config()
+
+    if mission in _missions:
+        return _missions[mission]
+
+    if get_config().mission_name == mission:
+        return get_config()
+
+    raise ValueError(f"Mission {mission!r} is not registered, register its configuration with register_mission()")
+
+
+def get_mission_tables(mission: Union[None, str, dict, Config.MetaTrackerConfiguration] = None) -> MissionTables:
+    """
+    Get the tables of a mission, building them on first use
+
+    :param mission: Mission name, configuration or configuration dictionary (see
+        get_mission_configuration), defaults to the current configuration
+    :type mission: str, dict or metatracker.config.config.MetaTrackerConfiguration
+    :return: Tables of the mission
+    :rtype: MissionTables
+    """
+
+    configuration = get_mission_configuration(mission)
+
+    key = schema_key(configuration)
+    tables = _mission_tables.get(key)
+    if tables is None:
+        with _mission_tables_lock:
+            tables = _mission_tables.get(key)
+            if tables is None:
+                tables = _mission_tables[key] = MissionTables(configuration)
+
+    return tables
@@ -2,52 +2,85 @@
 # Schema:
 #   science_product_id: int (primary key)
 #   instrument_configuration_id: int (foreign key)
-#   mode: str
+#   mode: str (empty string when the science product has no mode)
 #   reference_timestamp: datetime
+# Indexes:
+#   (instrument_configuration_id, mode, reference_timestamp) (unique)
+#   (reference_timestamp, science_product_id)
 
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
 
-from metatracker import CONFIGURATION
+from . import registry as Registry
 
-from . import base_table as Base
 
+def build_class(base: type, configuration) -> type:
+    """
+    Build the ScienceProductTable class of a mission configuration
+    """
+    from sqlalchemy.orm import relationship
+
+    class ScienceProductTable(base):
+        __tablename__ = f"{configuration.mission_name}_science_product"
 
-class ScienceProductTable(Base.Base):
-    __tablename__ = f"{CONFIGURATION.mission_name}_science_product"
+        # Natural Key Of Science Product (Unique)
+        __table_args__ = (
+            Index(
+                f"ix_{configuration.mission_name}_science_product_natural_key",
+                "instrument_configuration_id",
+                "mode",
+                "reference_timestamp",
+                unique=True,
+            ),
+            # Time range queries, in the order they are paged through
+            Index(
+                f"ix_{configuration.mission_name}_science_product_reference_timestamp",
+                "reference_timestamp",
+                "science_product_id",
+            ),
+        )
 
-    # ID Of Science Product (Primary Key)
-    science_product_id = Column(Integer, primary_key=True, autoincrement=True)
+        # ID Of Science Product (Primary Key)
+        science_product_id = Column(Integer, primary_key=True, autoincrement=True)
 
-    # ID Of Instrument Configuration (Foreign Key)
-    instrument_configuration_id = Column(
-        Integer, ForeignKey(f"{CONFIGURATION.mission_name}_instrument_configuration.instrument_configuration_id")
-    )
+        # ID Of Instrument Configuration (Foreign Key)
+        instrument_configuration_id = Column(
+            Integer, ForeignKey(f"{configuration.mission_name}_instrument_configuration.instrument_configuration_id")
+        )
 
-    # Mode Of Science Product
-    mode = Column(String)
+        # Mode Of Science Product, never NULL so the natural key stays unique (NULLs never conflict)
+        mode = Column(String, nullable=False, default="", server_default="")
 
-    # Reference Timestamp Of Science Product
-    reference_timestamp = Column(DateTime)
+        # Reference Timestamp Of Science Product
+        reference_timestamp = Column(DateTime)
 
-    children = relationship("ScienceFileTable", back_populates="parent", cascade="all, delete")
+        children = relationship("ScienceFileTable", back_populates="parent", cascade="all, delete")
 
-    def __init__(self, instrument_configuration_id: int, mode: str, reference_timestamp: datetime) -> None:
-        """
-        Constructor for Science Product Table
-        """
-        self.instrument_configuration_id = instrument_configuration_id
-        self.mode = mode
-        self.reference_timestamp = reference_timestamp
+        def __init__(self, instrument_configuration_id: int, mode: str, reference_timestamp: datetime) -> None:
+            """
+            Constructor for Science Product Table
+            """
+            self.instrument_configuration_id = instrument_configuration_id
+            self.mode = mode or ""
+            self.reference_timestamp = reference_timestamp
 
-    def __repr__(self) -> str:
-        return super().__repr__()
+        def __repr__(self) -> str:
+            return super().__repr__()
+
+    return ScienceProductTable
 
 
 def return_class() -> type:
     """
     Return Class
     """
-    return ScienceProductTable
+    return Registry.get_mission_tables().ScienceProductTable
+
+
+def __getattr__(name: str):
+    # ScienceProductTable of the current configuration, built on first use
+    if name == "ScienceProductTable":
+        return return_class()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,23 @@
+# Seed Table
+# Fingerprint of the schema and reference data (seed) that create_tables last set up, so that
+# create_tables on an up-to-date database is a single query
+# Schema:
+#   name: str (primary key)
+#   fingerprint: str
+#   updated_at: datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table
+
+
+def build_table(metadata: MetaData, configuration) -> Table:
+    """
+    Build the seed fingerprint table of a mission configuration
+    """
+
+    return Table(
+        f"{configuration.mission_name}_seed",
+        metadata,
+        Column("name", String, primary_key=True),
+        Column("fingerprint", String, nullable=False),
+        Column("updated_at", DateTime, nullable=False),
+    )
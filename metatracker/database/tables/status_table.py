@@ -1,7 +1,7 @@
 # Status Table
 # Schema:
 #   status_id: int (primary key)
-#   science_file_id: int (foreign key)
+#   science_file_id: int (foreign key) (unique) (indexed)
 #   processing_status: str
 #   processing_status_message: str
 #   original_processing_timestamp: datetime
@@ -9,79 +9,154 @@
 #   reprocessed_count: int
 #   processing_time_length: int
 #   origin_file_id: int (foreign key) (optional)
+#   lease_token: str (optional, set while a reprocessing worker has claimed the status)
+#   lease_expires_at: datetime (optional)
+# Indexes:
+#   (processing_status, last_processing_timestamp)
+#
+# Science File Lineage Table (closure of status_origin_association, maintained when enabled)
+# Schema:
+#   ancestor_id: int (foreign key) (primary key)
+#   descendant_id: int (foreign key) (primary key) (indexed)
+#   depth: int (length of the shortest path from the ancestor to the descendant)
 
 
-from sqlalchemy import Table, MetaData, Column, Integer, String, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Table, MetaData, Column, Index, Integer, String, DateTime, ForeignKey
 from datetime import datetime, timezone
 
-from metatracker import CONFIGURATION
-from . import base_table as Base
+from . import registry as Registry
 
 
-status_origin_association = Table(
-    f"{CONFIGURATION.mission_name}_status_origin_association",
-    Base.Base.metadata,
-    Column("status_id", Integer, ForeignKey(f"{CONFIGURATION.mission_name}_status.status_id"), primary_key=True),
-    Column(
-        "origin_file_id",
-        Integer,
-        ForeignKey(f"{CONFIGURATION.mission_name}_science_file.science_file_id"),
-        primary_key=True,
-    ),
-)
+def build_association_table(metadata: MetaData, configuration) -> Table:
+    """
+    Build the status to origin file association table of a mission configuration
+    """
 
+    return Table(
+        f"{configuration.mission_name}_status_origin_association",
+        metadata,
+        Column("status_id", Integer, ForeignKey(f"{configuration.mission_name}_status.status_id"), primary_key=True),
+        Column(
+            "origin_file_id",
+            Integer,
+            ForeignKey(f"{configuration.mission_name}_science_file.science_file_id"),
+            primary_key=True,
+        ),
+    )
 
-class StatusTable(Base.Base):
-    __tablename__ = f"{CONFIGURATION.mission_name}_status"
 
-    # Primary Key
-    status_id = Column(Integer, primary_key=True, autoincrement=True)
+def build_lineage_table(metadata: MetaData, configuration) -> Table:
+    """
+    Build the science file lineage closure table of a mission configuration
+    """
 
-    # Foreign Keys
-    science_file_id = Column(
-        Integer, ForeignKey(f"{CONFIGURATION.mission_name}_science_file.science_file_id"), nullable=False
+    return Table(
+        f"{configuration.mission_name}_science_file_lineage",
+        metadata,
+        Column(
+            "ancestor_id",
+            Integer,
+            ForeignKey(f"{configuration.mission_name}_science_file.science_file_id"),
+            primary_key=True,
+        ),
+        Column(
+            "descendant_id",
+            Integer,
+            ForeignKey(f"{configuration.mission_name}_science_file.science_file_id"),
+            primary_key=True,
+            index=True,
+        ),
+        Column("depth", Integer, nullable=False),
     )
 
-    # Many-to-many relationship to origin files
-    origin_files = relationship(
-        "ScienceFileTable",  # replace with actual class if it's named differently
-        secondary=status_origin_association,
-        backref="status_origins",
-        lazy="joined",
-    )
 
-    # Processing Information
-    processing_status = Column(String, nullable=False)
-    processing_status_message = Column(String, nullable=True)
-    original_processing_timestamp = Column(DateTime, nullable=False, default=datetime.now(timezone.utc))
-    last_processing_timestamp = Column(DateTime, nullable=False, default=datetime.now(timezone.utc))
-    reprocessed_count = Column(Integer, default=0)
-    processing_time_length = Column(Integer, nullable=True)  # seconds
-
-    def __init__(
-        self,
-        science_file_id: int,
-        processing_status: String,
-        processing_status_message: str = None,
-        original_processing_timestamp: datetime = None,
-        last_processing_timestamp: datetime = None,
-        reprocessed_count: int = 0,
-        processing_time_length: int = None,
-        origin_files: list = None,
-    ) -> None:
-        self.science_file_id = science_file_id
-        self.processing_status = processing_status
-        self.processing_status_message = processing_status_message
-        self.original_processing_timestamp = original_processing_timestamp or datetime.now(timezone.utc)
-        self.last_processing_timestamp = last_processing_timestamp or datetime.now(timezone.utc)
-        self.reprocessed_count = reprocessed_count
-        self.processing_time_length = processing_time_length
-        self.origin_files = origin_files
-
-    def __repr__(self) -> str:
-        return super().__repr__()
+def build_class(base: type, configuration, status_origin_association: Table) -> type:
+    """
+    Build the StatusTable class of a mission configuration
+    """
+    from sqlalchemy.orm import relationship
 
+    class StatusTable(base):
+        __tablename__ = f"{configuration.mission_name}_status"
+
+        # Lookup Of Statuses By Processing Status And Time (e.g. failed files since a date)
+        __table_args__ = (
+            Index(
+                f"ix_{configuration.mission_name}_status_processing_status_timestamp",
+                "processing_status",
+                "last_processing_timestamp",
+            ),
+        )
+
+        # Primary Key
+        status_id = Column(Integer, primary_key=True, autoincrement=True)
+
+        # Foreign Keys
+        science_file_id = Column(
+            Integer,
+            ForeignKey(f"{configuration.mission_name}_science_file.science_file_id"),
+            nullable=False,
+            unique=True,
+            index=True,
+        )
+
+        # Many-to-many relationship to origin files, loaded with a separate IN query when statuses
+        # are loaded, instead of joining every status query through the association table
+        origin_files = relationship(
+            "ScienceFileTable",  # replace with actual class if it's named differently
+            secondary=status_origin_association,
+            backref="status_origins",
+            lazy="selectin",
+        )
+
+        # Processing Information
+        processing_status = Column(String, nullable=False)
+        processing_status_message = Column(String, nullable=True)
+        original_processing_timestamp = Column(DateTime, nullable=False, default=datetime.now(timezone.utc))
+        last_processing_timestamp = Column(DateTime, nullable=False, default=datetime.now(timezone.utc))
+        reprocessed_count = Column(Integer, default=0)
+        processing_time_length = Column(Integer, nullable=True)  # seconds
+
+        # Reprocessing Lease (see MetaTracker.claim_failed)
+        lease_token = Column(String, nullable=True)
+        lease_expires_at = Column(DateTime, nullable=True)
+
+        def __init__(
+            self,
+            science_file_id: int,
+            processing_status: String,
+            processing_status_message: str = None,
+            original_processing_timestamp: datetime = None,
+            last_processing_timestamp: datetime = None,
+            reprocessed_count: int = 0,
+            processing_time_length: int = None,
+            origin_files: list = None,
+        ) -> None:
+            self.science_file_id = science_file_id
+            self.processing_status = processing_status
+            self.processing_status_message = processing_status_message
+            self.original_processing_timestamp = original_processing_timestamp or datetime.now(timezone.utc)
+            self.last_processing_timestamp = last_processing_timestamp or datetime.now(timezone.utc)
+            self.reprocessed_count = reprocessed_count
+            self.processing_time_length = processing_time_length
+            self.origin_files = origin_files
+
+        def __repr__(self) -> str:
+            return super().__repr__()
 
-def return_class() -> type:
     return StatusTable
+
+
+def return_class() -> type:
+    return Registry.get_mission_tables().StatusTable
+
+
+def __getattr__(name: str):
+    # Tables of the current configuration, built on first use
+    if name == "StatusTable":
+        return return_class()
+
+    if name in ("status_origin_association", "science_file_lineage"):
+        return getattr(Registry.get_mission_tables(), name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,429 @@
+"""
+Dialect aware insert-or-ignore and upsert statements
+
+PostgreSQL and SQLite use ``INSERT ... ON CONFLICT``, MySQL uses ``INSERT ... ON DUPLICATE KEY UPDATE``
+and every other dialect falls back to a SELECT followed by an INSERT inside a savepoint.
+
+NULLs never conflict in a unique index, so rows with a NULL in the conflict target also go
+through the SELECT first. Science products store a missing mode as an empty string, so they
+always take the single statement path.
+"""
+
+import importlib
+from typing import Any, Callable, Optional
+
+from sqlalchemy import PrimaryKeyConstraint, UniqueConstraint, func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+ON_CONFLICT_DIALECTS = {"postgresql", "sqlite"}
+
+
+def dialect_insert(dialect_name: str) -> Callable:
+    """
+    Get the insert construct of a dialect, importing the dialect on first use
+
+    Only the dialects that are actually used get imported, which keeps them off the import
+    path of the package.
+
+    :param dialect_name: Dialect name (postgresql, sqlite, mysql or mariadb)
+    :type dialect_name: str
+    :return: Dialect specific insert construct
+    :rtype: Callable
+    """
+
+    module_name = "mysql" if dialect_name == "mariadb" else dialect_name
+
+    return importlib.import_module(f"sqlalchemy.dialects.{module_name}").insert
+
+
+def get_dialect(sql_session: type) -> type:
+    """
+    Get the dialect of the connection a session is bound to
+
+    :param sql_session: SQLAlchemy Session
+    :type sql_session: sqlalchemy.orm.session.Session
+    :return: SQLAlchemy Dialect
+    :rtype: sqlalchemy.engine.interfaces.Dialect
+    """
+
+    return sql_session.get_bind().dialect
+
+
+def has_unique_index(table_class: type, index_elements: list) -> bool:
+    """
+    Check if a table defines a unique constraint or index on exactly these columns
+
+    :param table_class: Table Class, or a plain Table (e.g. an association table)
+    :type table_class: sqlalchemy.ext.declarative.api.DeclarativeMeta
+    :param index_elements: Column names
+    :type index_elements: list
+    :return: True if the columns are unique together, False otherwise
+    :rtype: bool
+    """
+
+    table = getattr(table_class, "__table__", table_class)
+    columns = set(index_elements)
+
+    if len(columns) == 1 and table.c[index_elements[0]].unique:
+        return True
+
+    for index in table.indexes:
+        if index.unique and {column.name for column in index.columns} == columns:
+            return True
+
+    for constraint in table.constraints:
+        if (
+            isinstance(constraint, (UniqueConstraint, PrimaryKeyConstraint))
+            and {column.name for column in constraint.columns} == columns
+        ):
+            return True
+
+    return False
+
+
+def supports_on_conflict(sql_session: type, table_class: type, index_elements: list) -> bool:
+    """
+    Check if a conflict on these columns can be handled by the database itself
+
+    :param sql_session: SQLAlchemy Session
+    :type sql_session: sqlalchemy.orm.session.Session
+    :param table_class: Table Class
+    :type table_class: sqlalchemy.ext.declarative.api.DeclarativeMeta
+    :param index_elements: Column names of the conflict target
+    :type index_elements: list
+    :return: True if the dialect supports upserts on these columns
+    :rtype: bool
+    """
+
+    dialect = get_dialect(sql_session)
+
+    if dialect.name not in ON_CONFLICT_DIALECTS and dialect.name not in ("mysql", "mariadb"):
+        return False
+
+    return has_unique_index(table_class, index_elements)
+
+
+def has_null_key(values: dict, index_elements: list) -> bool:
+    """
+    Check if a row has a NULL in its conflict target
+
+    :param values: Column values of the row
+    :type values: dict
+    :param index_elements: Column names of the conflict target
+    :type index_elements: list
+    :return: True if any of the conflict target values is None
+    :rtype: bool
+    """
+
+    return any(values[name] is None for name in index_elements)
+
+
+def select_primary_key(sql_session: type, table_class: type, values: dict, index_elements: list) -> Optional[Any]:
+    """
+    Select the primary key of the row matching the conflict target
+
+    :param sql_session: SQLAlchemy Session
+    :type sql_session: sqlalchemy.orm.session.Session
+    :param table_class: Table Class
+    :type table_class: sqlalchemy.ext.declarative.api.DeclarativeMeta
+    :param values: Column values of the row
+    :type values: dict
+    :param index_elements: Column names of the conflict target
+    :type index_elements: list
+    :return: Primary key of the row or None if it doesn't exist
+    :rtype: Any
+    """
+
+    table = table_class.__table__
+    primary_key = table.primary_key.columns.values()[0]
+
+    statement = select(primary_key).where(*[table.c[name] == values[name] for name in index_elements])
+
+    return sql_session.execute(statement).scalars().first()
+
+
+def insert_or_ignore(sql_session: type, table_class: type, values: dict, index_elements: list) -> Any:
+    """
+    Insert a row unless one already exists with the same conflict target
+
+    A duplicate costs a single round-trip (plus a SELECT on PostgreSQL and SQLite) and never raises.
+
+    :param sql_session: SQLAlchemy Session
+    :type sql_session: sqlalchemy.orm.session.Session
+    :param table_class: Table Class
+    :type table_class: sqlalchemy.ext.declarative.api.DeclarativeMeta
+    :param values: Column values of the row
+    :type values: dict
+    :param index_elements: Column names of the conflict target
+    :type index_elements: list
+    :return: Primary key of the inserted or existing row
+    :rtype: Any
+    """
+
+    table = table_class.__table__
+    primary_key = table.primary_key.columns.values()[0]
+    dialect = get_dialect(sql_session)
+
+    if supports_on_conflict(sql_session, table_class, index_elements) and not has_null_key(values, index_elements):
+        if dialect.name in ON_CONFLICT_DIALECTS and dialect.insert_returning:
+            statement = (
+                dialect_insert(dialect.name)(table)
+                .values(**values)
+                .on_conflict_do_nothing(index_elements=index_elements)
+                .returning(primary_key)
+            )
+            inserted = sql_session.execute(statement).scalars().first()
+            if inserted is not None:
+                return inserted
+
+            return select_primary_key(sql_session, table_class, values, index_elements)
+
+        if dialect.name in ("mysql", "mariadb"):
+            # LAST_INSERT_ID(pk) makes lastrowid point at the existing row on duplicates
+            statement = (
+                dialect_insert("mysql")(table)
+                .values(**values)
+                .on_duplicate_key_update({primary_key.name: func.last_insert_id(primary_key)})
+            )
+            return sql_session.execute(statement).lastrowid
+
+    existing = select_primary_key(sql_session, table_class, values, index_elements)
+    if existing is not None:
+        return existing
+
+    try:
+        with sql_session.begin_nested():
+            return sql_session.execute(insert(table).values(**values)).inserted_primary_key[0]
+    except IntegrityError:
+        # Lost the race against a concurrent writer, the row exists now
+        return select_primary_key(sql_session, table_class, values, index_elements)
+
+
+def upsert(sql_session: type, table_class: type, values: dict, index_elements: list, update_values: dict) -> Any:
+    """
+    Insert a row, or update it with ``update_values`` if one already exists with the same conflict target
+
+    ``update_values`` may contain SQL expressions referencing the existing row (e.g. ``column + 1``).
+
+    :param sql_session: SQLAlchemy Session
+    :type sql_session: sqlalchemy.orm.session.Session
+    :param table_class: Table Class
+    :type table_class: sqlalchemy.ext.declarative.api.DeclarativeMeta
+    :param values: Column values of the inserted row
+    :type values: dict
+    :param index_elements: Column names of the conflict target
+    :type index_elements: list
+    :param update_values: Column values of the updated row
+    :type update_values: dict
+    :return: Primary key of the inserted or updated row
+    :rtype: Any
+    """
+
+    table = table_class.__table__
+    primary_key = table.primary_key.columns.values()[0]
+    dialect = get_dialect(sql_session)
+
+    if supports_on_conflict(sql_session, table_class, index_elements) and not has_null_key(values, index_elements):
+        if dialect.name in ON_CONFLICT_DIALECTS and dialect.insert_returning:
+            statement = (
+                dialect_insert(dialect.name)(table)
+                .values(**values)
+                .on_conflict_do_update(index_elements=index_elements, set_=update_values)
+                .returning(primary_key)
+            )
+            return sql_session.execute(statement).scalars().one()
+
+        if dialect.name in ("mysql", "mariadb"):
+            statement = (
+                dialect_insert("mysql")(table)
+                .values(**values)
+                .on_duplicate_key_update({**update_values, primary_key.name: func.last_insert_id(primary_key)})
+            )
+            return sql_session.execute(statement).lastrowid
+
+    existing = select_primary_key(sql_session, table_class, values, index_elements)
+    if existing is None:
+        try:
+            with sql_session.begin_nested():
+                return sql_session.execute(insert(table).values(**values)).inserted_primary_key[0]
+        except IntegrityError:
+            existing = select_primary_key(sql_session, table_class, values, index_elements)
+
+    sql_session.execute(table.update().where(primary_key == existing).values(**update_values))
+
+    return existing
+
+
+def upsert_many(
+    sql_session: type,
+    table_class: type,
+    rows: list,
+    index_elements: list,
+    update_columns: list,
+    update_values: dict = None,
+) -> None:
+    """
+    Insert many rows with a single multi-row INSERT, updating the rows that already exist with
+    the same conflict target
+
+    Existing rows take the ``update_columns`` of the inserted row and ``update_values``, which may
+    contain SQL expressions referencing the existing row (e.g. ``column + 1``). A conflict target
+    may only appear once in ``rows``. On dialects without upsert support, and for rows with a
+    NULL in the conflict target, the rows go through ``upsert`` one by one.
+
+    :param sql_session: SQLAlchemy Session
+    :type sql_session: sqlalchemy.orm.session.Session
+    :param table_class: Table Class
+    :type table_class: sqlalchemy.ext.declarative.api.DeclarativeMeta
+    :param rows: Column values of the inserted rows
+    :type rows: list
+    :param index_elements: Column names of the conflict target
+    :type index_elements: list
+    :param update_columns: Column names updated with the values of the inserted row
+    :type update_columns: list
+    :param update_values: Column values of the updated rows
+    :type update_values: dict
+    :return: None
+    :rtype: None
+    """
+
+    update_values = update_values or {}
+    if not rows:
+        return
+
+    table = table_class.__table__
+    dialect = get_dialect(sql_session)
+
+    if supports_on_conflict(sql_session, table_class, index_elements):
+        keyed_rows = [row for row in rows if not has_null_key(row, index_elements)]
+    else:
+        keyed_rows = []
+
+    if keyed_rows:
+        if dialect.name in ON_CONFLICT_DIALECTS:
+            statement = dialect_insert(dialect.name)(table).values(keyed_rows)
+            statement = statement.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={**{name: statement.excluded[name] for name in update_columns}, **update_values},
+            )
+        else:
+            statement = dialect_insert("mysql")(table).values(keyed_rows)
+            statement = statement.on_duplicate_key_update(
+                {**{name: statement.inserted[name] for name in update_columns}, **update_values}
+            )
+        sql_session.execute(statement)
+
+    for row in rows:
+        if keyed_rows and not has_null_key(row, index_elements):
+            continue
+
+        upsert(
+            sql_session,
+            table_class,
+            row,
+            index_elements,
+            {**{name: row[name] for name in update_columns}, **update_values},
+        )
+
+
+def on_duplicate_key_ignore(statement: type, table: type) -> type:
+    """
+    Make a MySQL insert skip the rows with a duplicate key
+
+    The primary key is set to itself on duplicates, unlike ``INSERT IGNORE``, which also turns
+    foreign key, NOT NULL and truncation errors into warnings.
+
+    :param statement: MySQL insert
+    :type statement: sqlalchemy.dialects.mysql.Insert
+    :param table: Table inserted into
+    :type table: sqlalchemy.Table
+    :return: Insert with an ON DUPLICATE KEY UPDATE clause
+    :rtype: sqlalchemy.dialects.mysql.Insert
+    """
+
+    primary_key = table.primary_key.columns.values()[0]
+
+    return statement.on_duplicate_key_update({primary_key.name: primary_key})
+
+
+def insert_many_or_ignore(sql_session: type, table_class: type, rows: list, index_elements: list) -> None:
+    """
+    Insert many rows with a single multi-row INSERT, skipping rows that conflict with existing ones
+
+    On dialects without upsert support the rows are inserted as is. Rows with a NULL in the
+    conflict target are never skipped, so callers should deduplicate them beforehand.
+
+    :param sql_session: SQLAlchemy Session
+    :type sql_session: sqlalchemy.orm.session.Session
+    :param table_class: Table Class, or a plain Table (e.g. an association table)
+    :type table_class: sqlalchemy.ext.declarative.api.DeclarativeMeta
+    :param rows: Column values of the rows
+    :type rows: list
+    :param index_elements: Column names of the conflict target
+    :type index_elements: list
+    :return: None
+    :rtype: None
+    """
+
+    if not rows:
+        return
+
+    table = getattr(table_class, "__table__", table_class)
+    dialect = get_dialect(sql_session)
+
+    if supports_on_conflict(sql_session, table_class, index_elements):
+        if dialect.name in ON_CONFLICT_DIALECTS:
+            statement = (
+                dialect_insert(dialect.name)(table).values(rows).on_conflict_do_nothing(index_elements=index_elements)
+            )
+        else:
+            statement = on_duplicate_key_ignore(dialect_insert("mysql")(table).values(rows), table)
+    else:
+        statement = insert(table).values(rows)
+
+    sql_session.execute(statement)
+
+
+def insert_from_select_or_ignore(
+    sql_session: type, table_class: type, columns: list, select_statement: type, index_elements: list
+) -> None:
+    """
+    Insert the rows returned by a SELECT with a single INSERT ... SELECT, skipping rows that
+    conflict with existing ones
+
+    The rows never go through Python. The SELECT should already leave out existing rows (e.g.
+    with NOT EXISTS) so that dialects without upsert support can run it as is, conflict handling
+    only covers rows inserted concurrently.
+
+    :param sql_session: SQLAlchemy Session
+    :type sql_session: sqlalchemy.orm.session.Session
+    :param table_class: Table Class, or a plain Table (e.g. an association table)
+    :type table_class: sqlalchemy.ext.declarative.api.DeclarativeMeta
+    :param columns: Column names filled by the SELECT, in order
+    :type columns: list
+    :param select_statement: SELECT returning the rows to insert
+    :type select_statement: sqlalchemy.sql.expression.Select
+    :param index_elements: Column names of the conflict target
+    :type index_elements: list
+    :return: None
+    :rtype: None
+    """
+
+    table = getattr(table_class, "__table__", table_class)
+    dialect = get_dialect(sql_session)
+
+    if supports_on_conflict(sql_session, table_class, index_elements):
+        if dialect.name in ON_CONFLICT_DIALECTS:
+            statement = (
+                dialect_insert(dialect.name)(table)
+                .from_select(columns, select_statement)
+                .on_conflict_do_nothing(index_elements=index_elements)
+            )
+        else:
+            statement = on_duplicate_key_ignore(
+                dialect_insert("mysql")(table).from_select(columns, select_statement), table
+            )
+    else:
+        statement = insert(table).from_select(columns, select_statement)
+
+    sql_session.execute(statement)
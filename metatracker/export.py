@@ -0,0 +1,290 @@
+"""
+Export the catalog of a mission
+
+Streams the science product table joined to its science files and their status (one row per
+science file, with the ids of its origin files, and one per science product without files) to
+NDJSON or CSV, optionally gzipped, or to Parquet when pyarrow is installed. Rows name the
+instruments of their instrument configuration, so an export can be restored into a database
+whose reference tables have other ids. Rows are read with a server-side cursor in pages of ``batch_size`` and
+written page by page, so memory use doesn't grow with the size of the catalog, and the whole
+export is read in a single transaction, so it is a consistent snapshot.
+"""
+
+import csv
+import functools
+import gzip
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from sqlalchemy import Boolean, DateTime, Integer, select
+
+from metatracker import log
+from metatracker.database import create_session
+from metatracker.database.tables import MissionTables, get_mission_tables
+from metatracker.tracker.tracker import MetaTracker
+
+FORMATS = ("ndjson", "csv", "parquet")
+
+# Lists added to the catalog columns of every row, written to CSV as JSON
+LIST_COLUMNS = ("instrument_short_names", "origin_file_ids")
+
+# Dialects that take a snapshot for the whole transaction at REPEATABLE READ (the default of
+# SQLite, where a read transaction always sees a snapshot)
+SNAPSHOT_DIALECTS = {"postgresql", "mysql", "mariadb"}
+
+
+def get_catalog_columns(tables: MissionTables) -> list:
+    """
+    Columns of the catalog, named after the table columns they are read from
+
+    Product columns come first, then file and status columns, leaving out the foreign keys that
+    repeat a column already listed.
+
+    :param tables: Tables of the mission
+    :type tables: MissionTables
+    :return: List of Columns
+    :rtype: list
+    """
+
+    columns = {}
+    for table_class in (tables.ScienceProductTable, tables.ScienceFileTable, tables.StatusTable):
+        for column in table_class.__table__.columns:
+            columns.setdefault(column.name, column)
+
+    return list(columns.values())
+
+
+def iter_catalog(engine: type, mission=None, batch_size: int = 10000) -> Iterator:
+    """
+    Stream the catalog, in pages of at most batch_size rows
+
+    Each row is a dictionary of the catalog columns plus ``instrument_short_names``, the
+    (sorted) instruments of its instrument configuration, and ``origin_file_ids``, the (sorted)
+    ids of the origin files of its status, in science product and science file order. Science
+    products without science files get a row whose file and status columns are None.
+
+    Origin files are joined in the same query, one result row per origin file, and folded into
+    their catalog row, so the server-side cursor is the only statement of the transaction.
+
+    :param engine: SQLAlchemy Engine
+    :type engine: sqlalchemy.engine.base.Engine
+    :param mission: Mission name or configuration, defaults to the current configuration
+    :type mission: str or metatracker.config.config.MetaTrackerConfiguration
+    :param batch_size: Rows per page
+    :type batch_size: int
+    :return: Iterator of lists of rows
+    :rtype: Iterator
+    """
+
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+
+    tables = get_mission_tables(mission)
+    science_product = tables.ScienceProductTable
+    science_file = tables.ScienceFileTable
+    status = tables.StatusTable
+    association = tables.status_origin_association
+
+    query = (
+        select(*get_catalog_columns(tables), association.c.origin_file_id)
+        .select_from(science_product)
+        .outerjoin(science_file, science_file.science_product_id == science_product.science_product_id)
+        .outerjoin(status, status.science_file_id == science_file.science_file_id)
+        .outerjoin(association, association.c.status_id == status.status_id)
+        .order_by(science_product.science_product_id, science_file.science_file_id, association.c.origin_file_id)
+    )
+
+    with engine.connect() as connection:
+        if engine.dialect.name in SNAPSHOT_DIALECTS:
+            connection.execution_options(isolation_level="REPEATABLE READ")
+
+        with connection.begin():
+            # Read in the same snapshot, before the server-side cursor is opened
+            instrument_configurations = MetaTracker.get_instrument_configurations(create_session(connection), tables)
+
+            result = connection.execute(query, execution_options={"stream_results": True, "yield_per": batch_size})
+            keys = list(result.keys())[:-1]
+
+            rows = []
+            last_values = None
+            for partition in result.partitions():
+                for *values, origin_file_id in partition:
+                    if values != last_values:
+                        last_values = values
+                        row = dict(zip(keys, values))
+                        row["instrument_short_names"] = instrument_configurations[row["instrument_configuration_id"]]
+                        row["origin_file_ids"] = []
+                        rows.append(row)
+                    if origin_file_id is not None:
+                        rows[-1]["origin_file_ids"].append(origin_file_id)
+
+                # The last row can have more origin files on the next partition
+                while len(rows) > batch_size:
+                    yield rows[:batch_size]
+                    rows = rows[batch_size:]
+
+            if rows:
+                yield rows
+
+
+def get_format(path: Path, file_format: Optional[str] = None) -> tuple:
+    """
+    Format of an export file and whether it is gzipped, from its suffixes unless given
+    (format, compress)
+
+    :param path: Path of the export file
+    :type path: pathlib.Path
+    :param file_format: One of FORMATS, inferred from the suffix when None
+    :type file_format: str
+    :return: Format and whether the file is gzipped
+    :rtype: tuple
+    """
+
+    suffixes = [suffix.lower() for suffix in Path(path).suffixes]
+    compress = bool(suffixes) and suffixes[-1] == ".gz"
+    if compress:
+        suffixes = suffixes[:-1]
+
+    if file_format is None:
+        suffix = suffixes[-1] if suffixes else ""
+        file_format = {".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv", ".parquet": "parquet"}.get(suffix)
+        if file_format is None:
+            raise ValueError(f"Could not infer the format of {path}, pass one of {FORMATS}")
+
+    if file_format not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}, not {file_format!r}")
+
+    return file_format, compress
+
+
+def encode_datetime(value: object) -> str:
+    """Encode the datetimes of NDJSON rows as ISO 8601 strings"""
+
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def write_ndjson(stream: object, pages: Iterator) -> int:
+    """Write pages of rows as one JSON object per line"""
+
+    # The C encoder only calls back into Python for datetimes
+    encode = json.JSONEncoder(default=encode_datetime).encode
+
+    written = 0
+    for rows in pages:
+        stream.writelines(encode(row) + "\n" for row in rows)
+        written += len(rows)
+
+    return written
+
+
+def write_csv(stream: object, pages: Iterator, columns: list) -> int:
+    """Write pages of rows as CSV with a header
+
+    None is written as an empty field, datetimes as ISO 8601 with a space between the date and
+    time and the LIST_COLUMNS (the last columns) as JSON lists.
+    """
+
+    writer = csv.writer(stream)
+    writer.writerow(columns)
+
+    list_columns = len(LIST_COLUMNS)
+    written = 0
+    for rows in pages:
+        writer.writerows(
+            [*list(row.values())[:-list_columns], *(json.dumps(row[name]) for name in LIST_COLUMNS)] for row in rows
+        )
+        written += len(rows)
+
+    return written
+
+
+def write_parquet(path: Path, pages: Iterator, columns: list) -> int:
+    """Write pages of rows as row groups of a Parquet file"""
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Exporting to Parquet needs pyarrow, install it with the parquet extra") from None
+
+    def arrow_type(column: type) -> type:
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        return pa.string()
+
+    schema = pa.schema(
+        [pa.field(column.name, arrow_type(column)) for column in columns]
+        + [
+            pa.field("instrument_short_names", pa.list_(pa.string())),
+            pa.field("origin_file_ids", pa.list_(pa.int64())),
+        ]
+    )
+
+    written = 0
+    with pq.ParquetWriter(str(path), schema) as writer:
+        for rows in pages:
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+            written += len(rows)
+
+    return written
+
+
+def export_catalog(
+    engine: type,
+    path: Path,
+    file_format: Optional[str] = None,
+    mission=None,
+    batch_size: int = 10000,
+) -> int:
+    """
+    Export the catalog of a mission to a file
+
+    The format is inferred from the suffix of ``path`` (``.ndjson``/``.jsonl``, ``.csv`` or
+    ``.parquet``) unless given, and NDJSON and CSV files ending in ``.gz`` are gzipped.
+
+    :param engine: SQLAlchemy Engine
+    :type engine: sqlalchemy.engine.base.Engine
+    :param path: Path of the export file
+    :type path: pathlib.Path
+    :param file_format: One of FORMATS, inferred from the suffix when None
+    :type file_format: str
+    :param mission: Mission name or configuration, defaults to the current configuration
+    :type mission: str or metatracker.config.config.MetaTrackerConfiguration
+    :param batch_size: Rows read and written at a time
+    :type batch_size: int
+    :return: Number of rows written
+    :rtype: int
+    """
+
+    path = Path(path)
+    file_format, compress = get_format(path, file_format)
+
+    columns = get_catalog_columns(get_mission_tables(mission))
+    pages = iter_catalog(engine, mission=mission, batch_size=batch_size)
+
+    if file_format == "parquet":
+        if compress:
+            raise ValueError("Parquet files are compressed by pyarrow, .gz is only supported for NDJSON and CSV")
+        written = write_parquet(path, pages, columns)
+    else:
+        # zlib's default level, level 9 (the default of gzip.open) is several times slower for a few
+        # percent smaller files
+        open_file = functools.partial(gzip.open, compresslevel=6) if compress else open
+        with open_file(path, "wt", encoding="utf-8", newline="") as stream:
+            if file_format == "ndjson":
+                written = write_ndjson(stream, pages)
+            else:
+                written = write_csv(stream, pages, [column.name for column in columns] + list(LIST_COLUMNS))
+
+    log.debug(f"Exported {written} rows to {path}")
+
+    return written
@@ -0,0 +1,419 @@
+"""
+Restore the catalog of a mission from an export
+
+Reads a file written by ``metatracker.export`` (NDJSON or CSV, optionally gzipped, or Parquet)
+into an empty catalog in one transaction. The reference tables are set up from the
+configuration, then science products, science files and statuses are loaded page by page and
+origin file associations in a second pass, so every row is loaded after the rows it references.
+Primary keys are kept as exported, PostgreSQL sequences are moved past them afterwards. Science
+products get the id of the instrument configuration with their instruments in the database
+restored into, and file types and levels are checked against its reference tables.
+
+PostgreSQL (with psycopg2 or psycopg) loads every page with ``COPY ... FROM STDIN``, other
+databases with one ``executemany`` INSERT per table per page.
+"""
+
+import csv
+import functools
+import gzip
+import io
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import Boolean, DateTime, Integer, func, insert, select, text
+
+from metatracker import log
+from metatracker.database import create_session
+from metatracker.database.tables import MissionTables, create_tables, get_mission_tables
+from metatracker.export import LIST_COLUMNS, get_catalog_columns, get_format
+from metatracker.tracker.tracker import MetaTracker
+
+# Drivers whose cursors can COPY FROM STDIN
+COPY_DRIVERS = {"psycopg2", "psycopg"}
+
+# Written for NULL in the CSV sent to COPY, so empty strings stay empty strings
+COPY_NULL = "\\N"
+
+
+def parse_boolean(value: str) -> bool:
+    """Parse a boolean written to CSV"""
+
+    return value.lower() in ("true", "t", "1")
+
+
+def get_decoders(columns: list, strings_only: bool) -> dict:
+    """
+    Functions turning exported values back into column values
+    {column name: function}
+
+    :param columns: Catalog columns
+    :type columns: list
+    :param strings_only: Whether every value was exported as a string (CSV), or only datetimes (NDJSON)
+    :type strings_only: bool
+    :return: Decoders by column name
+    :rtype: dict
+    """
+
+    decoders = {}
+    for column in columns:
+        if isinstance(column.type, DateTime):
+            decoders[column.name] = datetime.fromisoformat
+        elif strings_only and isinstance(column.type, Boolean):
+            decoders[column.name] = parse_boolean
+        elif strings_only and isinstance(column.type, Integer):
+            decoders[column.name] = int
+        elif strings_only and column.nullable:
+            # Only turns empty fields into None, empty fields of NOT NULL columns are empty strings
+            decoders[column.name] = str
+
+    if strings_only:
+        for name in LIST_COLUMNS:
+            decoders[name] = json.loads
+
+    return decoders
+
+
+def decode_rows(rows: list, decoders: dict, empty: object) -> list:
+    """Decode the values of rows in place, values equal to empty become None"""
+
+    for row in rows:
+        for name, decode in decoders.items():
+            value = row[name]
+            row[name] = None if value is None or value == empty else decode(value)
+
+    return rows
+
+
+def iter_pages(iterator: Iterator, batch_size: int) -> Iterator:
+    """Group an iterator into lists of at most batch_size items"""
+
+    page = []
+    for item in iterator:
+        page.append(item)
+        if len(page) == batch_size:
+            yield page
+            page = []
+
+    if page:
+        yield page
+
+
+def iter_export(
+    path: Path,
+    file_format: Optional[str] = None,
+    mission=None,
+    batch_size: int = 10000,
+    columns: Optional[list] = None,
+) -> Iterator:
+    """
+    Stream the rows of an export file, in pages of at most batch_size rows
+
+    Rows are dictionaries of the catalog columns and ``origin_file_ids``, as yielded by
+    ``metatracker.export.iter_catalog``.
+
+    :param path: Path of the export file
+    :type path: pathlib.Path
+    :param file_format: One of metatracker.export.FORMATS, inferred from the suffix when None
+    :type file_format: str
+    :param mission: Mission name or configuration, defaults to the current configuration
+    :type mission: str or metatracker.config.config.MetaTrackerConfiguration
+    :param batch_size: Rows per page
+    :type batch_size: int
+    :param columns: Only read these columns from Parquet files, rows of other formats have every column
+    :type columns: list
+    :return: Iterator of lists of rows
+    :rtype: Iterator
+    """
+
+    file_format, compress = get_format(path, file_format)
+    catalog_columns = get_catalog_columns(get_mission_tables(mission))
+
+    if file_format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet needs pyarrow, install it with the parquet extra") from None
+
+        for record_batch in pq.ParquetFile(str(path)).iter_batches(batch_size=batch_size, columns=columns):
+            yield record_batch.to_pylist()
+        return
+
+    open_file = gzip.open if compress else open
+    with open_file(path, "rt", encoding="utf-8", newline="") as stream:
+        if file_format == "ndjson":
+            decoders = get_decoders(catalog_columns, strings_only=False)
+            for lines in iter_pages((line for line in stream if line.strip()), batch_size):
+                yield decode_rows([json.loads(line) for line in lines], decoders, empty=None)
+        else:
+            decoders = get_decoders(catalog_columns, strings_only=True)
+            for rows in iter_pages(csv.DictReader(stream), batch_size):
+                yield decode_rows(rows, decoders, empty="")
+
+
+def execute_many(connection: type, table: type, rows: list) -> None:
+    """
+    Insert rows with a single executemany, straight on the driver cursor
+
+    Values are converted by the bind processors of the columns (e.g. datetimes to strings on
+    SQLite) once per column, rather than by SQLAlchemy once per row.
+
+    :param connection: SQLAlchemy Connection
+    :type connection: sqlalchemy.engine.Connection
+    :param table: Table
+    :type table: sqlalchemy.Table
+    :param rows: Rows, all with the same keys
+    :type rows: list
+    :return: None
+    :rtype: None
+    """
+
+    dialect = connection.dialect
+    columns = list(rows[0])
+    compiled = insert(table).compile(dialect=dialect, column_keys=columns)
+
+    values = {}
+    for name in columns:
+        column_values = [row[name] for row in rows]
+        processor = table.c[name].type.dialect_impl(dialect).bind_processor(dialect)
+        if processor is not None:
+            column_values = [None if value is None else processor(value) for value in column_values]
+        values[name] = column_values
+
+    if compiled.positional:
+        parameters = list(zip(*(values[name] for name in compiled.positiontup)))
+    else:
+        parameters = [dict(zip(values, row)) for row in zip(*values.values())]
+
+    connection.exec_driver_sql(compiled.string, parameters)
+
+
+def get_writer(connection: type) -> Callable:
+    """
+    Function loading a list of rows into a table on a connection, with COPY when the driver
+    supports it and executemany otherwise
+
+    :param connection: SQLAlchemy Connection
+    :type connection: sqlalchemy.engine.Connection
+    :return: Function taking a Table and a list of rows
+    :rtype: Callable
+    """
+
+    dialect = connection.dialect
+    if dialect.name != "postgresql" or dialect.driver not in COPY_DRIVERS:
+        return functools.partial(execute_many, connection)
+
+    preparer = dialect.identifier_preparer
+
+    def copy_rows(table: type, rows: list) -> None:
+        columns = list(rows[0])
+        statement = (
+            f"COPY {preparer.format_table(table)} ({', '.join(preparer.quote(name) for name in columns)})"
+            f" FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+        )
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows(
+            [
+                COPY_NULL if value is None else value.isoformat() if isinstance(value, datetime) else value
+                for value in row.values()
+            ]
+            for row in rows
+        )
+        buffer.seek(0)
+
+        cursor = connection.connection.driver_connection.cursor()
+        try:
+            if dialect.driver == "psycopg2":
+                cursor.copy_expert(statement, buffer)
+            else:
+                with cursor.copy(statement) as copy:
+                    copy.write(buffer.getvalue())
+        finally:
+            cursor.close()
+
+    return copy_rows
+
+
+def get_reference_keys(connection: type, tables: MissionTables) -> dict:
+    """
+    Natural keys of the reference tables of the database restored into
+    {"configuration_index": {frozenset(instrument_short_names): id}, "file_types": set, "file_levels": set}
+
+    :param connection: SQLAlchemy Connection
+    :type connection: sqlalchemy.engine.Connection
+    :param tables: Tables of the mission
+    :type tables: MissionTables
+    :return: Reference keys
+    :rtype: dict
+    """
+
+    session = create_session(connection)
+    instrument_configurations = MetaTracker.get_instrument_configurations(session, tables)
+
+    return {
+        "configuration_index": MetaTracker.get_configuration_index(instrument_configurations),
+        "file_types": {short_name for _, short_name in MetaTracker.get_file_types(session, tables)},
+        "file_levels": set(MetaTracker.get_file_levels(session, tables)),
+    }
+
+
+def resolve_references(products: list, files: list, reference_keys: dict) -> None:
+    """
+    Point science products at the instrument configuration of their instruments, and check the
+    file types and levels of science files, in the database restored into
+
+    :param products: Rows of the science products to load, updated in place
+    :type products: list
+    :param files: Rows of the science files to load
+    :type files: list
+    :param reference_keys: Reference keys of the database, from get_reference_keys
+    :type reference_keys: dict
+    :return: None
+    :rtype: None
+    """
+
+    configuration_index = reference_keys["configuration_index"]
+    for row in products:
+        instruments = frozenset(row["instrument_short_names"])
+        if instruments not in configuration_index:
+            raise ValueError(
+                f"Science product {row['science_product_id']} has no instrument configuration of "
+                f"{sorted(instruments)} to be restored with"
+            )
+        row["instrument_configuration_id"] = configuration_index[instruments]
+
+    for row in files:
+        for name, short_names in (
+            ("file_type", reference_keys["file_types"]),
+            ("file_level", reference_keys["file_levels"]),
+        ):
+            if row[name] is not None and row[name] not in short_names:
+                raise ValueError(f"Science file {row['science_file_id']} has the unknown {name} {row[name]!r}")
+
+
+def reset_sequences(connection: type, tables: MissionTables) -> None:
+    """
+    Move the PostgreSQL sequences of the catalog tables past the restored primary keys
+
+    SQLite and MySQL move their counters when a key is inserted explicitly.
+
+    :param connection: SQLAlchemy Connection
+    :type connection: sqlalchemy.engine.Connection
+    :param tables: Tables of the mission
+    :type tables: MissionTables
+    :return: None
+    :rtype: None
+    """
+
+    if connection.dialect.name != "postgresql":
+        return
+
+    for table_class in (tables.ScienceProductTable, tables.ScienceFileTable, tables.StatusTable):
+        table = table_class.__table__
+        (column,) = table.primary_key.columns
+        last_id = connection.scalar(select(func.max(column)))
+        connection.execute(
+            text("SELECT setval(pg_get_serial_sequence(:table, :column), :value, :is_called)"),
+            {"table": table.name, "column": column.name, "value": last_id or 1, "is_called": last_id is not None},
+        )
+
+
+def import_catalog(
+    engine: type,
+    path: Path,
+    file_format: Optional[str] = None,
+    mission=None,
+    batch_size: int = 10000,
+) -> dict:
+    """
+    Restore an exported catalog into the empty catalog tables of a mission
+
+    Tables that don't exist yet are created and the reference tables populated with
+    ``create_tables``. Everything else is loaded in a single transaction, so a failed import
+    leaves the catalog empty. A ValueError is raised if a catalog table isn't empty, or a row
+    refers to an instrument configuration, file type or file level the reference tables don't
+    have. The science file lineage closure table isn't restored, rebuild it with
+    ``MetaTracker.rebuild_lineage_closure()`` when it is used.
+
+    :param engine: SQLAlchemy Engine
+    :type engine: sqlalchemy.engine.base.Engine
+    :param path: Path of the export file
+    :type path: pathlib.Path
+    :param file_format: One of metatracker.export.FORMATS, inferred from the suffix when None
+    :type file_format: str
+    :param mission: Mission name or configuration, defaults to the current configuration
+    :type mission: str or metatracker.config.config.MetaTrackerConfiguration
+    :param batch_size: Rows read and written at a time
+    :type batch_size: int
+    :return: Number of rows loaded by table name
+    :rtype: dict
+    """
+
+    create_tables(engine, mission=mission)
+    tables = get_mission_tables(mission)
+
+    science_product = tables.ScienceProductTable.__table__
+    science_file = tables.ScienceFileTable.__table__
+    status = tables.StatusTable.__table__
+    association = tables.status_origin_association
+    loaded_tables = (science_product, science_file, status, association)
+    counts = {table.name: 0 for table in loaded_tables}
+
+    with engine.begin() as connection:
+        for table in loaded_tables:
+            if connection.execute(select(table).limit(1)).first() is not None:
+                raise ValueError(f"{table.name} is not empty, a catalog can only be imported into empty tables")
+
+        reference_keys = get_reference_keys(connection, tables)
+        write_rows = get_writer(connection)
+        # Products are repeated for each of their files (products without files have a row of their
+        # own), the ids already loaded are kept as a bitmap
+        loaded_products = bytearray()
+
+        column_names = {table: [column.name for column in table.columns] for table in loaded_tables}
+
+        def load(table: type, rows: list) -> None:
+            if rows:
+                names = column_names[table]
+                write_rows(table, [{name: row[name] for name in names} for row in rows])
+                counts[table.name] += len(rows)
+
+        for rows in iter_export(path, file_format, mission, batch_size):
+            products = {}
+            for row in rows:
+                product_id = row["science_product_id"]
+                byte, bit = divmod(product_id, 8)
+                if byte >= len(loaded_products):
+                    loaded_products.extend(bytes(byte - len(loaded_products) + 1))
+                if not loaded_products[byte] & (1 << bit):
+                    loaded_products[byte] |= 1 << bit
+                    products[product_id] = row
+
+            products = list(products.values())
+            files = [row for row in rows if row["science_file_id"] is not None]
+            resolve_references(products, files, reference_keys)
+
+            load(science_product, products)
+            load(science_file, files)
+            load(status, [row for row in rows if row["status_id"] is not None])
+
+        # Origin files can come after the files that derive from them, so they are linked once
+        # every file is loaded
+        for rows in iter_export(path, file_format, mission, batch_size, columns=["status_id", "origin_file_ids"]):
+            load(
+                association,
+                [
+                    {"status_id": row["status_id"], "origin_file_id": origin_file_id}
+                    for row in rows
+                    for origin_file_id in row["origin_file_ids"] or []
+                ],
+            )
+
+        reset_sequences(connection, tables)
+
+    log.debug(f"Imported {counts} from {path}")
+
+    return counts
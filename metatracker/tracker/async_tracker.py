@@ -0,0 +1,260 @@
+"""
+Asyncio version of MetaTracker
+
+AsyncMetaTracker runs on a SQLAlchemy ``AsyncEngine``, so tracking files doesn't block the event
+loop: database round-trips are awaited, db_retry backs off with ``asyncio.sleep`` and file stat
+calls and science file parsing run in worker threads. Validation and table writes are those of a
+MetaTracker without an engine, the writes run on the sync session behind the ``AsyncSession``.
+"""
+
+import asyncio
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterable, Optional
+
+from metatracker import log
+from metatracker.database import check_async_connection, create_async_session, create_session
+from metatracker.tracker.tracker import FileDescriptor, MetaTracker, ReferenceDataCache, db_retry
+
+
+def reference_data_not_loaded() -> dict:
+    """Loader of the reference data cache of an AsyncMetaTracker, which the coroutines fill"""
+
+    raise RuntimeError("The reference data of an AsyncMetaTracker is loaded with await refresh_reference_data()")
+
+
+class AsyncMetaTracker:
+    """
+    MetaTracker for asyncio applications
+
+    ``track``, ``track_many``, ``add_to_status_table``, ``get_failed_files``,
+    ``iter_failed_files`` and ``refresh_reference_data`` are coroutines (``iter_failed_files`` an
+    async generator). Use ``await AsyncMetaTracker.create(...)`` to check the connection while
+    creating the tracker.
+
+    It wraps a MetaTracker rather than extending it, the other MetaTracker methods (queries,
+    lineage, the reprocessing queue, sync and validation) have no async version yet.
+    """
+
+    def __init__(
+        self,
+        engine,
+        science_file_parser: Callable,
+        reference_data_ttl: Optional[float] = None,
+        parser_cache_size: int = 1024,
+        lineage_closure: bool = False,
+        mission=None,
+    ):
+        self.engine = engine
+
+        # Parsing, validation and the table writes of MetaTracker, without an engine of its own
+        self.tracker = MetaTracker(
+            None,
+            science_file_parser,
+            parser_cache_size=parser_cache_size,
+            lineage_closure=lineage_closure,
+            mission=mission,
+        )
+        # Loaded by the coroutines through refresh_reference_data() before they need it
+        self.tracker.reference_data_cache = ReferenceDataCache(loader=reference_data_not_loaded, ttl=reference_data_ttl)
+
+        # Configuration and table classes of the mission (a registered mission name or a
+        # configuration), trackers of different missions can share an engine
+        self.configuration = self.tracker.configuration
+        self.tables = self.tracker.tables
+
+        # One session factory (and so one connection pool) for the lifetime of the tracker
+        self.session = create_async_session(self.engine)
+
+    @classmethod
+    async def create(cls, engine, science_file_parser: Callable, **kwargs) -> "AsyncMetaTracker":
+        """Create a tracker after checking the database connection"""
+
+        try:
+            await check_async_connection(engine)
+        except Exception:
+            raise ConnectionError("Database connection is not valid") from None
+
+        return cls(engine, science_file_parser, **kwargs)
+
+    async def close(self) -> None:
+        """Drop the memoized parser results, sessions are closed by the coroutines that open them"""
+
+        self.tracker.close()
+
+    @property
+    def reference_data(self) -> ReferenceDataCache:
+        """Reference data cache, loaded by the coroutines before they use it"""
+
+        return self.tracker.reference_data_cache
+
+    async def refresh_reference_data(self) -> None:
+        """Reload the cached reference data from the database"""
+
+        async with self.engine.connect() as connection:
+            reference_data = await connection.run_sync(
+                lambda sync_connection: MetaTracker.read_reference_data(create_session(sync_connection), self.tables)
+            )
+
+        self.reference_data.refresh(reference_data)
+
+    async def ensure_reference_data(self) -> ReferenceDataCache:
+        """Load the reference data if the cache is empty or stale"""
+
+        if self.reference_data.is_stale():
+            await self.refresh_reference_data()
+
+        return self.reference_data
+
+    async def track(
+        self, file: Path, s3_key: str, s3_bucket: str, science_product_id: int = None, status: dict = None
+    ) -> tuple:
+        """Track a file
+
+        The science product, science file and status are written in a single transaction, so
+        a failure part way through leaves nothing behind.
+        """
+
+        await self.ensure_reference_data()
+
+        file = await asyncio.to_thread(MetaTracker.describe_file, file)
+        if not MetaTracker.is_file_real(file):
+            log.debug("File does not exist")
+            raise FileNotFoundError("File does not exist")
+
+        parsed_file, parsed_science_product = await asyncio.to_thread(self.parse_tracked_file, file, s3_key, s3_bucket)
+
+        if not parsed_file:
+            log.debug("File is not valid")
+            return None, science_product_id
+
+        if science_product_id is None and not parsed_science_product:
+            log.debug("Science product is not valid")
+            return None, None
+
+        return await self.write_tracked_file(parsed_file, parsed_science_product, science_product_id, status)
+
+    def parse_tracked_file(self, file: FileDescriptor, s3_key: str, s3_bucket: str) -> tuple:
+        """Parse a file and its science product, run in a worker thread"""
+
+        return self.tracker.parse_file(None, file, s3_key, s3_bucket), self.tracker.parse_science_product(None, file)
+
+    @db_retry
+    async def write_tracked_file(
+        self,
+        parsed_file: dict,
+        parsed_science_product: dict,
+        science_product_id: int = None,
+        status: dict = None,
+    ) -> tuple:
+        """Write a parsed file to the science product, science file and status tables in one transaction"""
+
+        async with self.session.begin() as async_session:
+            return await async_session.run_sync(
+                self.tracker.write_tracked_file_rows, parsed_file, parsed_science_product, science_product_id, status
+            )
+
+    async def track_many(self, items: Iterable, concurrency: int = 10) -> list:
+        """Track many files concurrently
+
+        ``items`` is an iterable of ``(file, s3_key, s3_bucket, status)`` tuples, where ``status``
+        may be ``None``. At most ``concurrency`` files are parsed or written at a time, so a
+        small connection pool can serve hundreds of files in flight.
+
+        Returns one result per item, in input order:
+        {"science_file_id": int, "science_product_id": int, "error": Exception or None}
+        """
+
+        if concurrency < 1:
+            raise ValueError("concurrency must be a positive integer")
+
+        await self.ensure_reference_data()
+        semaphore = asyncio.Semaphore(concurrency)
+        # SQLite allows only one writer at a time, so writes are queued instead of retried
+        write_slots = asyncio.Semaphore(1 if self.engine.dialect.name == "sqlite" else concurrency)
+
+        async def track_item(file: Path, s3_key: str, s3_bucket: str, status: dict = None) -> dict:
+            result = {"science_file_id": None, "science_product_id": None, "error": None}
+
+            async with semaphore:
+                try:
+                    parsed = await asyncio.to_thread(
+                        self.tracker.parse_batch_item, None, file, s3_key, s3_bucket, status
+                    )
+                    async with write_slots:
+                        result["science_file_id"], result["science_product_id"] = await self.write_tracked_file(
+                            parsed["file"], parsed["science_product"], None, status
+                        )
+                except Exception as e:
+                    log.debug(f"Could not track {file}: {e}")
+                    result["error"] = e
+
+            return result
+
+        return list(await asyncio.gather(*(track_item(*item) for item in items)))
+
+    @db_retry
+    async def add_to_status_table(
+        self,
+        science_file_id: int,
+        processing_status: str,
+        processing_status_message: str = None,
+        processing_time_length: int = None,
+        origin_file_ids: list[int] = None,
+    ) -> int:
+        """Add or update a status entry for a science file in the status table."""
+
+        async with self.session.begin() as async_session:
+            return await async_session.run_sync(
+                self.tracker.write_status,
+                science_file_id=science_file_id,
+                processing_status=processing_status,
+                processing_status_message=processing_status_message,
+                processing_time_length=processing_time_length,
+                origin_file_ids=origin_file_ids,
+                lineage_closure=self.tracker.lineage_closure,
+            )
+
+    async def get_failed_files(self) -> list:
+        """Get all files with status 'FAILED'.
+        [(s3_key, s3_bucket), ...]
+        """
+
+        return [(row.s3_key, row.s3_bucket) async for row in self.iter_failed_files()]
+
+    async def iter_failed_files(
+        self,
+        batch_size: int = 1000,
+        since: Optional[datetime] = None,
+        instrument: Optional[str] = None,
+        after_status_id: int = 0,
+    ) -> AsyncIterator:
+        """Stream files with status 'FAILED', in status_id order
+        (s3_key, s3_bucket, status_id), ...
+
+        Same keyset pagination as MetaTracker.iter_failed_files, each page in its own short
+        transaction.
+        """
+
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        if instrument is not None:
+            await self.ensure_reference_data()
+
+        query = self.tracker.failed_files_query(since, instrument).limit(batch_size)
+
+        last_status_id = after_status_id
+        while True:
+            async with self.session.begin() as async_session:
+                rows = (
+                    await async_session.execute(query.where(self.tables.StatusTable.status_id > last_status_id))
+                ).all()
+
+            for row in rows:
+                yield row
+
+            if len(rows) < batch_size:
+                return
+
+            last_status_id = rows[-1].status_id
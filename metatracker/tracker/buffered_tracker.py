@@ -0,0 +1,266 @@
+"""
+Write-behind wrapper around MetaTracker
+
+BufferedMetaTracker queues ``track`` and ``add_to_status_table`` requests in memory and returns
+a ``concurrent.futures.Future`` right away. A background thread writes the queue when it holds
+``max_batch_size`` requests or its oldest request is ``flush_interval`` seconds old. Files are
+written with ``track_many`` and statuses with multi-row upserts in a single transaction, so the
+processing loop moves on without waiting on database round-trips (or db_retry backoff) and the
+database sees fewer, larger writes.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Optional
+
+from metatracker import log
+from metatracker.tracker.tracker import MetaTracker, check_origin_file_ids, db_retry
+
+
+class BufferedMetaTracker:
+    """
+    Buffer writes to a MetaTracker and flush them from a background thread
+
+    ``track`` futures resolve to ``(science_file_id, science_product_id)`` or raise the error of
+    the file in ``MetaTracker.track_many``, ``add_to_status_table`` futures to the status id. ``flush()`` waits
+    until everything queued so far is written and ``close()`` (or leaving a ``with`` block)
+    flushes and stops the background thread.
+
+    Other attributes and methods are those of the wrapped tracker. Reads don't wait for queued
+    writes, call ``flush()`` first to see them. The background thread uses its own connections,
+    so in-memory SQLite databases (one per connection) are not supported.
+    """
+
+    def __init__(
+        self,
+        tracker: MetaTracker,
+        max_batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_queue_size: Optional[int] = None,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be a positive integer")
+
+        if flush_interval <= 0:
+            raise ValueError("flush_interval must be positive")
+
+        self.tracker = tracker
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        # Callers block once this many requests are waiting, so a slow database bounds memory
+        self.max_queue_size = max_queue_size or 10 * max_batch_size
+
+        self._condition = threading.Condition()
+        self._tracks = []
+        self._statuses = []
+        # Queued requests plus the ones being written
+        self._pending = 0
+        self._oldest = None
+        self._flush_requested = False
+        self._closed = False
+
+        self._thread = threading.Thread(target=self.run, name="BufferedMetaTracker", daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name: str):
+        # Only called for attributes BufferedMetaTracker doesn't have
+        if name == "tracker":
+            raise AttributeError(name)
+
+        return getattr(self.tracker, name)
+
+    def __enter__(self) -> "BufferedMetaTracker":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def track(self, file: Path, s3_key: str, s3_bucket: str, status: dict = None) -> Future:
+        """Queue a file to be tracked
+
+        The future resolves to ``(science_file_id, science_product_id)``, or raises the error
+        ``track_many`` reported for the file, e.g. a ValueError if the file is not valid.
+        """
+
+        return self.enqueue(self._tracks, (file, s3_key, s3_bucket, status))
+
+    def add_to_status_table(
+        self,
+        science_file_id: int,
+        processing_status: str,
+        processing_status_message: str = None,
+        processing_time_length: int = None,
+        origin_file_ids: list[int] = None,
+    ) -> Future:
+        """Queue a status to be added or updated, the future resolves to the status id"""
+
+        status = {
+            "science_file_id": science_file_id,
+            "processing_status": processing_status,
+            "processing_status_message": processing_status_message,
+            "processing_time_length": processing_time_length,
+            "origin_file_ids": origin_file_ids,
+        }
+
+        return self.enqueue(self._statuses, status)
+
+    def enqueue(self, queue: list, request: object) -> Future:
+        """Add a request to a queue, waiting while the queues are full"""
+
+        future = Future()
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("BufferedMetaTracker is closed")
+
+            while self._pending >= self.max_queue_size:
+                self._condition.wait()
+
+            queue.append((future, request))
+            self._pending += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+            if len(self._tracks) + len(self._statuses) >= self.max_batch_size:
+                self._condition.notify_all()
+
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write the queued requests now and wait until they are written
+
+        Returns False if the timeout expired first.
+        """
+
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+
+            return self._condition.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def close(self) -> None:
+        """Flush the queued requests and stop the background thread"""
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        self._thread.join()
+
+    def is_due(self) -> bool:
+        """Check if the queued requests should be written now"""
+
+        queued = len(self._tracks) + len(self._statuses)
+        if not queued:
+            return False
+
+        return (
+            self._closed
+            or self._flush_requested
+            or queued >= self.max_batch_size
+            or time.monotonic() - self._oldest >= self.flush_interval
+        )
+
+    def run(self) -> None:
+        """Write the queues whenever they are due, until the tracker is closed"""
+
+        while True:
+            with self._condition:
+                while not self.is_due():
+                    if self._closed:
+                        return
+
+                    timeout = None
+                    if self._oldest is not None:
+                        timeout = max(self.flush_interval - (time.monotonic() - self._oldest), 0)
+                    self._condition.wait(timeout)
+
+                tracks, self._tracks = self._tracks, []
+                statuses, self._statuses = self._statuses, []
+                self._oldest = None
+                self._flush_requested = False
+
+            try:
+                # Files first, callers only learn their science_file_id (for a status) afterwards
+                self.write_tracks(tracks)
+                self.write_statuses(statuses)
+            except Exception as e:
+                # Fail the requests of this batch only, the thread keeps serving the queues
+                log.debug(f"Could not write a batch of {len(tracks) + len(statuses)} requests: {e}")
+                for future, _ in tracks + statuses:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._pending -= len(tracks) + len(statuses)
+                    self._condition.notify_all()
+
+    @staticmethod
+    def active(requests: list) -> list:
+        """Requests whose future wasn't cancelled, marking them as running"""
+
+        return [(future, request) for future, request in requests if future.set_running_or_notify_cancel()]
+
+    def write_tracks(self, tracks: list) -> None:
+        """Track the queued files with track_many and resolve their futures"""
+
+        tracks = self.active(tracks)
+        if not tracks:
+            return
+
+        try:
+            results = self.tracker.track_many([request for _, request in tracks], chunk_size=self.max_batch_size)
+        except Exception as e:
+            log.debug(f"Could not track a batch of {len(tracks)} files: {e}")
+            for future, _ in tracks:
+                future.set_exception(e)
+            return
+
+        for (future, _), result in zip(tracks, results):
+            if result["error"] is not None:
+                future.set_exception(result["error"])
+            else:
+                future.set_result((result["science_file_id"], result["science_product_id"]))
+
+    def write_statuses(self, statuses: list) -> None:
+        """Write the queued statuses in one transaction and resolve their futures
+
+        Statuses with invalid origin file ids fail right away. If the transaction fails, the
+        statuses are written one transaction each, so only the failing ones get the error.
+        """
+
+        valid_statuses = []
+        for future, request in self.active(statuses):
+            try:
+                check_origin_file_ids(request["origin_file_ids"])
+            except ValueError as e:
+                future.set_exception(e)
+            else:
+                valid_statuses.append((future, request))
+
+        statuses = valid_statuses
+        if not statuses:
+            return
+
+        try:
+            status_ids = self.write_status_batch([request for _, request in statuses])
+        except Exception as e:
+            log.debug(f"Could not write a batch of {len(statuses)} statuses, writing them one by one: {e}")
+            for future, request in statuses:
+                try:
+                    future.set_result(self.write_status_batch([request])[0])
+                except Exception as status_error:
+                    future.set_exception(status_error)
+            return
+
+        for (future, _), status_id in zip(statuses, status_ids):
+            future.set_result(status_id)
+
+    @db_retry
+    def write_status_batch(self, statuses: list) -> list:
+        """Add or update statuses in a single transaction, with bulk statements"""
+
+        with self.tracker.session.begin() as sql_session:
+            return self.tracker.write_status_rows(sql_session, statuses, lineage_closure=self.tracker.lineage_closure)
@@ -0,0 +1,315 @@
+"""
+Opt-in instrumentation of MetaTracker
+
+Counts the SQL statements an engine executes and times each stage of tracking a file (parsing,
+stat, validation and table writes), per call and cumulatively. Counters can be dumped as JSON
+or written to a Prometheus text file (e.g. for the node_exporter textfile collector).
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from sqlalchemy import event
+
+# Methods of MetaTracker that are timed as stages when instrumentation is enabled
+STAGES = [
+    "describe_file",
+    "parse_science_file_data",
+    "parse_file",
+    "parse_science_product",
+    "write_science_product",
+    "write_science_file",
+    "write_status",
+    "write_tracked_file",
+    "add_to_science_product_table",
+    "add_to_science_file_table",
+    "add_to_status_table",
+    "add_batch_to_tables",
+]
+
+# Methods of MetaTracker that start a new per-call stats object
+CALLS = ["track", "track_many", "track_concurrent"]
+
+
+class StageStats:
+    """Counters of a single stage"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.statements = 0
+        self.statement_seconds = 0.0
+        self.retries = 0
+
+    def add(self, seconds: float, statements: int, statement_seconds: float) -> None:
+        self.calls += 1
+        self.seconds += seconds
+        self.statements += statements
+        self.statement_seconds += statement_seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "statements": self.statements,
+            "statement_seconds": self.statement_seconds,
+            "retries": self.retries,
+        }
+
+
+class CallStats:
+    """Stats of one track()/track_many()/track_concurrent() call, broken down by stage"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.seconds = 0.0
+        self.statements = 0
+        self.statement_seconds = 0.0
+        self.retries = 0
+        self.stages = {}
+
+    def stage(self, name: str) -> StageStats:
+        return self.stages.setdefault(name, StageStats())
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "seconds": self.seconds,
+            "statements": self.statements,
+            "statement_seconds": self.statement_seconds,
+            "retries": self.retries,
+            "stages": {name: stage.to_dict() for name, stage in self.stages.items()},
+        }
+
+    def __repr__(self) -> str:
+        return f"CallStats({self.to_dict()})"
+
+
+class Instrumentation:
+    """
+    Statement counter and stage timer for one MetaTracker
+
+    Statements are attributed to whatever stages are running in the thread that executed them,
+    so nested stages (e.g. ``write_science_file`` inside ``write_tracked_file``) report
+    inclusive counts. Work a call hands to worker threads is attributed to it through
+    ``propagate``.
+    """
+
+    def __init__(self, engine: type) -> None:
+        self.engine = engine
+        self.stages = {}
+        self.calls = {}
+        self.statements = 0
+        self.statement_seconds = 0.0
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def close(self) -> None:
+        """Stop listening to the engine"""
+
+        event.remove(self.engine, "before_cursor_execute", self.before_cursor_execute)
+        event.remove(self.engine, "after_cursor_execute", self.after_cursor_execute)
+
+    @property
+    def thread_statements(self) -> list:
+        """[statement count, statement seconds] of the current thread"""
+
+        if not hasattr(self._local, "statements"):
+            self._local.statements = [0, 0.0]
+
+        return self._local.statements
+
+    @property
+    def current_call(self) -> Optional[CallStats]:
+        """Stats of the call running in the current thread"""
+
+        return getattr(self._local, "current_call", None)
+
+    @property
+    def last_call(self) -> Optional[CallStats]:
+        """Stats of the last call that finished in the current thread"""
+
+        return getattr(self._local, "last_call", None)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("metatracker_query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - conn.info["metatracker_query_start"].pop()
+
+        statements = self.thread_statements
+        statements[0] += 1
+        statements[1] += elapsed
+
+        with self._lock:
+            self.statements += 1
+            self.statement_seconds += elapsed
+
+    def record_retry(self, name: str) -> None:
+        """Record a retry of a stage by db_retry"""
+
+        call = self.current_call
+        with self._lock:
+            self.stages.setdefault(name, StageStats()).retries += 1
+            if call is not None:
+                call.retries += 1
+                call.stage(name).retries += 1
+
+    def wrap_stage(self, name: str, method: Callable) -> Callable:
+        """Time a method as a stage"""
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            statements = self.thread_statements
+            start_statements, start_statement_seconds = statements
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                measurements = (
+                    time.perf_counter() - start,
+                    statements[0] - start_statements,
+                    statements[1] - start_statement_seconds,
+                )
+                self.record(name, self.stages, *measurements, call=self.current_call)
+
+        return wrapper
+
+    def wrap_call(self, name: str, method: Callable) -> Callable:
+        """Collect the stats of a method in a new CallStats"""
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            parent_call = self.current_call
+            call = CallStats(name)
+            self._local.current_call = call
+
+            statements = self.thread_statements
+            start_statements, start_statement_seconds = statements
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                call.seconds = time.perf_counter() - start
+                # Added to the statements of the worker threads the call propagated to
+                call.statements += statements[0] - start_statements
+                call.statement_seconds += statements[1] - start_statement_seconds
+                self.record(name, self.calls, call.seconds, call.statements, call.statement_seconds)
+
+                self._local.current_call = parent_call
+                self._local.last_call = call
+
+        return wrapper
+
+    def propagate(self, function: Callable) -> Callable:
+        """Attribute the statements and stages of a function run by worker threads to the call
+        running in the current thread
+        """
+
+        call = self.current_call
+        if call is None:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            worker_call = self.current_call
+            self._local.current_call = call
+
+            statements = self.thread_statements
+            start_statements, start_statement_seconds = statements
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with self._lock:
+                    call.statements += statements[0] - start_statements
+                    call.statement_seconds += statements[1] - start_statement_seconds
+
+                self._local.current_call = worker_call
+
+        return wrapper
+
+    def record(
+        self,
+        name: str,
+        counters: dict,
+        seconds: float,
+        statements: int,
+        statement_seconds: float,
+        call: Optional[CallStats] = None,
+    ) -> None:
+        with self._lock:
+            counters.setdefault(name, StageStats()).add(seconds, statements, statement_seconds)
+            if call is not None:
+                call.stage(name).add(seconds, statements, statement_seconds)
+
+    def reset(self) -> None:
+        """Reset the cumulative counters"""
+
+        with self._lock:
+            self.stages = {}
+            self.calls = {}
+            self.statements = 0
+            self.statement_seconds = 0.0
+
+    def to_dict(self) -> dict:
+        """Cumulative counters"""
+
+        with self._lock:
+            return {
+                "statements": self.statements,
+                "statement_seconds": self.statement_seconds,
+                "calls": {name: stats.to_dict() for name, stats in self.calls.items()},
+                "stages": {name: stats.to_dict() for name, stats in self.stages.items()},
+            }
+
+    def to_json(self) -> str:
+        """Cumulative counters as JSON"""
+
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self, prefix: str = "metatracker") -> str:
+        """Cumulative counters in the Prometheus text exposition format"""
+
+        counters = self.to_dict()
+        lines = [
+            f"# HELP {prefix}_sql_statements_total SQL statements executed",
+            f"# TYPE {prefix}_sql_statements_total counter",
+            f"{prefix}_sql_statements_total {counters['statements']}",
+            f"# HELP {prefix}_sql_seconds_total Time spent executing SQL statements",
+            f"# TYPE {prefix}_sql_seconds_total counter",
+            f"{prefix}_sql_seconds_total {counters['statement_seconds']}",
+        ]
+
+        metrics = [
+            ("calls", "calls_total", "Calls"),
+            ("seconds", "seconds_total", "Wall time"),
+            ("statements", "statements_total", "SQL statements executed"),
+            ("statement_seconds", "sql_seconds_total", "Time spent executing SQL statements"),
+            ("retries", "retries_total", "Retries by db_retry"),
+        ]
+        for kind, label in (("calls", "call"), ("stages", "stage")):
+            for key, suffix, description in metrics:
+                name = f"{prefix}_{label}_{suffix}"
+                lines.append(f"# HELP {name} {description} per {label}")
+                lines.append(f"# TYPE {name} counter")
+                for stage, stats in counters[kind].items():
+                    lines.append(f'{name}{{{label}="{stage}"}} {stats[key]}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path, prefix: str = "metatracker") -> None:
+        """Write the cumulative counters to a Prometheus text file, replacing it atomically"""
+
+        path = Path(path)
+        temporary_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        temporary_path.write_text(self.to_prometheus(prefix))
+        os.replace(temporary_path, path)
@@ -0,0 +1,62 @@
+"""
+Reading of bucket listings for MetaTracker.sync_manifest
+
+A manifest lists objects as ``(bucket, key, size, last_modified)`` rows, in the column order of
+an S3 Inventory CSV report (extra columns are ignored). ``last_modified`` is an ISO 8601
+timestamp, as in S3 Inventory reports, or seconds since the epoch.
+"""
+
+import csv
+import gzip
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, Union
+from urllib.parse import unquote
+
+
+def read_manifest_csv(path: Union[str, Path]) -> Iterator:
+    """Read the rows of a manifest CSV file, gzipped if its name ends with .gz
+
+    Keys are URL-decoded, as S3 Inventory reports URL-encode them. A header row is skipped.
+    """
+
+    path = Path(path)
+    opener = gzip.open if path.suffix == ".gz" else open
+
+    with opener(path, "rt", newline="") as manifest_file:
+        for row in csv.reader(manifest_file):
+            if not row or not row[2].isdigit():
+                # Header or empty row
+                continue
+
+            yield row[0], unquote(row[1]), row[2], row[3]
+
+
+def iter_manifest(manifest: Union[str, Path, Iterable]) -> Iterator:
+    """Normalize a manifest to ``(bucket, key, size, modified_time)`` rows
+
+    ``manifest`` is the path of a manifest CSV file or an iterable of rows. ``size`` is returned
+    as an int and ``modified_time`` as seconds since the epoch.
+    """
+
+    rows = read_manifest_csv(manifest) if isinstance(manifest, (str, os.PathLike)) else manifest
+
+    for bucket, key, size, last_modified, *_ in rows:
+        yield bucket, key, int(size), parse_last_modified(last_modified)
+
+
+def parse_last_modified(last_modified: Union[str, float, datetime]) -> float:
+    """Convert a last modified date to seconds since the epoch"""
+
+    if isinstance(last_modified, datetime):
+        return last_modified.timestamp()
+
+    if isinstance(last_modified, (int, float)):
+        return float(last_modified)
+
+    # datetime.fromisoformat() only accepts a trailing Z from Python 3.11
+    if last_modified.endswith("Z"):
+        last_modified = last_modified[:-1] + "+00:00"
+
+    return datetime.fromisoformat(last_modified).timestamp()
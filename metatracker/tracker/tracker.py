@@ -1,154 +1,1166 @@
-from datetime import datetime, timezone
+import functools
+import itertools
+import os
+import stat
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Iterable, Iterator, Optional
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from sqlalchemy.exc import OperationalError, IntegrityError
+from sqlalchemy import bindparam, delete, func, insert, literal, literal_column, or_, select, tuple_, update
+from sqlalchemy.exc import OperationalError
 
 
 from metatracker import log
 from metatracker.database import check_connection, create_session
-from metatracker.database.tables.file_level_table import FileLevelTable
-from metatracker.database.tables.file_type_table import FileTypeTable
-from metatracker.database.tables.instrument_configuration_table import InstrumentConfigurationTable
-from metatracker.database.tables.instrument_table import InstrumentTable
-from metatracker.database.tables.science_file_table import ScienceFileTable
-from metatracker.database.tables.science_product_table import ScienceProductTable
-from metatracker.database.tables.status_table import StatusTable
+from metatracker.database.tables import (
+    MissionTables,
+    get_mission_configuration,
+    get_mission_tables,
+    register_reference_data_listener,
+)
+from metatracker.database.upsert import (
+    insert_from_select_or_ignore,
+    insert_many_or_ignore,
+    insert_or_ignore,
+    supports_on_conflict,
+    upsert,
+    upsert_many,
+)
+from metatracker.tracker.instrumentation import CALLS, STAGES, Instrumentation
+from metatracker.tracker.manifest import iter_manifest
+
+
+def record_retry(retry_state: type) -> None:
+    """Report a retry to the instrumentation of the tracker whose method is being retried"""
+
+    tracker = retry_state.args[0] if retry_state.args else None
+    instrumentation = getattr(tracker, "instrumentation", None)
+    if instrumentation is not None:
+        instrumentation.record_retry(retry_state.fn.__name__)
+
 
 db_retry = retry(
     reraise=True,
     stop=stop_after_attempt(5),  # Try up to 5 times
     wait=wait_exponential(multiplier=1, min=2, max=10),  # 2s, 4s, 8s, 10s, 10s
-    retry=(retry_if_exception_type(OperationalError) | retry_if_exception_type(IntegrityError)),
+    # Duplicates are handled by upserts, so only connection problems are retried
+    retry=retry_if_exception_type(OperationalError),
+    before_sleep=record_retry,
 )
 
+SCIENCE_FILE_KEY = ["filename"]
+SCIENCE_PRODUCT_KEY = ["instrument_configuration_id", "mode", "reference_timestamp"]
+STATUS_KEY = ["science_file_id"]
+
+# Dialects that can claim rows with SELECT ... FOR UPDATE SKIP LOCKED
+SKIP_LOCKED_DIALECTS = {"postgresql", "mysql", "mariadb", "oracle"}
+
+# Guards lineage queries against cycles in status_origin_association
+LINEAGE_DEPTH_LIMIT = 100
+
+# Databases without sub-second timestamps (e.g. MySQL DATETIME) round file modified timestamps
+MODIFIED_TIMESTAMP_TOLERANCE = timedelta(seconds=1)
+
+
+class ReferenceDataCache:
+    """
+    In-memory cache of the reference tables (file types, file levels, instruments and
+    instrument configurations) used to validate files before they are tracked.
+
+    The vocabulary is loaded lazily on first use through ``loader`` and then served from
+    memory. It is reloaded when ``refresh()`` is called, when ``invalidate()`` is called
+    (for example by ``create_tables``/``populate_*``) or when the optional ``ttl`` expires.
+    """
+
+    def __init__(self, loader: Callable, ttl: Optional[float] = None) -> None:
+        self.loader = loader
+        self.ttl = ttl
+
+        self.file_types = {}
+        self.file_levels = set()
+        self.instruments = {}
+        self.instrument_short_names = set()
+        self.instrument_configurations = {}
+        self.configuration_index = {}
+
+        self.loaded_at = None
+        self._lock = threading.Lock()
+
+        # Get notified when the reference tables are (re)populated
+        register_reference_data_listener(self)
+
+    def is_stale(self) -> bool:
+        """Check if the cache needs to be (re)loaded"""
+
+        if self.loaded_at is None:
+            return True
+
+        return self.ttl is not None and time.monotonic() - self.loaded_at > self.ttl
+
+    def refresh(self, reference_data: Optional[dict] = None) -> None:
+        """Reload the reference data from the database, or from already loaded ``reference_data``"""
+
+        with self._lock:
+            if reference_data is None:
+                reference_data = self.loader()
+
+            file_types = {}
+            for extension, short_name in reference_data["file_types"]:
+                file_types.setdefault(extension, short_name)
+
+            self.file_types = file_types
+            self.file_levels = set(reference_data["file_levels"])
+            self.instruments = dict(reference_data["instruments"])
+            self.instrument_short_names = set(self.instruments.values())
+            self.instrument_configurations = dict(reference_data["instrument_configurations"])
+            self.configuration_index = MetaTracker.get_configuration_index(self.instrument_configurations)
+            self.loaded_at = time.monotonic()
+
+        log.debug("Reference data cache refreshed")
+
+    def invalidate(self) -> None:
+        """Mark the cache as stale so it is reloaded on next use"""
+
+        self.loaded_at = None
+
+    def ensure_loaded(self) -> "ReferenceDataCache":
+        """Load the reference data if the cache is empty or stale"""
+
+        if self.is_stale():
+            self.refresh()
+
+        return self
+
+    def vocabulary(self) -> dict:
+        """Picklable copy of what validate_file checks files against"""
+
+        self.ensure_loaded()
+        with self._lock:
+            return {
+                "file_types": set(self.file_types),
+                "file_levels": set(self.file_levels),
+                "instrument_short_names": set(self.instrument_short_names),
+                "configuration_index": dict(self.configuration_index),
+            }
+
+
+class FileDescriptor:
+    """
+    A file described once for tracking: its extension, stem, absolute path and ``stat()``
+    result, plus the output of the science file parser once it has been requested.
+
+    ``parse_file``, ``parse_science_product`` and the table writers all consume the same
+    descriptor, so a file is stat'ed once and parsed at most once per ``track()`` call.
+
+    A ``stat_result`` that is already known (e.g. from ``os.scandir``) can be passed in to
+    skip the ``stat()`` call.
+    """
+
+    def __init__(self, file: Path, stat_result: Optional[os.stat_result] = None) -> None:
+        self.path = file
+        self.extension = file.suffix.lower()
+        self.filename = file.stem
+        self.absolute_path = str(file.absolute())
+
+        if stat_result is None:
+            try:
+                stat_result = file.stat()
+            except OSError:
+                stat_result = None
+
+        self.exists = stat_result is not None and stat.S_ISREG(stat_result.st_mode)
+        self.file_size = stat_result.st_size if self.exists else None
+        self.modified_time = stat_result.st_mtime if self.exists else None
+        self.file_modified_timestamp = datetime.fromtimestamp(self.modified_time) if self.exists else None
+
+        self.science_file_data = None
+
+    def __repr__(self) -> str:
+        return f"FileDescriptor(path={self.path!r}, exists={self.exists})"
+
+
+def describe_and_parse(file: Path, science_file_parser: Callable) -> FileDescriptor:
+    """Describe and parse a file, run in worker processes by MetaTracker.track_concurrent"""
+
+    descriptor = FileDescriptor(file)
+    if descriptor.exists:
+        try:
+            descriptor.science_file_data = science_file_parser(file)
+        except Exception as e:
+            # Left unparsed, the error is raised again when the file is validated
+            log.debug(f"Could not parse {file}: {e}")
+
+    return descriptor
+
+
+def get_reference_timestamp(time) -> Optional[datetime]:
+    """Reference timestamp of the time a science file parser returned, None if it isn't valid"""
+
+    if not MetaTracker.is_valid_timestamp(time):
+        return None
+
+    # Check if value is already a datetime object
+    if isinstance(time.value, datetime):
+        return time.value
+
+    try:
+        return datetime.strptime(time.value, "%Y-%m-%dT%H:%M:%S.%f")
+    except (TypeError, ValueError):
+        return None
+
+
+def check_file_type(extension: str, file_types) -> Optional[str]:
+    """Reason a file extension can't be tracked, None if it can"""
+
+    if extension not in file_types:
+        return f"File type is not valid: {extension!r}"
+
+    return None
+
+
+def check_file_level(science_file_data: dict, file_levels) -> Optional[str]:
+    """Reason the level of a parsed science file can't be tracked, None if it can"""
+
+    if science_file_data["level"] not in file_levels:
+        return f"File level is not valid: {science_file_data['level']!r}"
+
+    return None
+
+
+def check_science_product(science_file_data: dict, instrument_short_names, configuration_index) -> Optional[str]:
+    """Reason the science product of a parsed science file can't be tracked, None if it can"""
+
+    time = science_file_data["time"]
+    if not MetaTracker.is_valid_timestamp(time):
+        return "Timestamp is not valid"
+
+    if get_reference_timestamp(time) is None:
+        return f"Timestamp is not valid: {time.value!r}"
+
+    instrument = science_file_data["instrument"]
+    if instrument not in instrument_short_names:
+        return f"Instrument is not valid: {instrument!r}"
+
+    if frozenset([instrument]) not in configuration_index:
+        return f"Instrument configuration is not valid: {instrument!r}"
+
+    return None
+
+
+def check_origin_file_ids(origin_file_ids) -> None:
+    """Raise a ValueError unless the origin file ids of a status are a list of integers or None"""
+
+    if origin_file_ids is not None and (
+        not isinstance(origin_file_ids, list) or not all(isinstance(i, int) for i in origin_file_ids)
+    ):
+        raise ValueError("origin_file_ids must be a list of integers or None")
+
+
+def validate_file(file: Path, science_file_parser: Callable, vocabulary: dict, check_exists: bool = True) -> dict:
+    """Check if a file would be tracked, without writing anything
+
+    Runs the checks of ``parse_file`` and ``parse_science_product`` in the same order against a
+    ``ReferenceDataCache.vocabulary()``, and in worker processes for MetaTracker.validate_many.
+    {"file": Path, "valid": bool, "reason": str or None}
+    """
+
+    file = Path(file)
+
+    def verdict(reason: Optional[str] = None) -> dict:
+        return {"file": file, "valid": reason is None, "reason": reason}
+
+    if check_exists and not file.is_file():
+        return verdict("File does not exist")
+
+    reason = check_file_type(file.suffix.lower(), vocabulary["file_types"])
+    if reason is not None:
+        return verdict(reason)
+
+    try:
+        science_file_data = science_file_parser(file)
+    except Exception as e:
+        return verdict(f"File could not be parsed: {e}")
+
+    return verdict(
+        check_file_level(science_file_data, vocabulary["file_levels"])
+        or check_science_product(
+            science_file_data, vocabulary["instrument_short_names"], vocabulary["configuration_index"]
+        )
+    )
+
 
 class MetaTracker:
-    def __init__(self, engine, science_file_parser: Callable):
+    def __init__(
+        self,
+        engine,
+        science_file_parser: Callable,
+        reference_data_ttl: Optional[float] = None,
+        parser_cache_size: int = 1024,
+        instrument: bool = False,
+        lineage_closure: bool = False,
+        mission=None,
+    ):
         self.engine = engine
 
-        try:
-            check_connection(self.engine)
-        except Exception:
-            raise ConnectionError("Database connection is not valid") from None
+        # Without an engine the tracker can only validate files, against its configuration
+        if self.engine is not None:
+            try:
+                check_connection(self.engine)
+            except Exception:
+                raise ConnectionError("Database connection is not valid") from None
 
         self.science_file_parser = science_file_parser
 
+        # Configuration and table classes of the mission (a registered mission name or a
+        # configuration), trackers of different missions can share an engine. The ORM, the
+        # dialect in use and the table classes are loaded when the first tracker is created rather
+        # than on import, which keeps cold starts (and the workers of track_concurrent) cheap
+        self.configuration = get_mission_configuration(mission)
+        self.tables = get_mission_tables(self.configuration)
+
+        # One session factory (and so one connection pool) for the lifetime of the tracker, every
+        # method opens its own short-lived session from it, so the tracker is safe to share
+        # between threads
+        self.session = create_session(self.engine)
+
+        # Parser results are memoized by path and modification time
+        self.cached_science_file_parser = functools.lru_cache(maxsize=parser_cache_size)(self.parse_science_file_at)
+
+        # Reference tables are static vocabulary, so they are cached for the lifetime of the tracker
+        self.reference_data_cache = ReferenceDataCache(loader=self.load_reference_data, ttl=reference_data_ttl)
+
+        # Keep the science file lineage closure table up to date when origin files are linked
+        self.lineage_closure = lineage_closure
+
+        # Statement counts and stage timings, only collected when enabled
+        self.instrumentation = None
+        if instrument:
+            self.enable_instrumentation()
+
+    def enable_instrumentation(self) -> Instrumentation:
+        """Count SQL statements and time each stage of tracking a file
+
+        Stats of the last ``track``/``track_many`` call are available as
+        ``instrumentation.last_call``, cumulative counters through ``instrumentation.to_json()``
+        and ``instrumentation.write_prometheus(path)``.
+        """
+
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation(self.engine)
+            for name in STAGES:
+                setattr(self, name, self.instrumentation.wrap_stage(name, getattr(self, name)))
+            for name in CALLS:
+                setattr(self, name, self.instrumentation.wrap_call(name, getattr(self, name)))
+
+        return self.instrumentation
+
+    def disable_instrumentation(self) -> None:
+        """Stop collecting statement counts and stage timings"""
+
+        if self.instrumentation is not None:
+            for name in STAGES + CALLS:
+                delattr(self, name)
+            self.instrumentation.close()
+            self.instrumentation = None
+
+    def close(self) -> None:
+        """Drop the memoized parser results
+
+        Sessions are closed by the methods that open them, so no connection is left checked out
+        and pooled connections stay open for reuse.
+        """
+
+        self.cached_science_file_parser.cache_clear()
+
+    @property
+    def reference_data(self) -> ReferenceDataCache:
+        """Reference data cache, loaded on first access"""
+
+        return self.reference_data_cache.ensure_loaded()
+
+    def refresh_reference_data(self) -> None:
+        """Reload the cached reference data from the database"""
+
+        self.reference_data_cache.refresh()
+
+    def load_reference_data(self) -> dict:
+        """Load the reference tables from the database, or the configuration without an engine"""
+
+        if self.engine is None:
+            return self.get_configuration_reference_data(self.configuration)
+
+        return self.read_reference_data(self.session, self.tables)
+
+    @staticmethod
+    def get_configuration_reference_data(configuration) -> dict:
+        """Reference data of a configuration, in the format of read_reference_data
+
+        This is what create_tables populates the reference tables with.
+        """
+
+        instruments = {
+            instrument["instrument_id"]: instrument["short_name"] for instrument in configuration.instruments
+        }
+
+        instrument_configurations = {}
+        for instrument_configuration in configuration.instrument_configurations:
+            instrument_configurations[instrument_configuration["instrument_configuration_id"]] = sorted(
+                instruments[instrument_id]
+                for name, instrument_id in instrument_configuration.items()
+                if name != "instrument_configuration_id" and instrument_id is not None
+            )
+
+        return {
+            "file_types": [(file_type["extension"], file_type["short_name"]) for file_type in configuration.file_types],
+            "file_levels": [file_level["short_name"] for file_level in configuration.file_levels],
+            "instruments": instruments,
+            "instrument_configurations": instrument_configurations,
+        }
+
+    @staticmethod
+    def read_reference_data(session: type, tables: Optional[MissionTables] = None) -> dict:
+        """Read the reference tables with a session factory
+
+        ``tables`` defaults to the tables of the current configuration, as do those of the other
+        reference table getters.
+        """
+
+        return {
+            "file_types": MetaTracker.get_file_types(session, tables),
+            "file_levels": MetaTracker.get_file_levels(session, tables),
+            "instruments": MetaTracker.get_instruments(session, tables),
+            "instrument_configurations": MetaTracker.get_instrument_configurations(session, tables),
+        }
+
     def track(
         self, file: Path, s3_key: str, s3_bucket: str, science_product_id: int = None, status: dict = None
     ) -> tuple:
-        """Track a file"""
+        """Track a file
+
+        The science product, science file and status are written in a single transaction, so
+        a failure part way through leaves nothing behind.
+        """
+        file = self.describe_file(file)
         if not self.is_file_real(file):
             log.debug("File does not exist")
             raise FileNotFoundError("File does not exist")
-        session = create_session(self.engine)
+        session = self.session
+
+        parsed_file = self.parse_file(session, file, s3_key, s3_bucket)
+        parsed_science_product = self.parse_science_product(session, file)
+
+        if not parsed_file:
+            log.debug("File is not valid")
+            return None, science_product_id
+
+        if science_product_id is None and not parsed_science_product:
+            log.debug("Science product is not valid")
+            return None, None
+
+        return self.write_tracked_file(session, parsed_file, parsed_science_product, science_product_id, status)
+
+    @db_retry
+    def write_tracked_file(
+        self,
+        session: type,
+        parsed_file: dict,
+        parsed_science_product: dict,
+        science_product_id: int = None,
+        status: dict = None,
+    ) -> tuple:
+        """Write a parsed file to the science product, science file and status tables in one transaction"""
+
+        with session.begin() as sql_session:
+            return self.write_tracked_file_rows(
+                sql_session, parsed_file, parsed_science_product, science_product_id, status
+            )
+
+    def write_tracked_file_rows(
+        self,
+        sql_session: type,
+        parsed_file: dict,
+        parsed_science_product: dict,
+        science_product_id: int = None,
+        status: dict = None,
+    ) -> tuple:
+        """Write the science product, science file and status of a parsed file within an open transaction"""
+
+        # Check if science_product_id is provided
+        if science_product_id is None:
+            science_product_id = self.write_science_product(sql_session, parsed_science_product)
+            log.debug("Added to Science Product Table")
+        else:
+            log.debug(f"Using existing science_product_id: {science_product_id}")
+
+        science_file_id = self.write_science_file(sql_session, parsed_file, science_product_id)
+        log.debug("Added to Science File Table")
+
+        if status:
+            # Add to status table if status is provided
+            self.write_status(
+                sql_session,
+                science_file_id=science_file_id,
+                processing_status=status.get("processing_status"),
+                processing_status_message=status.get("processing_status_message"),
+                processing_time_length=status.get("processing_time_length"),
+                origin_file_ids=status.get("origin_file_ids", None),
+                lineage_closure=self.lineage_closure,
+            )
+            log.debug("Added to Status Table")
+
+        return science_file_id, science_product_id
+
+    def track_many(self, items: Iterable, chunk_size: int = 500) -> list:
+        """Track many files at once
+
+        ``items`` is an iterable of ``(file, s3_key, s3_bucket, status)`` tuples, where ``status``
+        may be ``None``. Files are parsed up front, then science products, science files and
+        statuses are written with one multi-row INSERT per table per chunk of ``chunk_size`` files.
+
+        Returns one result per item, in input order:
+        {"science_file_id": int, "science_product_id": int, "error": Exception or None}
+        """
+
+        session = self.session
+
+        results = []
+        parsed_items = []
+        for file, s3_key, s3_bucket, status in items:
+            result = {"science_file_id": None, "science_product_id": None, "error": None}
+            results.append(result)
+
+            try:
+                parsed_items.append((result, self.parse_batch_item(session, file, s3_key, s3_bucket, status)))
+            except Exception as e:
+                log.debug(f"Could not parse {file}: {e}")
+                result["error"] = e
+
+        for chunk in self.chunk_list(parsed_items, chunk_size):
+            self.write_batch_chunk(session, chunk)
+
+        return results
+
+    def track_concurrent(
+        self,
+        items: Iterable,
+        workers: int = 4,
+        mode: str = "thread",
+        writers: Optional[int] = None,
+        chunk_size: int = 500,
+    ) -> list:
+        """Track many files, parsing them concurrently
+
+        Takes the same ``(file, s3_key, s3_bucket, status)`` tuples as ``track_many`` and returns
+        the same per-item results, in input order.
+
+        Filenames are stat'ed and parsed by a pool of ``workers`` threads (``mode="thread"``) or
+        processes (``mode="process"``, the science file parser must then be picklable). The
+        parsed files are then grouped so that every science product and filename belongs to a
+        single chunk, and the chunks are written by at most ``writers`` sessions at a time
+        (defaults to ``min(workers, 4)``). Concurrent writers therefore never race on the same
+        product or filename. SQLite only allows one writer at a time, so it always gets a single
+        writer session.
+        """
+
+        if mode not in ("thread", "process"):
+            raise ValueError(f"mode must be 'thread' or 'process', not {mode!r}")
+
+        items = list(items)
+        writers = writers or min(workers, 4)
+        if self.engine.dialect.name == "sqlite":
+            writers = 1
+        session = self.session
+
+        # Load the reference data once, before the workers need it
+        self.reference_data_cache.ensure_loaded()
+
+        if mode == "process":
+            from concurrent.futures import ProcessPoolExecutor
+
+            files = [item[0] for item in items]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                descriptors = list(
+                    executor.map(
+                        describe_and_parse,
+                        files,
+                        itertools.repeat(self.science_file_parser),
+                        chunksize=max(1, len(files) // (workers * 4)),
+                    )
+                )
+            items = [(descriptor, *item[1:]) for descriptor, item in zip(descriptors, items)]
+
+        # Stats of the workers belong to this call
+        propagate = self.instrumentation.propagate if self.instrumentation is not None else None
+
+        def parse(item: tuple):
+            try:
+                return self.parse_batch_item(session, *item)
+            except Exception as e:
+                log.debug(f"Could not parse {item[0]}: {e}")
+                return e
+
+        if propagate is not None:
+            parse = propagate(parse)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(parse, items))
+
+        results = []
+        parsed_items = []
+        for parsed_item in parsed:
+            result = {"science_file_id": None, "science_product_id": None, "error": None}
+            results.append(result)
+
+            if isinstance(parsed_item, Exception):
+                result["error"] = parsed_item
+            else:
+                parsed_items.append((result, parsed_item))
+
+        write_chunk = functools.partial(self.write_batch_chunk, session)
+        if propagate is not None:
+            write_chunk = propagate(write_chunk)
+
+        with ThreadPoolExecutor(max_workers=writers) as executor:
+            chunks = self.partition_batch(parsed_items, chunk_size)
+            list(executor.map(write_chunk, chunks))
+
+        return results
+
+    def validate_many(self, paths: Iterable, workers: int = 4, mode: str = "thread", check_exists: bool = True) -> list:
+        """Check which files would be tracked, without writing anything
+
+        The reference data is loaded once (from the configuration for a tracker created without
+        an engine) and files are parsed by a pool of ``workers`` threads or processes, as in
+        ``track_concurrent``. With ``check_exists=False`` only the filenames are checked, so
+        paths don't need to exist locally.
+
+        Returns one verdict per path, in input order:
+        {"file": Path, "valid": bool, "reason": str or None}
+        """
+
+        if mode not in ("thread", "process"):
+            raise ValueError(f"mode must be 'thread' or 'process', not {mode!r}")
+
+        paths = list(paths)
+        validate = functools.partial(
+            validate_file,
+            science_file_parser=self.science_file_parser,
+            vocabulary=self.reference_data_cache.vocabulary(),
+            check_exists=check_exists,
+        )
+
+        if mode == "process":
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(validate, paths, chunksize=max(1, len(paths) // (workers * 4))))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(validate, paths))
+
+    def sync_directory(
+        self,
+        path: Path,
+        s3_bucket: str,
+        s3_prefix: str = "",
+        status: dict = None,
+        recursive: bool = True,
+        chunk_size: int = 500,
+    ) -> dict:
+        """Track the files of a directory that are new or changed since they were last tracked
+
+        The directory is walked with ``os.scandir`` and every file is compared by filename, size
+        and modification time with the files already in the science file table, which are
+        loaded with a single query. Only new and changed files are parsed and tracked (with
+        ``track_many``), and changed files get their size, modification time and location
+        updated. The S3 key of a file is ``s3_prefix`` followed by its path relative to ``path``.
+
+        Returns {"scanned": int, "unchanged": int, "results": [...]}, with one ``track_many``
+        result per new or changed file, with the file added under "file".
+        """
+
+        path = Path(path)
+
+        def scan() -> Iterator:
+            directories = [path]
+            while directories:
+                with os.scandir(directories.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            if recursive:
+                                directories.append(entry.path)
+                        elif entry.is_file():
+                            stat_result = entry.stat()
+                            filename = os.path.splitext(entry.name)[0]
+                            yield filename, stat_result.st_size, stat_result.st_mtime, (entry.path, stat_result)
+
+        def describe(entry: tuple) -> tuple:
+            file_path, stat_result = entry
+            file = FileDescriptor(Path(file_path), stat_result)
+            return file, s3_prefix + file.path.relative_to(path).as_posix(), s3_bucket
+
+        return self.sync_files(scan(), describe, status, chunk_size)
+
+    def sync_manifest(self, manifest, status: dict = None, chunk_size: int = 500) -> dict:
+        """Track the objects of a bucket listing that are new or changed since they were last tracked
+
+        ``manifest`` is the path of an S3 Inventory style CSV file (optionally gzipped) or an
+        iterable of ``(bucket, key, size, last_modified)`` rows, see
+        ``metatracker.tracker.manifest``. Objects are compared and tracked like files in
+        ``sync_directory``, without needing a local copy: their size and modification time
+        come from the manifest and their file path is their key.
+        """
+
+        def scan() -> Iterator:
+            for bucket, key, size, modified_time in iter_manifest(manifest):
+                filename = os.path.splitext(key.rpartition("/")[2])[0]
+                yield filename, size, modified_time, (bucket, key, size, modified_time)
+
+        def describe(entry: tuple) -> tuple:
+            bucket, key, size, modified_time = entry
+            file = FileDescriptor(Path(key), os.stat_result((stat.S_IFREG, 0, 0, 0, 0, 0, size, 0, modified_time, 0)))
+            # Not a local file, its path is the S3 key
+            file.absolute_path = key
+            return file, key, bucket
+
+        return self.sync_files(scan(), describe, status, chunk_size)
+
+    def sync_files(self, listing: Iterable, describe: Callable, status: dict = None, chunk_size: int = 500) -> dict:
+        """Track the new and changed files of a listing
+
+        ``listing`` yields ``(filename, file_size, modified_time, entry)`` for every file, and
+        ``describe(entry)`` returns the ``(file descriptor, s3_key, s3_bucket)`` to track. Files
+        are only described once they are known to be new or changed.
+        """
+
+        known_files = self.get_known_files()
+
+        scanned = 0
+        new_items = []
+        changed_items = []
+        for filename, file_size, modified_time, entry in listing:
+            scanned += 1
+
+            known_file = known_files.get(filename)
+            if known_file is None:
+                new_items.append((*describe(entry), status))
+            elif not self.is_unchanged(file_size, modified_time, *known_file):
+                changed_items.append((*describe(entry), status))
+
+        log.debug(f"Scanned {scanned} files: {len(new_items)} new, {len(changed_items)} changed")
+
+        items = new_items + changed_items
+        results = self.track_many(items, chunk_size=chunk_size)
+        for result, item in zip(results, items):
+            result["file"] = item[0].path
+
+        updated_items = [
+            item for result, item in zip(results[len(new_items) :], changed_items) if result["error"] is None
+        ]
+        if updated_items:
+            self.update_changed_files(self.session, updated_items)
+
+        return {"scanned": scanned, "unchanged": scanned - len(items), "results": results}
+
+    @staticmethod
+    def is_unchanged(
+        file_size: int, modified_time: float, known_file_size: int, known_file_modified_timestamp: datetime
+    ) -> bool:
+        """Check if a file still has the size and modification time it was tracked with"""
+
+        return (
+            file_size == known_file_size
+            and known_file_modified_timestamp is not None
+            and abs(datetime.fromtimestamp(modified_time) - known_file_modified_timestamp)
+            < MODIFIED_TIMESTAMP_TOLERANCE
+        )
+
+    def get_known_files(self) -> dict:
+        """Get the size and modification time of every tracked file, in one query
+        {filename: (file_size, file_modified_timestamp)}
+        """
+
+        query = select(
+            self.tables.ScienceFileTable.filename,
+            self.tables.ScienceFileTable.file_size,
+            self.tables.ScienceFileTable.file_modified_timestamp,
+        )
+
+        with self.session.begin() as sql_session:
+            # Plain Core rows, the ORM result machinery isn't needed for three columns
+            rows = sql_session.connection().execute(query, execution_options={"yield_per": 10000})
+
+            return {
+                filename: (file_size, file_modified_timestamp) for filename, file_size, file_modified_timestamp in rows
+            }
+
+    @db_retry
+    def update_changed_files(self, session: type, items: list) -> None:
+        """Update the size, modification time and location of files that changed since they were tracked"""
+
+        science_file_table = self.tables.ScienceFileTable.__table__
+        statement = (
+            update(science_file_table)
+            .where(science_file_table.c.filename == bindparam("b_filename"))
+            .values(
+                file_size=bindparam("b_file_size"),
+                file_modified_timestamp=bindparam("b_file_modified_timestamp"),
+                file_path=bindparam("b_file_path"),
+                s3_key=bindparam("b_s3_key"),
+                s3_bucket=bindparam("b_s3_bucket"),
+            )
+        )
+
+        with session.begin() as sql_session:
+            sql_session.connection().execute(
+                statement,
+                [
+                    {
+                        "b_filename": file.filename,
+                        "b_file_size": file.file_size,
+                        "b_file_modified_timestamp": file.file_modified_timestamp,
+                        "b_file_path": file.absolute_path,
+                        "b_s3_key": s3_key,
+                        "b_s3_bucket": s3_bucket,
+                    }
+                    for file, s3_key, s3_bucket, _ in items
+                ],
+            )
+
+    def write_batch_chunk(self, session: type, chunk: list) -> None:
+        """Write a chunk of parsed items in one transaction
+
+        If the transaction fails, the items are written one transaction each, so only the failing
+        ones get the error.
+        """
+
+        try:
+            self.add_batch_to_tables(session, chunk)
+        except Exception as e:
+            if len(chunk) == 1:
+                log.debug(f"Could not track {chunk[0][1]['file']['filename']}: {e}")
+                chunk[0][0].update(science_file_id=None, science_product_id=None, error=e)
+                return
+
+            log.debug(f"Could not track batch of {len(chunk)} files, tracking them one by one: {e}")
+            for item in chunk:
+                self.write_batch_chunk(session, [item])
+
+    def parse_batch_item(self, session: type, file: Path, s3_key: str, s3_bucket: str, status: dict = None) -> dict:
+        """Parse and validate a single item of a batch, raising if it cannot be tracked"""
+
+        file = self.describe_file(file)
+        if not self.is_file_real(file):
+            raise FileNotFoundError(f"File does not exist: {file}")
+
+        parsed_file = self.parse_file(session, file, s3_key, s3_bucket)
+        if not parsed_file:
+            raise ValueError(f"File is not valid: {file}")
+
+        parsed_science_product = self.parse_science_product(session, file)
+        if not parsed_science_product:
+            raise ValueError(f"Science product is not valid: {file}")
+
+        if status:
+            check_origin_file_ids(status.get("origin_file_ids", None))
+
+        return {"file": parsed_file, "science_product": parsed_science_product, "status": status}
+
+    @staticmethod
+    def chunk_list(items: list, chunk_size: int) -> list:
+        """Split a list into chunks of at most chunk_size items"""
+
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a positive integer")
+
+        return [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    @staticmethod
+    def partition_batch(parsed_items: list, chunk_size: int) -> list:
+        """Split parsed items into chunks of about chunk_size items, keeping all the items of a
+        science product (and all the items with the same filename) in the same chunk
+        """
+
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be a positive integer")
+
+        groups = {}
+        group_of_filename = {}
+        for result, parsed in parsed_items:
+            group_key = group_of_filename.setdefault(
+                parsed["file"]["filename"], MetaTracker.science_product_key(parsed["science_product"])
+            )
+            groups.setdefault(group_key, []).append((result, parsed))
+
+        chunks = []
+        chunk = []
+        for group in groups.values():
+            if chunk and len(chunk) + len(group) > chunk_size:
+                chunks.append(chunk)
+                chunk = []
+            chunk.extend(group)
+
+        if chunk:
+            chunks.append(chunk)
+
+        return chunks
+
+    @staticmethod
+    def science_product_key(parsed_science_product: dict) -> tuple:
+        """Natural key of a science product (instrument_configuration_id, mode, reference_timestamp)"""
+
+        return (
+            parsed_science_product["instrument_configuration_id"],
+            parsed_science_product["mode"],
+            parsed_science_product["reference_timestamp"],
+        )
+
+    @db_retry
+    def add_batch_to_tables(self, session: type, chunk: list) -> None:
+        """Write a chunk of parsed items to the science product, science file and status tables
+        in one transaction, filling in the result of every item of the chunk
+        """
+
+        with session.begin() as sql_session:
+            science_product_ids = self.add_batch_to_science_product_table(
+                sql_session, [parsed["science_product"] for _, parsed in chunk]
+            )
+
+            files = {}
+            for _, parsed in chunk:
+                science_product_id = science_product_ids[self.science_product_key(parsed["science_product"])]
+                files.setdefault(
+                    parsed["file"]["filename"], dict(parsed["file"], science_product_id=science_product_id)
+                )
+            science_file_ids = self.add_batch_to_science_file_table(sql_session, list(files.values()))
+
+            statuses = {}
+            for result, parsed in chunk:
+                result["science_product_id"] = files[parsed["file"]["filename"]]["science_product_id"]
+                result["science_file_id"] = science_file_ids[parsed["file"]["filename"]]
+                if parsed["status"]:
+                    statuses.setdefault(result["science_file_id"], []).append(parsed["status"])
+
+            new_statuses = self.add_batch_to_status_table(sql_session, statuses, self.lineage_closure)
+
+            # Statuses of files that already had one (or got several in this batch) are updates
+            for science_file_id, file_statuses in statuses.items():
+                if science_file_id in new_statuses:
+                    file_statuses = file_statuses[1:]
+                for status in file_statuses:
+                    self.write_status(
+                        sql_session,
+                        science_file_id=science_file_id,
+                        processing_status=status.get("processing_status"),
+                        processing_status_message=status.get("processing_status_message"),
+                        processing_time_length=status.get("processing_time_length"),
+                        origin_file_ids=status.get("origin_file_ids", None),
+                        lineage_closure=self.lineage_closure,
+                    )
+
+    def add_batch_to_science_product_table(self, sql_session: type, parsed_science_products: list) -> dict:
+        """Add science products that don't exist yet, deduplicated on their natural key
+        {(instrument_configuration_id, mode, reference_timestamp): science_product_id}
+        """
+
+        keys = {MetaTracker.science_product_key(product): product for product in parsed_science_products}
+        if not keys:
+            return {}
+
+        reference_timestamps = {key[2] for key in keys}
+
+        def select_existing() -> dict:
+            # Candidates are narrowed down by timestamp and matched in Python
+            existing = sql_session.query(
+                self.tables.ScienceProductTable.science_product_id,
+                self.tables.ScienceProductTable.instrument_configuration_id,
+                self.tables.ScienceProductTable.mode,
+                self.tables.ScienceProductTable.reference_timestamp,
+            ).filter(self.tables.ScienceProductTable.reference_timestamp.in_(reference_timestamps))
+
+            science_product_ids = {}
+            for science_product_id, *key in existing:
+                science_product_ids.setdefault(tuple(key), science_product_id)
+
+            return {key: science_product_ids[key] for key in keys if key in science_product_ids}
+
+        science_product_ids = select_existing()
+        missing = [product for key, product in keys.items() if key not in science_product_ids]
+        if missing:
+            insert_many_or_ignore(sql_session, self.tables.ScienceProductTable, missing, SCIENCE_PRODUCT_KEY)
+            science_product_ids = select_existing()
+
+        log.debug(f"Added {len(missing)} science products to Science Product Table")
+        return science_product_ids
+
+    def add_batch_to_science_file_table(self, sql_session: type, parsed_files: list) -> dict:
+        """Add science files that don't exist yet, deduplicated on filename
+        {filename: science_file_id}
+        """
+
+        filenames = [parsed_file["filename"] for parsed_file in parsed_files]
+        if not filenames:
+            return {}
+
+        def select_existing() -> dict:
+            existing = sql_session.query(
+                self.tables.ScienceFileTable.science_file_id, self.tables.ScienceFileTable.filename
+            ).filter(self.tables.ScienceFileTable.filename.in_(filenames))
+
+            return {row.filename: row.science_file_id for row in existing}
+
+        science_file_ids = select_existing()
+        missing = [parsed_file for parsed_file in parsed_files if parsed_file["filename"] not in science_file_ids]
+        if missing:
+            insert_many_or_ignore(sql_session, self.tables.ScienceFileTable, missing, SCIENCE_FILE_KEY)
+            science_file_ids = select_existing()
+
+        log.debug(f"Added {len(missing)} files to Science File Table")
+        return science_file_ids
+
+    def add_batch_to_status_table(self, sql_session: type, statuses: dict, lineage_closure: bool = False) -> set:
+        """Add a status for science files that don't have one yet
+
+        ``statuses`` maps science_file_id to the list of statuses tracked for it, only the first
+        one is inserted. Returns the science file ids that got a new status.
+        """
+
+        if not statuses:
+            return set()
+
+        existing = sql_session.query(self.tables.StatusTable.science_file_id).filter(
+            self.tables.StatusTable.science_file_id.in_(statuses)
+        )
+        new_science_file_ids = set(statuses) - {row.science_file_id for row in existing}
+        if not new_science_file_ids:
+            return set()
+
+        now = datetime.now(timezone.utc)
+        insert_many_or_ignore(
+            sql_session,
+            self.tables.StatusTable,
+            [
+                {
+                    "science_file_id": science_file_id,
+                    "processing_status": statuses[science_file_id][0].get("processing_status"),
+                    "processing_status_message": statuses[science_file_id][0].get("processing_status_message"),
+                    "processing_time_length": statuses[science_file_id][0].get("processing_time_length"),
+                    "original_processing_timestamp": now,
+                    "last_processing_timestamp": now,
+                    "reprocessed_count": 0,
+                }
+                for science_file_id in new_science_file_ids
+            ],
+            STATUS_KEY,
+        )
+
+        # Link the new statuses to their origin files, ignoring unknown ids like add_to_status_table
+        origin_file_ids = {
+            science_file_id: statuses[science_file_id][0].get("origin_file_ids")
+            for science_file_id in new_science_file_ids
+            if statuses[science_file_id][0].get("origin_file_ids")
+        }
+        if origin_file_ids:
+            status_ids = self.select_status_ids(sql_session, origin_file_ids)
+            self.write_batch_origin_files(
+                sql_session,
+                [
+                    (status_ids[science_file_id], science_file_id, status_origin_file_ids)
+                    for science_file_id, status_origin_file_ids in origin_file_ids.items()
+                ],
+                lineage_closure=lineage_closure,
+            )
+
+        log.debug(f"Added {len(new_science_file_ids)} statuses to Status Table")
+        return new_science_file_ids
+
+    def select_status_ids(self, sql_session: type, science_file_ids) -> dict:
+        """Status ids of science files within an open transaction, as {science_file_id: status_id}"""
+
+        status_ids = sql_session.execute(
+            select(self.tables.StatusTable.science_file_id, self.tables.StatusTable.status_id).where(
+                self.tables.StatusTable.science_file_id.in_(set(science_file_ids))
+            )
+        )
+
+        return dict(status_ids.all())
+
+    def write_batch_origin_files(self, sql_session: type, links: list, lineage_closure: bool = False) -> None:
+        """Link many statuses to origin files within an open transaction
+
+        ``links`` holds ``(status_id, science_file_id, origin_file_ids)`` tuples. Ids that aren't
+        tracked files are skipped like in ``write_origin_files``, with one query for the known
+        files and a single multi-row INSERT for the missing pairs.
+        """
 
-        parsed_file = self.parse_file(session, file, s3_key, s3_bucket)
-        parsed_science_product = self.parse_science_product(session, file)
+        origin_file_ids = {
+            origin_file_id for _, _, status_origin_file_ids in links for origin_file_id in status_origin_file_ids
+        }
+        if not origin_file_ids:
+            return
 
-        # Check if science_product_id is provided
-        if science_product_id is None:
-            science_product_id = self.add_to_science_product_table(
-                session=session, parsed_science_product=parsed_science_product
+        known_origin_file_ids = set(
+            sql_session.scalars(
+                select(self.tables.ScienceFileTable.science_file_id).where(
+                    self.tables.ScienceFileTable.science_file_id.in_(origin_file_ids)
+                )
             )
-            log.debug("Added to Science Product Table")
-        else:
-            log.debug(f"Using existing science_product_id: {science_product_id}")
-
-        # Add to science file table
-        log.debug("Added to Science Product Table")
-        science_file_id = self.add_to_science_file_table(
-            session=session, parsed_file=parsed_file, science_product_id=science_product_id
         )
-        log.debug("Added to Science File Table")
-
-        if status:
-            # Add to status table if status is provided
-            log.debug("Added to Status Table")
-            self.add_to_status_table(
-                session=session,
-                science_file_id=science_file_id,
-                processing_status=status.get("processing_status"),
-                processing_status_message=status.get("processing_status_message"),
-                processing_time_length=status.get("processing_time_length"),
-                origin_file_ids=status.get("origin_file_ids", None),
+        links = [
+            (status_id, science_file_id, sorted(set(status_origin_file_ids) & known_origin_file_ids))
+            for status_id, science_file_id, status_origin_file_ids in links
+        ]
+
+        association = self.tables.status_origin_association
+        index_elements = ["status_id", "origin_file_id"]
+        pairs = {
+            (status_id, origin_file_id)
+            for status_id, _, status_origin_file_ids in links
+            for origin_file_id in status_origin_file_ids
+        }
+        if pairs and not supports_on_conflict(sql_session, association, index_elements):
+            # Without conflict handling the existing pairs have to be left out beforehand
+            pairs -= set(
+                sql_session.execute(
+                    select(association.c.status_id, association.c.origin_file_id).where(
+                        association.c.status_id.in_({status_id for status_id, _ in pairs})
+                    )
+                )
             )
+        insert_many_or_ignore(
+            sql_session,
+            association,
+            [{"status_id": status_id, "origin_file_id": origin_file_id} for status_id, origin_file_id in sorted(pairs)],
+            index_elements,
+        )
 
-        return science_file_id, science_product_id
+        if lineage_closure:
+            for _, science_file_id, status_origin_file_ids in links:
+                self.write_lineage(sql_session, science_file_id, status_origin_file_ids)
 
     @db_retry
     def add_to_science_file_table(self, session: type, parsed_file: dict, science_product_id: int) -> int:
-        """Add a file to the file table"""
+        """Add a file to the file table, or return the id of the file with the same filename"""
 
         with session.begin() as sql_session:
             if not parsed_file:
                 log.debug("File is not valid")
                 return
 
-            # 1. Check for existing file by UNIQUE constraint (filename)
-            file = (
-                sql_session.query(ScienceFileTable)
-                .filter(ScienceFileTable.filename == parsed_file["filename"])
-                .first()
-            )
-
-            if file:
-                # Optionally update fields if needed (for now just return the id)
-                log.debug(f"File already exists in Science File Table with id: {file.science_file_id}")
-                return file.science_file_id
-
-            # 2. If not found, insert new
-            file = ScienceFileTable(
-                science_product_id=science_product_id,
-                file_type=parsed_file["file_type"],
-                file_level=parsed_file["file_level"],
-                filename=parsed_file["filename"],
-                file_version=parsed_file["file_version"],
-                file_size=parsed_file["file_size"],
-                s3_key=parsed_file["s3_key"],
-                s3_bucket=parsed_file["s3_bucket"],
-                file_extension=parsed_file["file_extension"],
-                file_path=parsed_file["file_path"],
-                file_modified_timestamp=parsed_file["file_modified_timestamp"],
-                is_public=parsed_file["is_public"],
-            )
-            sql_session.add(file)
-            sql_session.flush()
-            science_file_id = file.science_file_id
-            log.debug(f"Added file to Science File Table with id: {science_file_id}")
-            return science_file_id
+            return self.write_science_file(sql_session, parsed_file, science_product_id)
 
     @db_retry
     def add_to_science_product_table(self, session: type, parsed_science_product: dict):
-        sess = session()
-
-        # Check if science product exists with same instrument configuration id, mode, and reference timestamp
-        science_product = (
-            sess.query(ScienceProductTable)
-            .filter(
-                ScienceProductTable.instrument_configuration_id
-                == parsed_science_product["instrument_configuration_id"],
-                ScienceProductTable.mode == parsed_science_product["mode"],
-                ScienceProductTable.reference_timestamp == parsed_science_product["reference_timestamp"],
-            )
-            .first()
-        )
-
-        # If science product exists, return science product id
-        if science_product:
-            return science_product.science_product_id
-
-        # If science product doesn't exist, add it to the database
-        science_product = ScienceProductTable(
-            instrument_configuration_id=parsed_science_product["instrument_configuration_id"],
-            mode=parsed_science_product["mode"],
-            reference_timestamp=parsed_science_product["reference_timestamp"],
-        )
-        sess.add(science_product)
-        sess.commit()
+        """Add a science product, or return the id of the product with the same
+        instrument configuration id, mode and reference timestamp
+        """
 
-        # return science product id that was just added
-        return science_product.science_product_id
+        with session.begin() as sql_session:
+            return self.write_science_product(sql_session, parsed_science_product)
 
     @db_retry
     def add_to_status_table(
@@ -163,47 +1175,281 @@ class MetaTracker:
         """Add or update a status entry for a science file in the status table."""
 
         with session.begin() as sql_session:
-            # Validate and fetch origin files if provided
-            origin_files = []
-            if origin_file_ids is not None:
-                if not isinstance(origin_file_ids, list) or not all(isinstance(i, int) for i in origin_file_ids):
-                    raise ValueError("origin_file_ids must be a list of integers or None")
-                origin_files = (
-                    sql_session.query(ScienceFileTable)
-                    .filter(ScienceFileTable.science_file_id.in_(origin_file_ids))
-                    .all()
-                )
+            return self.write_status(
+                sql_session,
+                science_file_id=science_file_id,
+                processing_status=processing_status,
+                processing_status_message=processing_status_message,
+                processing_time_length=processing_time_length,
+                origin_file_ids=origin_file_ids,
+                lineage_closure=self.lineage_closure,
+            )
+
+    def write_science_file(self, sql_session: type, parsed_file: dict, science_product_id: int) -> int:
+        """Write a file to the file table within an open transaction"""
 
-            # Check if status already exists
-            status = sql_session.query(StatusTable).filter(StatusTable.science_file_id == science_file_id).first()
+        science_file_id = insert_or_ignore(
+            sql_session,
+            self.tables.ScienceFileTable,
+            dict(parsed_file, science_product_id=science_product_id),
+            SCIENCE_FILE_KEY,
+        )
+        log.debug(f"Science file {parsed_file['filename']} has id: {science_file_id}")
+        return science_file_id
+
+    def write_science_product(self, sql_session: type, parsed_science_product: dict) -> int:
+        """Write a science product to the science product table within an open transaction"""
+
+        science_product_id = insert_or_ignore(
+            sql_session, self.tables.ScienceProductTable, dict(parsed_science_product), SCIENCE_PRODUCT_KEY
+        )
+        log.debug(f"Science product has id: {science_product_id}")
+        return science_product_id
+
+    def write_status(
+        self,
+        sql_session: type,
+        science_file_id: int,
+        processing_status: str,
+        processing_status_message: str = None,
+        processing_time_length: int = None,
+        origin_file_ids: list[int] = None,
+        lineage_closure: bool = False,
+    ) -> int:
+        """Add or update a status entry within an open transaction"""
+
+        check_origin_file_ids(origin_file_ids)
+
+        now = datetime.now(timezone.utc)
+        status_id = upsert(
+            sql_session,
+            self.tables.StatusTable,
+            values={
+                "science_file_id": science_file_id,
+                "processing_status": processing_status,
+                "processing_status_message": processing_status_message,
+                "processing_time_length": processing_time_length,
+                "original_processing_timestamp": now,
+                "last_processing_timestamp": now,
+                "reprocessed_count": 0,
+            },
+            index_elements=STATUS_KEY,
+            update_values={
+                "processing_status": processing_status,
+                "processing_status_message": processing_status_message,
+                "processing_time_length": processing_time_length,
+                "last_processing_timestamp": now,
+                "reprocessed_count": self.tables.StatusTable.reprocessed_count + 1,
+            },
+        )
+
+        # Extend existing origin_files without duplicates
+        if origin_file_ids:
+            self.write_origin_files(
+                sql_session,
+                status_id,
+                origin_file_ids,
+                lineage_closure=lineage_closure,
+                science_file_id=science_file_id,
+            )
 
-            if status:
-                # Update fields
-                status.processing_status = processing_status
-                status.processing_status_message = processing_status_message
-                status.last_processing_timestamp = datetime.now(timezone.utc)
-                status.reprocessed_count += 1
-                status.processing_time_length = processing_time_length
+        return status_id
 
-                # Extend existing origin_files without duplicates
-                if origin_files:
-                    existing_ids = {f.science_file_id for f in status.origin_files}
-                    new_files = [f for f in origin_files if f.science_file_id not in existing_ids]
-                    status.origin_files.extend(new_files)
+    def write_status_rows(self, sql_session: type, statuses: list, lineage_closure: bool = False) -> list:
+        """Add or update many status entries within an open transaction
 
+        ``statuses`` holds the keyword arguments of ``write_status``, applied in order. Statuses
+        are written with one multi-row upsert per occurrence of a science file (one in all for
+        distinct files), then read back and linked to their origin files in bulk. Returns the
+        status ids in the order of ``statuses``.
+        """
+
+        if not statuses:
+            return []
+
+        for status in statuses:
+            check_origin_file_ids(status.get("origin_file_ids"))
+
+        # A row can only be upserted once per statement, repeated science files go in later rounds
+        rounds = []
+        for status in statuses:
+            for round_statuses in rounds:
+                if status["science_file_id"] not in round_statuses:
+                    round_statuses[status["science_file_id"]] = status
+                    break
             else:
-                # Create new entry
-                status = StatusTable(
-                    science_file_id=science_file_id,
-                    processing_status=processing_status,
-                    processing_status_message=processing_status_message,
-                    processing_time_length=processing_time_length,
-                    origin_files=origin_files,
+                rounds.append({status["science_file_id"]: status})
+
+        now = datetime.now(timezone.utc)
+        for round_statuses in rounds:
+            upsert_many(
+                sql_session,
+                self.tables.StatusTable,
+                [
+                    {
+                        "science_file_id": science_file_id,
+                        "processing_status": status["processing_status"],
+                        "processing_status_message": status.get("processing_status_message"),
+                        "processing_time_length": status.get("processing_time_length"),
+                        "original_processing_timestamp": now,
+                        "last_processing_timestamp": now,
+                        "reprocessed_count": 0,
+                    }
+                    for science_file_id, status in round_statuses.items()
+                ],
+                index_elements=STATUS_KEY,
+                update_columns=[
+                    "processing_status",
+                    "processing_status_message",
+                    "processing_time_length",
+                    "last_processing_timestamp",
+                ],
+                update_values={"reprocessed_count": self.tables.StatusTable.reprocessed_count + 1},
+            )
+
+        status_ids = self.select_status_ids(sql_session, [status["science_file_id"] for status in statuses])
+        self.write_batch_origin_files(
+            sql_session,
+            [
+                (status_ids[status["science_file_id"]], status["science_file_id"], status["origin_file_ids"])
+                for status in statuses
+                if status.get("origin_file_ids")
+            ],
+            lineage_closure=lineage_closure,
+        )
+
+        return [status_ids[status["science_file_id"]] for status in statuses]
+
+    @db_retry
+    def add_origin_files(self, session: type, status_id: int, origin_file_ids: list[int]) -> None:
+        """Link a status to more origin files"""
+
+        with session.begin() as sql_session:
+            self.write_origin_files(sql_session, status_id, origin_file_ids, lineage_closure=self.lineage_closure)
+
+    def write_origin_files(
+        self,
+        sql_session: type,
+        status_id: int,
+        origin_file_ids: list[int],
+        lineage_closure: bool = False,
+        science_file_id: int = None,
+    ) -> None:
+        """Link a status to origin files within an open transaction
+
+        Only the missing ``(status_id, origin_file_id)`` pairs are inserted, with a single
+        INSERT ... SELECT that also skips ids that aren't tracked files, without loading the
+        existing origin files.
+        """
+
+        association = self.tables.status_origin_association
+        missing_origin_files = select(literal(status_id), self.tables.ScienceFileTable.science_file_id).where(
+            self.tables.ScienceFileTable.science_file_id.in_(set(origin_file_ids)),
+            ~select(association.c.origin_file_id)
+            .where(
+                association.c.status_id == status_id,
+                association.c.origin_file_id == self.tables.ScienceFileTable.science_file_id,
+            )
+            .exists(),
+        )
+
+        insert_from_select_or_ignore(
+            sql_session,
+            association,
+            ["status_id", "origin_file_id"],
+            missing_origin_files,
+            ["status_id", "origin_file_id"],
+        )
+
+        if lineage_closure:
+            if science_file_id is None:
+                science_file_id = sql_session.scalar(
+                    select(self.tables.StatusTable.science_file_id).where(
+                        self.tables.StatusTable.status_id == status_id
+                    )
+                )
+            known_origin_file_ids = sql_session.scalars(
+                select(self.tables.ScienceFileTable.science_file_id).where(
+                    self.tables.ScienceFileTable.science_file_id.in_(set(origin_file_ids))
+                )
+            ).all()
+            self.write_lineage(sql_session, science_file_id, known_origin_file_ids)
+
+    def write_lineage(self, sql_session: type, science_file_id: int, origin_file_ids: list[int]) -> None:
+        """Add the paths through new origin file links to the lineage closure table
+
+        Every ancestor of an origin file (and the origin file itself) becomes an ancestor of every
+        descendant of the science file (and the science file itself). Paths that are already
+        known only get their depth lowered when the new path is shorter.
+        """
+
+        if not origin_file_ids:
+            return
+
+        lineage = self.tables.science_file_lineage
+
+        # Ancestors of the origin files and descendants of the science file, with their depth
+        ancestors = [(origin_file_id, origin_file_id, 0) for origin_file_id in origin_file_ids]
+        ancestors += sql_session.execute(
+            select(lineage.c.ancestor_id, lineage.c.descendant_id, lineage.c.depth).where(
+                lineage.c.descendant_id.in_(set(origin_file_ids))
+            )
+        ).all()
+        descendants = [(science_file_id, 0)]
+        descendants += sql_session.execute(
+            select(lineage.c.descendant_id, lineage.c.depth).where(lineage.c.ancestor_id == science_file_id)
+        ).all()
+
+        paths = {}
+        for ancestor_id, _, ancestor_depth in ancestors:
+            for descendant_id, descendant_depth in descendants:
+                if ancestor_id == descendant_id:
+                    # A cycle, a file is not its own ancestor
+                    continue
+                depth = ancestor_depth + 1 + descendant_depth
+                if depth < paths.get((ancestor_id, descendant_id), LINEAGE_DEPTH_LIMIT + 1):
+                    paths[(ancestor_id, descendant_id)] = depth
+
+        if not paths:
+            return
+
+        known_paths = {}
+        for pairs in MetaTracker.chunk_list(list(paths), 500):
+            known_paths.update(
+                ((row.ancestor_id, row.descendant_id), row.depth)
+                for row in sql_session.execute(
+                    select(lineage.c.ancestor_id, lineage.c.descendant_id, lineage.c.depth).where(
+                        tuple_(lineage.c.ancestor_id, lineage.c.descendant_id).in_(pairs)
+                    )
                 )
-                sql_session.add(status)
+            )
+
+        insert_many_or_ignore(
+            sql_session,
+            lineage,
+            [
+                {"ancestor_id": ancestor_id, "descendant_id": descendant_id, "depth": depth}
+                for (ancestor_id, descendant_id), depth in paths.items()
+                if (ancestor_id, descendant_id) not in known_paths
+            ],
+            ["ancestor_id", "descendant_id"],
+        )
 
-            sql_session.flush()
-            return status.status_id
+        shorter_paths = [
+            {"b_ancestor_id": ancestor_id, "b_descendant_id": descendant_id, "b_depth": depth}
+            for (ancestor_id, descendant_id), depth in paths.items()
+            if depth < known_paths.get((ancestor_id, descendant_id), depth)
+        ]
+        if shorter_paths:
+            sql_session.connection().execute(
+                update(lineage)
+                .where(
+                    lineage.c.ancestor_id == bindparam("b_ancestor_id"),
+                    lineage.c.descendant_id == bindparam("b_descendant_id"),
+                )
+                .values(depth=bindparam("b_depth")),
+                shorter_paths,
+            )
 
     @staticmethod
     def get_file_size(file: Path) -> int:
@@ -219,41 +1465,71 @@ class MetaTracker:
     @staticmethod
     def is_file_real(file: Path) -> bool:
         """Check if file exists"""
+        if isinstance(file, FileDescriptor):
+            return file.exists
+
         return file.is_file()
 
+    @staticmethod
+    def describe_file(file: Path) -> FileDescriptor:
+        """Describe a file once so it can be validated, parsed and tracked without touching it again"""
+
+        if isinstance(file, FileDescriptor):
+            return file
+
+        return FileDescriptor(file)
+
     def is_valid_file_product(self, file: Path) -> bool:
         """Check if a file is a valid product"""
 
         return self.is_valid_file_type(extension=self.parse_extension(file))
 
-    def parse_science_file_data(self, file: Path) -> dict:
-        """Parse a science file"""
+    def parse_science_file_at(self, file: Path, modified_time: float) -> dict:
+        """Run the science file parser, ``modified_time`` is only used as part of the cache key"""
 
         return self.science_file_parser(file)
 
+    def parse_science_file_data(self, file: Path) -> dict:
+        """Parse a science file
+
+        The result is stored on the file descriptor and memoized by path and modification time.
+        """
+
+        file = self.describe_file(file)
+        if file.science_file_data is None:
+            if file.exists:
+                file.science_file_data = self.cached_science_file_parser(file.path, file.modified_time)
+            else:
+                file.science_file_data = self.science_file_parser(file.path)
+
+        return file.science_file_data
+
     def parse_file(self, session, file: Path, s3_key: str, s3_bucket: str) -> dict:
         """Parse a file"""
 
+        file = self.describe_file(file)
         if self.is_file_real(file):
-            extension = self.parse_extension(file)
-            if not self.is_valid_file_type(session=session, extension=extension):
-                log.debug("File type is not valid")
+            extension = file.extension
+            reason = check_file_type(extension, self.reference_data.file_types)
+            if reason is not None:
+                log.debug(reason)
                 return {}
 
             science_file_data = self.parse_science_file_data(file)
 
-            if not self.is_valid_file_level(session=session, file_level=science_file_data["level"]):
-                log.debug("File level is not valid")
+            reason = check_file_level(science_file_data, self.reference_data.file_levels)
+            if reason is not None:
+                log.debug(reason)
                 return {}
 
             return {
-                "file_path": self.parse_absolute_path(file),
+                "file_path": file.absolute_path,
                 "s3_key": s3_key,
                 "s3_bucket": s3_bucket,
-                "filename": self.parse_filename(file),
-                "file_extension": self.parse_extension(file),
-                "file_size": self.get_file_size(file),
-                "file_modified_timestamp": self.get_file_modified_timestamp(file),
+                "filename": file.filename,
+                "file_extension": extension,
+                "file_size": file.file_size,
+                "file_modified_timestamp": file.file_modified_timestamp,
                 "file_level": science_file_data["level"],
                 "file_type": self.get_file_type(session=session, extension=extension),
                 "file_version": science_file_data["version"],
@@ -263,38 +1539,27 @@ class MetaTracker:
         return {}
 
     def parse_science_product(self, session, file: Path) -> dict:
+        file = self.describe_file(file)
         if self.is_file_real(file):
             science_product_data = self.parse_science_file_data(file)
 
-            if not self.is_valid_timestamp(science_product_data["time"]):
-                log.debug("Timestamp is not valid")
-                return {}
-
-            # Check if value is already a datetime object
-            if isinstance(science_product_data["time"].value, datetime):
-                reference_timestamp = science_product_data["time"].value
-            else:
-                reference_timestamp = datetime.strptime(science_product_data["time"].value, "%Y-%m-%dT%H:%M:%S.%f")
-
-            if not self.is_valid_instrument(session=session, instrument_short_name=science_product_data["instrument"]):
-                log.debug("Instrument is not valid")
-                return {}
-
-            config = self.get_instrument_configurations(session=session)
-
-            if [science_product_data["instrument"]] not in config.values():
-                log.debug("Instrument configuration is not valid")
+            reference_data = self.reference_data
+            reason = check_science_product(
+                science_product_data, reference_data.instrument_short_names, reference_data.configuration_index
+            )
+            if reason is not None:
+                log.debug(reason)
                 return {}
 
-            # return Key with matching list values
-            instrument_config_id = [k for k, v in config.items() if science_product_data["instrument"] in v][0]
-            if not instrument_config_id:
-                raise ValueError(f"Instrument configuration id not found {science_product_data}")
+            # Look up the configuration made up of exactly this instrument
+            instrument_config_id = reference_data.configuration_index[frozenset([science_product_data["instrument"]])]
+            reference_timestamp = get_reference_timestamp(science_product_data["time"])
 
             return {
                 "instrument_configuration_id": instrument_config_id,
                 "reference_timestamp": reference_timestamp,
-                "mode": science_product_data["mode"],
+                # No mode is stored as an empty string, see ScienceProductTable.mode
+                "mode": science_product_data["mode"] or "",
             }
 
     @staticmethod
@@ -303,44 +1568,52 @@ class MetaTracker:
 
         return timestamp is not None
 
-    @staticmethod
-    def is_valid_instrument(session: type, instrument_short_name: str) -> bool:
-        """Check if an instrument is valid"""
+    def is_valid_instrument(self, session: type = None, instrument_short_name: str = None) -> bool:
+        """Check if an instrument is valid
 
-        with session.begin() as sql_session:
-            instruments = sql_session.query(InstrumentTable).all()
-            valid_instrument_short_names = [instrument.short_name for instrument in instruments]
+        ``session`` is no longer used, instruments are served from the reference data cache.
+        """
 
-            return instrument_short_name in valid_instrument_short_names
+        return instrument_short_name in self.reference_data.instrument_short_names
 
-    @staticmethod
-    def get_file_type(session: type, extension: str):
+    def get_file_type(self, session: type = None, extension: str = None):
         """Get the file type of a file"""
 
-        with session.begin() as sql_session:
-            file_type = sql_session.query(FileTypeTable).filter(FileTypeTable.extension == extension).first()
+        return self.reference_data.file_types[extension]
 
-            return file_type.short_name
+    def is_valid_file_type(self, session: type = None, extension: str = None):
+        """Check if a file extension is valid file type in the database"""
+
+        return extension in self.reference_data.file_types
+
+    def is_valid_file_level(self, session: type = None, file_level: str = None):
+        """Check if a file level is valid file level in the database"""
+
+        return file_level in self.reference_data.file_levels
 
     @staticmethod
-    def is_valid_file_type(session: type, extension: str):
-        """Check if a file extension is valid file type in the database"""
+    def get_file_types(session: type, tables: Optional[MissionTables] = None) -> list:
+        """Get all file types from the database
+        [(extension, short_name), ...]
+        """
+
+        tables = tables or get_mission_tables()
 
         with session.begin() as sql_session:
-            file_types = sql_session.query(FileTypeTable).all()
-            valid_extensions = [file_type.extension for file_type in file_types]
+            file_types = sql_session.query(tables.FileTypeTable.extension, tables.FileTypeTable.short_name).all()
 
-            return extension in valid_extensions
+            return [(file_type.extension, file_type.short_name) for file_type in file_types]
 
     @staticmethod
-    def is_valid_file_level(session: type, file_level: str):
-        """Check if a file level is valid file level in the database"""
+    def get_file_levels(session: type, tables: Optional[MissionTables] = None) -> list:
+        """Get all file level short names from the database"""
+
+        tables = tables or get_mission_tables()
 
         with session.begin() as sql_session:
-            file_levels = sql_session.query(FileLevelTable).all()
-            valid_file_levels = [file_level.short_name for file_level in file_levels]
+            file_levels = sql_session.query(tables.FileLevelTable.short_name).all()
 
-            return file_level in valid_file_levels
+            return [file_level.short_name for file_level in file_levels]
 
     @staticmethod
     def parse_extension(file: Path) -> str:
@@ -361,68 +1634,556 @@ class MetaTracker:
         return str(file.absolute())
 
     @staticmethod
-    def get_instruments(session: type) -> list:
+    def get_instruments(session: type, tables: Optional[MissionTables] = None) -> list:
         """Get all instruments from the database
         {instrument_id: "instrument_short_name"}
         """
 
+        tables = tables or get_mission_tables()
+
         with session.begin() as sql_session:
-            instruments = sql_session.query(InstrumentTable).all()
+            instruments = sql_session.query(tables.InstrumentTable).all()
             instruments = {instrument.instrument_id: instrument.short_name for instrument in instruments}
 
             return instruments
 
-    def get_instrument_configurations(self, session: type) -> dict:
+    @staticmethod
+    def get_instrument_configurations(session: type, tables: Optional[MissionTables] = None) -> dict:
         """Get all configurations from the database
-        {configuration_id: [instrument_1_id, instrument_2_id, ...]}
+        {configuration_id: [instrument_1_short_name, instrument_2_short_name, ...]}
+
+        Configurations are resolved with a single query, outer joining the instrument
+        table once per ``instrument_N_id`` column.
         """
 
+        from sqlalchemy.orm import aliased
+
+        tables = tables or get_mission_tables()
+
+        instrument_id_columns = [
+            getattr(tables.InstrumentConfigurationTable, column.name)
+            for column in tables.InstrumentConfigurationTable.__table__.columns
+            if column.name != "instrument_configuration_id"
+        ]
+        instrument_aliases = [aliased(tables.InstrumentTable) for _ in instrument_id_columns]
+
         with session.begin() as sql_session:
-            # Get amount of instruments from InstrumentTable
-            instruments = self.get_instruments(session)
-            amount_of_instruments = len(instruments)
-            configurations = sql_session.query(InstrumentConfigurationTable).all()
+            query = sql_session.query(
+                tables.InstrumentConfigurationTable.instrument_configuration_id,
+                *[instrument_alias.short_name for instrument_alias in instrument_aliases],
+            )
+            for instrument_id_column, instrument_alias in zip(instrument_id_columns, instrument_aliases):
+                query = query.outerjoin(instrument_alias, instrument_alias.instrument_id == instrument_id_column)
 
             instrument_configurations = {}
-            for config in configurations:
-                # For the amount of instruments
-                instruments = []
-                for i in range(amount_of_instruments):
-                    attribute = getattr(config, "instrument_" + str(i + 1) + "_id")
-                    if attribute is not None:
-                        attribute = self.get_instrument_by_id(session, int(attribute))
-                        instruments.append(attribute)
-
-                instruments.sort()
-                instrument_configurations[config.instrument_configuration_id] = instruments
+            for configuration_id, *short_names in query.all():
+                instrument_configurations[configuration_id] = sorted(
+                    short_name for short_name in short_names if short_name is not None
+                )
 
             return instrument_configurations
 
-    def get_instrument_by_id(self, session, instrument_id: int) -> str:
+    @staticmethod
+    def get_configuration_index(instrument_configurations: dict) -> dict:
+        """Build a reverse index of instrument configurations
+        {frozenset(instrument_short_names): configuration_id}
+        """
+
+        configuration_index = {}
+        for configuration_id, short_names in instrument_configurations.items():
+            configuration_index.setdefault(frozenset(short_names), configuration_id)
+
+        return configuration_index
+
+    @staticmethod
+    def get_instrument_by_id(session, instrument_id: int, tables: Optional[MissionTables] = None) -> str:
         """Get instrument by id"""
 
-        with session.begin():
-            instruments = self.get_instruments(session)
-            return instruments[instrument_id]
+        tables = tables or get_mission_tables()
+
+        with session.begin() as sql_session:
+            instrument = (
+                sql_session.query(tables.InstrumentTable.short_name)
+                .filter(tables.InstrumentTable.instrument_id == instrument_id)
+                .one()
+            )
+
+            return instrument.short_name
 
     def map_instrument_list(self, session: type, instrument_list: list) -> list:
         """Map an instrument list of id to a list of instrument shortnames"""
 
-        with session.begin():
-            return [self.get_instrument_by_id(session, instrument_id) for instrument_id in instrument_list]
+        instruments = self.get_instruments(session, self.tables)
+
+        return [instruments[instrument_id] for instrument_id in instrument_list]
+
+    def get_ancestors(self, science_file_id: int, max_depth: Optional[int] = None) -> list:
+        """Get the files a science file was derived from, directly or through other files
+        [(science_file_id, filename, s3_key, s3_bucket, depth), ...]
+
+        Depth 1 are the origin files of the file, depth 2 their origin files, and so on (up to
+        ``max_depth``). Rows are ordered by depth and each file is listed once, at its shortest
+        depth. See ``query_lineage``.
+        """
+
+        return self.query_lineage(science_file_id, max_depth, ancestors=True)
+
+    def get_descendants(self, science_file_id: int, max_depth: Optional[int] = None) -> list:
+        """Get the files derived from a science file, directly or through other files, e.g. what
+        must be reprocessed when the file changes
+        [(science_file_id, filename, s3_key, s3_bucket, depth), ...]
+
+        Depth 1 are the files that list the file as an origin file, and so on (up to
+        ``max_depth``). See ``query_lineage``.
+        """
+
+        return self.query_lineage(science_file_id, max_depth, ancestors=False)
+
+    def query_lineage(self, science_file_id: int, max_depth: Optional[int] = None, ancestors: bool = True) -> list:
+        """Get the ancestors or descendants of a science file in a single query
+
+        With the lineage closure table enabled, they are looked up in it directly. Otherwise
+        status_origin_association is walked with a recursive CTE, at most LINEAGE_DEPTH_LIMIT
+        links deep.
+        """
+
+        depth_limit = min(max_depth, LINEAGE_DEPTH_LIMIT) if max_depth is not None else LINEAGE_DEPTH_LIMIT
+
+        if self.lineage_closure:
+            lineage = self.tables.science_file_lineage
+            start_column, related_column = (
+                (lineage.c.descendant_id, lineage.c.ancestor_id)
+                if ancestors
+                else (lineage.c.ancestor_id, lineage.c.descendant_id)
+            )
+            related = (
+                select(related_column.label("science_file_id"), lineage.c.depth)
+                .where(start_column == science_file_id, lineage.c.depth <= depth_limit)
+                .subquery()
+            )
+        else:
+            edges = self.lineage_edges().cte("lineage_edges")
+            start_column, related_column = (
+                (edges.c.child_id, edges.c.parent_id) if ancestors else (edges.c.parent_id, edges.c.child_id)
+            )
+
+            related = (
+                select(related_column.label("science_file_id"), literal_column("1").label("depth"))
+                .where(start_column == science_file_id)
+                .cte("lineage", recursive=True)
+            )
+            related = related.union(
+                select(related_column, related.c.depth + 1)
+                .join(related, start_column == related.c.science_file_id)
+                .where(related.c.depth < depth_limit)
+            )
+
+        query = (
+            select(
+                self.tables.ScienceFileTable.science_file_id,
+                self.tables.ScienceFileTable.filename,
+                self.tables.ScienceFileTable.s3_key,
+                self.tables.ScienceFileTable.s3_bucket,
+                func.min(related.c.depth).label("depth"),
+            )
+            .join(related, related.c.science_file_id == self.tables.ScienceFileTable.science_file_id)
+            .where(self.tables.ScienceFileTable.science_file_id != science_file_id)
+            .group_by(
+                self.tables.ScienceFileTable.science_file_id,
+                self.tables.ScienceFileTable.filename,
+                self.tables.ScienceFileTable.s3_key,
+                self.tables.ScienceFileTable.s3_bucket,
+            )
+            .order_by("depth", self.tables.ScienceFileTable.science_file_id)
+        )
+
+        with self.session.begin() as sql_session:
+            return sql_session.execute(query).all()
+
+    def lineage_edges(self) -> type:
+        """Query of the (parent_id, child_id) links recorded in status_origin_association"""
+
+        association = self.tables.status_origin_association
+
+        return select(
+            association.c.origin_file_id.label("parent_id"), self.tables.StatusTable.science_file_id.label("child_id")
+        ).join(self.tables.StatusTable, self.tables.StatusTable.status_id == association.c.status_id)
+
+    @db_retry
+    def rebuild_lineage_closure(self) -> None:
+        """Rebuild the lineage closure table from status_origin_association
+
+        Needed once when enabling ``lineage_closure`` on a catalog that already links origin
+        files, after that the table is maintained as origin files are linked.
+        """
+
+        lineage = self.tables.science_file_lineage
+        edges = self.lineage_edges().cte("lineage_edges")
+
+        paths = select(
+            edges.c.parent_id.label("ancestor_id"),
+            edges.c.child_id.label("descendant_id"),
+            literal_column("1").label("depth"),
+        ).cte("lineage_paths", recursive=True)
+        paths = paths.union(
+            select(paths.c.ancestor_id, edges.c.child_id, paths.c.depth + 1)
+            .join(edges, edges.c.parent_id == paths.c.descendant_id)
+            .where(paths.c.depth < LINEAGE_DEPTH_LIMIT)
+        )
+
+        shortest_paths = (
+            select(paths.c.ancestor_id, paths.c.descendant_id, func.min(paths.c.depth))
+            .where(paths.c.ancestor_id != paths.c.descendant_id)
+            .group_by(paths.c.ancestor_id, paths.c.descendant_id)
+        )
+
+        with self.session.begin() as sql_session:
+            sql_session.execute(delete(lineage))
+            sql_session.execute(insert(lineage).from_select(["ancestor_id", "descendant_id", "depth"], shortest_paths))
 
     def get_failed_files(self) -> list:
-        """Get all files with status 'FAILED'."""
-        session = create_session(self.engine)
-
-        # Query the StatusTable for records with 'FAILED' processing status
-        failed_files_query = (
-            session.query(ScienceFileTable.s3_key, ScienceFileTable.s3_bucket)
-            .join(StatusTable, StatusTable.science_file_id == ScienceFileTable.science_file_id)
-            .filter(StatusTable.processing_status == "FAILED")
+        """Get all files with status 'FAILED'.
+        [(s3_key, s3_bucket), ...]
+        """
+
+        return [(row.s3_key, row.s3_bucket) for row in self.iter_failed_files()]
+
+    def iter_failed_files(
+        self,
+        batch_size: int = 1000,
+        since: Optional[datetime] = None,
+        instrument: Optional[str] = None,
+        after_status_id: int = 0,
+    ) -> Iterator:
+        """Stream files with status 'FAILED', in status_id order
+        (s3_key, s3_bucket, status_id), ...
+
+        Rows are fetched in pages of ``batch_size`` using keyset pagination on ``status_id``, each
+        page in its own short transaction, so memory use does not grow with the amount of failed
+        files. Pass the last ``status_id`` seen as ``after_status_id`` to resume.
+
+        ``since`` only keeps files last processed at or after that time and ``instrument`` only
+        keeps files from instrument configurations that include that instrument.
+        """
+
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        session = self.session
+        query = self.failed_files_query(since, instrument).limit(batch_size)
+
+        last_status_id = after_status_id
+        while True:
+            with session.begin() as sql_session:
+                result = sql_session.execute(
+                    query.where(self.tables.StatusTable.status_id > last_status_id),
+                    execution_options={"yield_per": batch_size},
+                )
+                # The LIMIT makes the first partition the whole page, fetched before the
+                # transaction ends so callers can write while they iterate
+                rows = next(result.partitions(), [])
+
+            yield from rows
+
+            if len(rows) < batch_size:
+                return
+
+            last_status_id = rows[-1].status_id
+
+    def failed_files_query(self, since: Optional[datetime] = None, instrument: Optional[str] = None) -> type:
+        """Query of the files with status 'FAILED', in status_id order"""
+
+        query = (
+            select(
+                self.tables.ScienceFileTable.s3_key,
+                self.tables.ScienceFileTable.s3_bucket,
+                self.tables.StatusTable.status_id,
+            )
+            .join(
+                self.tables.StatusTable,
+                self.tables.StatusTable.science_file_id == self.tables.ScienceFileTable.science_file_id,
+            )
+            .where(self.tables.StatusTable.processing_status == "FAILED")
+        )
+
+        if since is not None:
+            query = query.where(self.tables.StatusTable.last_processing_timestamp >= since)
+
+        if instrument is not None:
+            instrument_config_ids = [
+                configuration_id
+                for configuration_id, short_names in self.reference_data.instrument_configurations.items()
+                if instrument in short_names
+            ]
+            query = query.join(
+                self.tables.ScienceProductTable,
+                self.tables.ScienceProductTable.science_product_id == self.tables.ScienceFileTable.science_product_id,
+            ).where(self.tables.ScienceProductTable.instrument_configuration_id.in_(instrument_config_ids))
+
+        return query.order_by(self.tables.StatusTable.status_id)
+
+    def query_products(
+        self,
+        start: datetime,
+        end: datetime,
+        instrument: Optional[str] = None,
+        mode: Optional[str] = None,
+        level: Optional[str] = None,
+        batch_size: int = 1000,
+        after: Optional[tuple] = None,
+    ) -> Iterator:
+        """Stream the science products with a reference timestamp in [start, end)
+        (science_product_id, instrument_configuration_id, mode, reference_timestamp), ...
+
+        Rows come in (reference_timestamp, science_product_id) order, in pages of ``batch_size``
+        read with keyset pagination on the reference timestamp index, each page in its own short
+        transaction. Pass ``(reference_timestamp, science_product_id)`` of the last row seen as
+        ``after`` to resume.
+
+        ``instrument`` only keeps products from instrument configurations that include that
+        instrument, ``mode`` products in that mode and ``level`` products with a file at that
+        level.
+        """
+
+        science_product = self.tables.ScienceProductTable
+        science_file = self.tables.ScienceFileTable
+
+        query = self.time_range_query(
+            select(
+                science_product.science_product_id,
+                science_product.instrument_configuration_id,
+                science_product.mode,
+                science_product.reference_timestamp,
+            ),
+            start,
+            end,
+            instrument,
+            mode,
+        )
+
+        if level is not None:
+            query = query.where(
+                select(science_file.science_file_id)
+                .where(
+                    science_file.science_product_id == science_product.science_product_id,
+                    science_file.file_level == level,
+                )
+                .exists()
+            )
+
+        return self.iter_time_range(query, science_product.science_product_id, batch_size, after)
+
+    def query_files(
+        self,
+        start: datetime,
+        end: datetime,
+        instrument: Optional[str] = None,
+        mode: Optional[str] = None,
+        level: Optional[str] = None,
+        batch_size: int = 1000,
+        after: Optional[tuple] = None,
+    ) -> Iterator:
+        """Stream the science files of the science products with a reference timestamp in [start, end)
+        (science_file_id, science_product_id, reference_timestamp, filename, file_level, file_type,
+        file_version, s3_key, s3_bucket, file_size), ...
+
+        Same filters and keyset pagination as ``query_products``, in (reference_timestamp,
+        science_file_id) order. Files are joined to their products on the indexed
+        ``science_product_id``. ``after`` takes ``(reference_timestamp, science_file_id)``.
+        """
+
+        science_product = self.tables.ScienceProductTable
+        science_file = self.tables.ScienceFileTable
+
+        query = self.time_range_query(
+            select(
+                science_file.science_file_id,
+                science_file.science_product_id,
+                science_product.reference_timestamp,
+                science_file.filename,
+                science_file.file_level,
+                science_file.file_type,
+                science_file.file_version,
+                science_file.s3_key,
+                science_file.s3_bucket,
+                science_file.file_size,
+            ).join(science_file, science_file.science_product_id == science_product.science_product_id),
+            start,
+            end,
+            instrument,
+            mode,
+        )
+
+        if level is not None:
+            query = query.where(science_file.file_level == level)
+
+        return self.iter_time_range(query, science_file.science_file_id, batch_size, after)
+
+    def time_range_query(
+        self,
+        query: type,
+        start: datetime,
+        end: datetime,
+        instrument: Optional[str] = None,
+        mode: Optional[str] = None,
+    ) -> type:
+        """Filter a query of the science product table by reference timestamp, instrument and mode"""
+
+        science_product = self.tables.ScienceProductTable
+
+        query = query.where(science_product.reference_timestamp >= start, science_product.reference_timestamp < end)
+
+        if instrument is not None:
+            instrument_config_ids = [
+                configuration_id
+                for configuration_id, short_names in self.reference_data.instrument_configurations.items()
+                if instrument in short_names
+            ]
+            query = query.where(science_product.instrument_configuration_id.in_(instrument_config_ids))
+
+        if mode is not None:
+            query = query.where(science_product.mode == mode)
+
+        return query
+
+    def iter_time_range(self, query: type, id_column: type, batch_size: int, after: Optional[tuple] = None) -> Iterator:
+        """Page through a time range query in (reference_timestamp, id_column) order"""
+
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        session = self.session
+        reference_timestamp = self.tables.ScienceProductTable.reference_timestamp
+        query = query.order_by(reference_timestamp, id_column).limit(batch_size)
+
+        while True:
+            page = query
+            if after is not None:
+                last_timestamp, last_id = after
+                # Spelled out rather than a row value comparison, so every database can seek the index
+                page = page.where(
+                    reference_timestamp >= last_timestamp,
+                    or_(reference_timestamp > last_timestamp, id_column > last_id),
+                )
+
+            with session.begin() as sql_session:
+                rows = sql_session.execute(page).all()
+
+            yield from rows
+
+            if len(rows) < batch_size:
+                return
+
+            after = (rows[-1].reference_timestamp, getattr(rows[-1], id_column.key))
+
+    @db_retry
+    def claim_failed(self, batch_size: int = 100, lease_seconds: float = 300) -> list:
+        """Claim up to batch_size files with status 'FAILED' for reprocessing
+        [(status_id, science_file_id, s3_key, s3_bucket, lease_token), ...]
+
+        Claimed statuses get a lease token and expiry, and are not handed out again until the
+        lease expires, is released or the status is completed, so many workers can drain the
+        failure backlog in parallel without picking up the same files. On PostgreSQL (and MySQL)
+        the statuses are claimed with SELECT ... FOR UPDATE SKIP LOCKED, elsewhere (e.g.
+        SQLite) with a single UPDATE that sets the lease token, which only leases statuses
+        that are still unleased.
+        """
+
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        lease_token = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
+        is_claimable = (self.tables.StatusTable.processing_status == "FAILED") & (
+            self.tables.StatusTable.lease_expires_at.is_(None) | (self.tables.StatusTable.lease_expires_at < now)
         )
+        candidates = (
+            select(self.tables.StatusTable.status_id)
+            .where(is_claimable)
+            .order_by(self.tables.StatusTable.status_id)
+            .limit(batch_size)
+        )
+        lease = {"lease_token": lease_token, "lease_expires_at": now + timedelta(seconds=lease_seconds)}
+
+        with self.session.begin() as sql_session:
+            if self.engine.dialect.name in SKIP_LOCKED_DIALECTS:
+                status_ids = sql_session.scalars(candidates.with_for_update(skip_locked=True)).all()
+                claim = update(self.tables.StatusTable).where(self.tables.StatusTable.status_id.in_(status_ids))
+            else:
+                # Checking is_claimable again makes the UPDATE skip statuses leased concurrently
+                claim = update(self.tables.StatusTable).where(
+                    self.tables.StatusTable.status_id.in_(candidates.scalar_subquery()), is_claimable
+                )
+
+            sql_session.execute(claim.values(**lease), execution_options={"synchronize_session": False})
+
+            return sql_session.execute(
+                select(
+                    self.tables.StatusTable.status_id,
+                    self.tables.StatusTable.science_file_id,
+                    self.tables.ScienceFileTable.s3_key,
+                    self.tables.ScienceFileTable.s3_bucket,
+                    self.tables.StatusTable.lease_token,
+                )
+                .join(
+                    self.tables.ScienceFileTable,
+                    self.tables.ScienceFileTable.science_file_id == self.tables.StatusTable.science_file_id,
+                )
+                .where(self.tables.StatusTable.lease_token == lease_token)
+                .order_by(self.tables.StatusTable.status_id)
+            ).all()
+
+    @db_retry
+    def complete(
+        self,
+        status_id: int,
+        lease_token: str,
+        processing_status: str = "SUCCESS",
+        processing_status_message: str = None,
+        processing_time_length: int = None,
+    ) -> bool:
+        """Record the outcome of reprocessing a claimed status and end its lease
+
+        Returns False, without changing anything, if the status is no longer leased with
+        lease_token (e.g. the lease expired and another worker claimed it).
+        """
+
+        with self.session.begin() as sql_session:
+            result = sql_session.execute(
+                update(self.tables.StatusTable)
+                .where(
+                    self.tables.StatusTable.status_id == status_id, self.tables.StatusTable.lease_token == lease_token
+                )
+                .values(
+                    processing_status=processing_status,
+                    processing_status_message=processing_status_message,
+                    processing_time_length=processing_time_length,
+                    last_processing_timestamp=datetime.now(timezone.utc),
+                    reprocessed_count=self.tables.StatusTable.reprocessed_count + 1,
+                    lease_token=None,
+                    lease_expires_at=None,
+                ),
+                execution_options={"synchronize_session": False},
+            )
+
+            return result.rowcount == 1
+
+    @db_retry
+    def release(self, lease_token: str, status_ids: Optional[list] = None) -> int:
+        """End the lease of claimed statuses without completing them, so they can be claimed again
 
-        # Fetch the results and return them as a list of tuples (s3_key, s3_bucket)
-        failed_files = failed_files_query.all()
+        Releases every status claimed with lease_token, or only status_ids. Returns the amount
+        of statuses released.
+        """
+
+        statement = update(self.tables.StatusTable).where(self.tables.StatusTable.lease_token == lease_token)
+        if status_ids is not None:
+            statement = statement.where(self.tables.StatusTable.status_id.in_(status_ids))
+
+        with self.session.begin() as sql_session:
+            result = sql_session.execute(
+                statement.values(lease_token=None, lease_expires_at=None),
+                execution_options={"synchronize_session": False},
+            )
 
-        return failed_files
+            return result.rowcount
@@ -1,4 +1,6 @@
 import logging
+import subprocess
+import sys
 
 from metatracker import get_config, log, set_config
 
@@ -44,3 +46,19 @@ def test_set_config() -> None:
 
     # Test String Representation
     print(config)
+
+
+def test_lazy_import() -> None:
+    """
+    Test that importing the tracker doesn't configure logging or load the ORM and table classes
+    """
+
+    code = (
+        "import logging, sys; import metatracker.tracker.tracker; "
+        "from metatracker.database.tables import registry; "
+        "assert not logging.getLogger().handlers; "
+        "assert 'sqlalchemy.orm' not in sys.modules; "
+        "assert not registry._mission_tables"
+    )
+
+    subprocess.run([sys.executable, "-c", code], check=True)
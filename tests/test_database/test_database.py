@@ -32,3 +32,25 @@ def test_check_connection():
 
     # Check if connection is valid
     assert connection is True
+
+
+# Test create database engine with pool settings
+def test_create_engine_pool_settings(tmp_path):
+    # Create engine with a file backed database, which uses a QueuePool
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}", pool_size=2, max_overflow=3, pool_pre_ping=True, pool_recycle=300
+    )
+
+    assert engine.pool.size() == 2
+    assert engine.pool._max_overflow == 3
+    assert engine.pool._pre_ping
+    assert engine.pool._recycle == 300
+
+
+# Test check connection returns its connection to the pool
+def test_check_connection_releases_connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+
+    assert check_connection(engine) is True
+
+    assert engine.pool.checkedout() == 0
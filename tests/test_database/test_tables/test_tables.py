@@ -1,12 +1,21 @@
-from sqlalchemy import Column, Integer
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, Integer, event, inspect, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import declarative_base
 
 from metatracker import CONFIGURATION
+from metatracker.config import load_config
 from metatracker.database import create_engine, create_session
 from metatracker.database.tables import (
+    create_columns,
+    create_indexes,
     create_table,
     create_tables,
     get_columns,
+    get_mission_configuration,
+    get_mission_tables,
     get_tables,
     remove_tables,
     table_exists,
@@ -119,6 +128,8 @@ def test_create_tables():
         f"{MISSION_NAME}_science_product",
         f"{MISSION_NAME}_status",
         f"{MISSION_NAME}_status_origin_association",
+        f"{MISSION_NAME}_science_file_lineage",
+        f"{MISSION_NAME}_seed",
     ]
 
     # Get tables
@@ -150,6 +161,8 @@ def test_create_tables_existing():
         f"{MISSION_NAME}_science_product",
         f"{MISSION_NAME}_status",
         f"{MISSION_NAME}_status_origin_association",
+        f"{MISSION_NAME}_science_file_lineage",
+        f"{MISSION_NAME}_seed",
     ]
 
     # Get tables
@@ -183,6 +196,8 @@ def test_remove_tables():
         f"{MISSION_NAME}_science_product",
         f"{MISSION_NAME}_status",
         f"{MISSION_NAME}_status_origin_association",
+        f"{MISSION_NAME}_science_file_lineage",
+        f"{MISSION_NAME}_seed",
     ]
 
     # Get tables
@@ -198,5 +213,240 @@ def test_remove_tables():
     # Remove tables
     remove_tables(engine=engine)
 
-    # Get tables
-    assert not table_exists(engine=engine, table_name=f"{MISSION_NAME}_file_level")
+    # Every table of the mission is gone
+    for table_name in table_names:
+        assert not table_exists(engine=engine, table_name=table_name)
+    assert get_tables(engine=engine) == []
+
+
+def test_create_indexes():
+    # Create engine and session
+    engine = create_engine("sqlite://")
+
+    # Set up tables
+    create_tables(engine=engine)
+
+    natural_key_index = f"ix_{MISSION_NAME}_science_product_natural_key"
+    status_indexes = {
+        f"ix_{MISSION_NAME}_status_science_file_id",
+        f"ix_{MISSION_NAME}_status_processing_status_timestamp",
+    }
+
+    def get_index_names(table_name: str) -> set:
+        return {index["name"] for index in inspect(engine).get_indexes(table_name)}
+
+    assert natural_key_index in get_index_names(f"{MISSION_NAME}_science_product")
+    assert f"ix_{MISSION_NAME}_science_file_science_product_id" in get_index_names(f"{MISSION_NAME}_science_file")
+    assert status_indexes <= get_index_names(f"{MISSION_NAME}_status")
+
+    # Simulate a database created before the indexes existed
+    with engine.begin() as connection:
+        connection.execute(text(f"DROP INDEX {natural_key_index}"))
+
+    assert natural_key_index not in get_index_names(f"{MISSION_NAME}_science_product")
+
+    create_indexes(engine=engine)
+
+    assert natural_key_index in get_index_names(f"{MISSION_NAME}_science_product")
+
+    # Running it again is a no-op
+    create_indexes(engine=engine)
+
+
+def test_create_columns():
+    engine = create_engine("sqlite://")
+
+    create_tables(engine=engine)
+
+    status_table = f"{MISSION_NAME}_status"
+    lease_columns = {"lease_token", "lease_expires_at"}
+
+    # Simulate a database created before the status table had a lease, by an older create_tables
+    with engine.begin() as connection:
+        for column in lease_columns:
+            connection.execute(text(f"ALTER TABLE {status_table} DROP COLUMN {column}"))
+        connection.execute(text(f"UPDATE {MISSION_NAME}_seed SET fingerprint = 'old'"))
+
+    def get_column_names() -> set:
+        return {column["name"] for column in get_columns(engine=engine, table_name=status_table)}
+
+    assert not lease_columns & get_column_names()
+
+    # Upgrading adds the missing columns before storing the new fingerprint
+    create_tables(engine=engine)
+
+    assert lease_columns <= get_column_names()
+    with engine.connect() as connection:
+        assert connection.execute(text(f"SELECT lease_token, lease_expires_at FROM {status_table}")).all() == []
+
+    # Running it again is a no-op
+    create_columns(engine=engine)
+
+
+# Catalog tables as created before the natural key and status indexes, the seed and lineage
+# tables and the status lease existed
+BASELINE_SCHEMA = [
+    f"""CREATE TABLE {MISSION_NAME}_science_product (
+        science_product_id INTEGER NOT NULL,
+        instrument_configuration_id INTEGER,
+        mode VARCHAR,
+        reference_timestamp DATETIME,
+        PRIMARY KEY (science_product_id)
+    )""",
+    f"""CREATE TABLE {MISSION_NAME}_science_file (
+        science_file_id INTEGER NOT NULL,
+        science_product_id INTEGER,
+        file_type VARCHAR,
+        file_level VARCHAR,
+        filename VARCHAR,
+        file_version VARCHAR,
+        file_extension VARCHAR,
+        file_path VARCHAR,
+        s3_key VARCHAR,
+        s3_bucket VARCHAR,
+        file_size INTEGER,
+        file_modified_timestamp DATETIME,
+        is_public BOOLEAN,
+        PRIMARY KEY (science_file_id),
+        UNIQUE (filename)
+    )""",
+    f"""CREATE TABLE {MISSION_NAME}_status (
+        status_id INTEGER NOT NULL,
+        science_file_id INTEGER NOT NULL,
+        processing_status VARCHAR NOT NULL,
+        processing_status_message VARCHAR,
+        original_processing_timestamp DATETIME NOT NULL,
+        last_processing_timestamp DATETIME NOT NULL,
+        reprocessed_count INTEGER,
+        processing_time_length INTEGER,
+        PRIMARY KEY (status_id)
+    )""",
+    f"""CREATE TABLE {MISSION_NAME}_status_origin_association (
+        status_id INTEGER NOT NULL,
+        origin_file_id INTEGER NOT NULL,
+        PRIMARY KEY (status_id, origin_file_id)
+    )""",
+]
+
+
+def test_create_tables_upgrade():
+    engine = create_engine("sqlite://")
+    timestamp = "2025-04-03 18:59:14.000000"
+
+    # A database of the baseline schema, with the duplicates it allowed
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(text(statement))
+
+        connection.execute(
+            text(
+                f"INSERT INTO {MISSION_NAME}_science_product VALUES (1, 1, NULL, :t), (2, 1, NULL, :t), (3, 1, '', :t)"
+            ),
+            {"t": timestamp},
+        )
+        for science_file_id in (1, 2, 3):
+            connection.execute(
+                text(
+                    f"INSERT INTO {MISSION_NAME}_science_file (science_file_id, science_product_id, filename)"
+                    " VALUES (:id, :id, :filename)"
+                ),
+                {"id": science_file_id, "filename": f"file_{science_file_id}"},
+            )
+        connection.execute(
+            text(
+                f"INSERT INTO {MISSION_NAME}_status VALUES"
+                " (1, 1, 'FAILED', NULL, :t, :t, 0, NULL), (2, 1, 'SUCCESS', NULL, :t, :t, 1, NULL),"
+                " (3, 2, 'FAILED', NULL, :t, :t, 0, NULL)"
+            ),
+            {"t": timestamp},
+        )
+        connection.execute(text(f"INSERT INTO {MISSION_NAME}_status_origin_association VALUES (1, 3), (2, 2), (1, 2)"))
+
+    create_tables(engine=engine)
+
+    with engine.connect() as connection:
+
+        def rows(query: str) -> list:
+            return [tuple(row) for row in connection.execute(text(query))]
+
+        # Duplicate products are merged into the first, a missing mode is an empty one
+        assert rows(f"SELECT science_product_id, mode FROM {MISSION_NAME}_science_product") == [(1, "")]
+        assert rows(f"SELECT DISTINCT science_product_id FROM {MISSION_NAME}_science_file") == [(1,)]
+
+        # The latest status of a file is kept, with the origin files of the others
+        assert rows(f"SELECT status_id, science_file_id FROM {MISSION_NAME}_status ORDER BY status_id") == [
+            (2, 1),
+            (3, 2),
+        ]
+        assert rows(
+            f"SELECT status_id, origin_file_id FROM {MISSION_NAME}_status_origin_association"
+            " ORDER BY status_id, origin_file_id"
+        ) == [(2, 2), (2, 3)]
+
+    index_names = {index["name"] for index in inspect(engine).get_indexes(f"{MISSION_NAME}_science_product")}
+    assert f"ix_{MISSION_NAME}_science_product_natural_key" in index_names
+
+    # Storing the product again hits the natural key instead of adding a duplicate
+    ScienceProductTable = get_mission_tables().ScienceProductTable
+    with create_session(engine).begin() as session:
+        session.add(ScienceProductTable(1, None, datetime(2025, 4, 3, 18, 59, 14)))
+        with pytest.raises(IntegrityError):
+            session.flush()
+
+
+def test_create_tables_fingerprint():
+    # Create engine and session
+    engine = create_engine("sqlite://")
+
+    create_tables(engine=engine)
+
+    # An up-to-date database is a single query
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    create_tables(engine=engine)
+    assert [statement for statement in statements if statement.startswith("SELECT")] == statements[-1:]
+    assert len([statement for statement in statements if not statement.startswith(("BEGIN", "ROLLBACK"))]) == 1
+
+    # Changed reference data is added on the next run, existing rows are kept
+    configuration = get_mission_configuration()
+    file_levels = configuration.file_levels + [
+        {"description": "Level 5 File", "full_name": "Level 5", "short_name": "l5"}
+    ]
+    changed_configuration = load_config({**vars(configuration), "file_levels": file_levels})
+
+    statements.clear()
+    create_tables(engine=engine, mission=changed_configuration)
+
+    with engine.connect() as connection:
+        short_names = connection.execute(text(f"SELECT short_name FROM {MISSION_NAME}_file_level")).scalars().all()
+    assert sorted(short_names) == sorted(file_level["short_name"] for file_level in file_levels)
+
+    # One insert per reference table, plus the fingerprint
+    inserts = [statement for statement in statements if statement.startswith("INSERT")]
+    assert len(inserts) == 5
+
+    # Removed tables are set up again
+    remove_tables(engine=engine)
+    create_tables(engine=engine)
+    assert table_exists(engine=engine, table_name=f"{MISSION_NAME}_file_level")
+
+
+def test_science_product_natural_key():
+    engine = create_engine("sqlite://")
+    session = create_session(engine)
+
+    create_tables(engine=engine)
+
+    ScienceProductTable = get_mission_tables().ScienceProductTable
+    reference_timestamp = datetime(2025, 4, 3, 18, 59, 14)
+
+    # A science product without a mode is stored with an empty mode, so its natural key is unique
+    with session.begin() as sql_session:
+        sql_session.add(ScienceProductTable(1, None, reference_timestamp))
+
+    with pytest.raises(IntegrityError):
+        with session.begin() as sql_session:
+            sql_session.add(ScienceProductTable(1, None, reference_timestamp))
+
+    with session.begin() as sql_session:
+        assert [product.mode for product in sql_session.query(ScienceProductTable)] == [""]
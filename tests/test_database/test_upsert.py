@@ -0,0 +1,182 @@
+from types import SimpleNamespace
+
+from sqlalchemy import Column, Integer, String, event, literal, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import declarative_base
+
+from metatracker.database import create_engine, create_session
+from metatracker.database.upsert import (
+    has_unique_index,
+    insert_from_select_or_ignore,
+    insert_many_or_ignore,
+    insert_or_ignore,
+    upsert,
+    upsert_many,
+)
+
+Base = declarative_base()
+
+
+class UniqueTable(Base):
+    __tablename__ = "unique_table"
+    unique_id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, unique=True)
+    count = Column(Integer)
+
+
+class PlainTable(Base):
+    __tablename__ = "plain_table"
+    plain_id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String)
+    count = Column(Integer)
+
+
+def set_up_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+
+    return engine, create_session(engine)
+
+
+def test_has_unique_index():
+    assert has_unique_index(UniqueTable, ["name"])
+    assert has_unique_index(UniqueTable, ["unique_id"])
+    assert not has_unique_index(UniqueTable, ["count"])
+    assert not has_unique_index(PlainTable, ["name"])
+
+
+def test_insert_or_ignore():
+    engine, session = set_up_session()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    for table_class in (UniqueTable, PlainTable):
+        with session.begin() as sql_session:
+            first_id = insert_or_ignore(sql_session, table_class, {"name": "a", "count": 1}, ["name"])
+            second_id = insert_or_ignore(sql_session, table_class, {"name": "a", "count": 2}, ["name"])
+            other_id = insert_or_ignore(sql_session, table_class, {"name": "b", "count": 1}, ["name"])
+
+        assert first_id == second_id
+        assert other_id != first_id
+
+        with session.begin() as sql_session:
+            assert sql_session.query(table_class).count() == 2
+
+    # The unique table goes through INSERT ... ON CONFLICT DO NOTHING
+    assert any("ON CONFLICT" in statement for statement in statements)
+
+
+def test_upsert():
+    _, session = set_up_session()
+
+    for table_class in (UniqueTable, PlainTable):
+        with session.begin() as sql_session:
+            first_id = upsert(
+                sql_session,
+                table_class,
+                {"name": "a", "count": 0},
+                ["name"],
+                {"count": table_class.count + 1},
+            )
+            second_id = upsert(
+                sql_session,
+                table_class,
+                {"name": "a", "count": 0},
+                ["name"],
+                {"count": table_class.count + 1},
+            )
+
+        assert first_id == second_id
+
+        with session.begin() as sql_session:
+            row = sql_session.query(table_class).one()
+            assert row.count == 1
+
+
+def test_insert_many_or_ignore():
+    _, session = set_up_session()
+
+    with session.begin() as sql_session:
+        insert_many_or_ignore(
+            sql_session, UniqueTable, [{"name": "a", "count": 1}, {"name": "b", "count": 1}], ["name"]
+        )
+        insert_many_or_ignore(
+            sql_session, UniqueTable, [{"name": "b", "count": 2}, {"name": "c", "count": 2}], ["name"]
+        )
+
+    with session.begin() as sql_session:
+        rows = {row.name: row.count for row in sql_session.query(UniqueTable)}
+        assert rows == {"a": 1, "b": 1, "c": 2}
+
+
+def test_upsert_many():
+    engine, session = set_up_session()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    for table_class in (UniqueTable, PlainTable):
+        with session.begin() as sql_session:
+            upsert_many(sql_session, table_class, [{"name": "a", "count": 0}], ["name"], ["name"])
+            upsert_many(
+                sql_session,
+                table_class,
+                [{"name": "a", "count": 0}, {"name": "b", "count": 0}],
+                ["name"],
+                ["name"],
+                {"count": table_class.count + 1},
+            )
+
+        with session.begin() as sql_session:
+            rows = {row.name: row.count for row in sql_session.query(table_class)}
+            assert rows == {"a": 1, "b": 0}
+
+    # The unique table takes a single INSERT ... ON CONFLICT DO UPDATE for both rows
+    assert sum("ON CONFLICT" in statement for statement in statements) == 2
+
+
+def test_insert_from_select_or_ignore():
+    _, session = set_up_session()
+
+    with session.begin() as sql_session:
+        insert_many_or_ignore(sql_session, PlainTable, [{"name": "a"}, {"name": "b"}, {"name": "c"}], ["name"])
+        insert_many_or_ignore(sql_session, UniqueTable, [{"name": "a", "count": 1}], ["name"])
+
+    # Copy the plain rows, "a" conflicts and is skipped
+    with session.begin() as sql_session:
+        insert_from_select_or_ignore(
+            sql_session,
+            UniqueTable,
+            ["name", "count"],
+            select(PlainTable.name, literal(2)).where(PlainTable.name.in_(["a", "b"])),
+            ["name"],
+        )
+
+    with session.begin() as sql_session:
+        rows = {row.name: row.count for row in sql_session.query(UniqueTable)}
+        assert rows == {"a": 1, "b": 2}
+
+
+def test_insert_or_ignore_mysql():
+    """MySQL only ignores duplicate keys, not the other errors INSERT IGNORE would downgrade"""
+
+    class MySQLSession:
+        def __init__(self):
+            self.statements = []
+
+        def get_bind(self):
+            return SimpleNamespace(dialect=mysql.dialect())
+
+        def execute(self, statement):
+            self.statements.append(str(statement.compile(dialect=mysql.dialect())))
+
+    sql_session = MySQLSession()
+    insert_many_or_ignore(sql_session, UniqueTable, [{"name": "a", "count": 1}], ["name"])
+    insert_from_select_or_ignore(
+        sql_session, UniqueTable, ["name", "count"], select(PlainTable.name, literal(2)), ["name"]
+    )
+
+    for statement in sql_session.statements:
+        assert "IGNORE" not in statement
+        assert statement.endswith("ON DUPLICATE KEY UPDATE unique_id = unique_table.unique_id")
@@ -0,0 +1,168 @@
+import csv
+import gzip
+import json
+import os
+from datetime import datetime
+
+# Set SWXSOC_MISSION environment variable
+os.environ["SWXSOC_MISSION"] = "padre"
+
+import pytest
+from sqlalchemy import insert
+from swxsoc.util import util
+
+from metatracker.database import create_engine
+from metatracker.config import load_config
+from metatracker.database.tables import create_tables, get_mission_configuration
+from metatracker.database.tables.science_product_table import ScienceProductTable
+from metatracker.export import export_catalog, get_format, iter_catalog
+from metatracker.restore import import_catalog
+from metatracker.tracker.tracker import MetaTracker
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    create_tables(engine=engine)
+
+    test_tracker = MetaTracker(engine, util.parse_science_filename)
+
+    filenames = [f"padreMDA{i % 2}_2504031859{10 + i // 2}.dat" for i in range(5)]
+    for filename in filenames:
+        (tmp_path / filename).write_text("Test")
+
+    results = test_tracker.track_many(
+        [(tmp_path / filename, f"s3://padre/{filename}", "padre", None) for filename in filenames]
+    )
+    assert all(result["error"] is None for result in results)
+
+    test_tracker.add_to_status_table(test_tracker.session, 1, "SUCCESS")
+    test_tracker.add_to_status_table(test_tracker.session, 5, "FAILED", origin_file_ids=[3, 1])
+
+    # A science product without science files
+    with engine.begin() as connection:
+        connection.execute(
+            insert(ScienceProductTable).values(
+                instrument_configuration_id=1, mode="", reference_timestamp=datetime(2025, 4, 3, 18, 59, 13)
+            )
+        )
+
+    return engine
+
+
+def test_iter_catalog(engine) -> None:
+    pages = list(iter_catalog(engine, batch_size=2))
+
+    assert [len(page) for page in pages] == [2, 2, 2]
+    rows = [row for page in pages for row in page]
+    assert [row["science_file_id"] for row in rows] == [1, 2, 3, 4, 5, None]
+    assert rows[0]["processing_status"] == "SUCCESS"
+    assert rows[1]["status_id"] is None
+    assert rows[4]["origin_file_ids"] == [1, 3]
+    assert rows[2]["science_product_id"] == rows[3]["science_product_id"]
+    assert rows[5]["science_product_id"] == 4
+    assert rows[5]["filename"] is None
+    assert rows[5]["origin_file_ids"] == []
+
+
+def test_export_catalog(engine, tmp_path) -> None:
+    assert export_catalog(engine, tmp_path / "catalog.ndjson.gz", batch_size=2) == 6
+    with gzip.open(tmp_path / "catalog.ndjson.gz", "rt") as stream:
+        rows = [json.loads(line) for line in stream]
+    assert rows[4]["origin_file_ids"] == [1, 3]
+    assert rows[4]["reference_timestamp"] == "2025-04-03T18:59:12"
+
+    assert export_catalog(engine, tmp_path / "catalog.csv", batch_size=2) == 6
+    with open(tmp_path / "catalog.csv", newline="") as stream:
+        rows = list(csv.DictReader(stream))
+    assert len(rows) == 6
+    assert rows[1]["status_id"] == ""
+    assert rows[5]["science_file_id"] == ""
+    assert rows[4]["origin_file_ids"] == "[1, 3]"
+
+    assert get_format(tmp_path / "catalog.jsonl") == ("ndjson", False)
+    with pytest.raises(ValueError):
+        get_format(tmp_path / "catalog.txt")
+
+
+def test_export_catalog_parquet(engine, tmp_path) -> None:
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    assert export_catalog(engine, tmp_path / "catalog.parquet") == 6
+    table = pq.read_table(tmp_path / "catalog.parquet")
+    assert table.column("origin_file_ids").to_pylist()[4] == [1, 3]
+
+
+@pytest.mark.parametrize("filename", ["catalog.ndjson", "catalog.csv.gz", "catalog.parquet"])
+def test_import_catalog(engine, tmp_path, filename) -> None:
+    if filename.endswith(".parquet"):
+        pytest.importorskip("pyarrow")
+
+    export_catalog(engine, tmp_path / filename)
+
+    restored = create_engine(f"sqlite:///{tmp_path / 'restored.db'}")
+    counts = import_catalog(restored, tmp_path / filename, batch_size=2)
+
+    assert counts == {
+        "padre_science_product": 4,
+        "padre_science_file": 5,
+        "padre_status": 2,
+        "padre_status_origin_association": 2,
+    }
+    assert list(iter_catalog(restored)) == list(iter_catalog(engine))
+
+    # Only into an empty catalog
+    with pytest.raises(ValueError):
+        import_catalog(restored, tmp_path / filename)
+
+    # New rows get ids after the restored ones
+    test_tracker = MetaTracker(restored, util.parse_science_filename)
+    (tmp_path / "padreMDA0_250403185920.dat").write_text("Test")
+    assert test_tracker.track(
+        tmp_path / "padreMDA0_250403185920.dat", "s3://padre/padreMDA0_250403185920.dat", "padre"
+    ) == (6, 5)
+
+
+def test_import_catalog_reference_keys(engine, tmp_path) -> None:
+    export_catalog(engine, tmp_path / "catalog.ndjson")
+    configuration = get_mission_configuration()
+
+    # Reference tables with other ids, science products get the configuration of their instruments
+    renumbered = load_config(
+        {
+            **vars(configuration),
+            "instruments": [
+                {**instrument, "instrument_id": 3 - instrument["instrument_id"]}
+                for instrument in configuration.instruments
+            ],
+        }
+    )
+    restored = create_engine(f"sqlite:///{tmp_path / 'restored.db'}")
+    import_catalog(restored, tmp_path / "catalog.ndjson", mission=renumbered)
+
+    rows = [row for page in iter_catalog(restored, mission=renumbered) for row in page]
+    assert {row["instrument_configuration_id"] for row in rows} == {2}
+    assert all(row["instrument_short_names"] == ["meddea"] for row in rows)
+
+    # Instruments without a configuration in the reference tables
+    sharp_only = load_config(
+        {
+            **vars(configuration),
+            "instrument_configurations": [
+                {"instrument_configuration_id": 2, "instrument_1_id": 2, "instrument_2_id": None},
+            ],
+        }
+    )
+    missing = create_engine(f"sqlite:///{tmp_path / 'missing.db'}")
+    with pytest.raises(ValueError, match="no instrument configuration"):
+        import_catalog(missing, tmp_path / "catalog.ndjson", mission=sharp_only)
+
+    # Every catalog table has to be empty, not only the science file table
+    with missing.begin() as connection:
+        connection.execute(
+            insert(ScienceProductTable).values(
+                instrument_configuration_id=2, mode="", reference_timestamp=datetime(2025, 4, 3, 18, 59, 13)
+            )
+        )
+    with pytest.raises(ValueError, match="padre_science_product is not empty"):
+        import_catalog(missing, tmp_path / "catalog.ndjson", mission=sharp_only)
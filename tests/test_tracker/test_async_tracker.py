@@ -0,0 +1,132 @@
+import asyncio
+import os
+from pathlib import Path
+
+# Set SWXSOC_MISSION environment variable
+os.environ["SWXSOC_MISSION"] = "padre"
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from swxsoc.util import util
+
+from metatracker.database import create_async_engine, create_engine
+from metatracker.database.tables import create_tables
+from metatracker.database.tables.science_file_table import ScienceFileTable
+from metatracker.database.tables.science_product_table import ScienceProductTable
+from metatracker.database.tables.status_table import StatusTable
+from metatracker.tracker.async_tracker import AsyncMetaTracker
+
+pytest.importorskip("aiosqlite")
+
+
+def test_async_tracker(tmp_path) -> None:
+    db_path = tmp_path / "test.db"
+    create_tables(engine=create_engine(f"sqlite:///{db_path}"))
+
+    filenames = [f"padreMDA{i % 2}_2504031859{10 + i // 2}.dat" for i in range(8)]
+    for filename in filenames:
+        (tmp_path / filename).write_text("Test")
+
+    async def run() -> None:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        test_tracker = await AsyncMetaTracker.create(engine, util.parse_science_filename)
+
+        # Track a single file
+        science_file_id, science_product_id = await test_tracker.track(
+            tmp_path / filenames[0],
+            s3_key=f"s3://padre/{filenames[0]}",
+            s3_bucket="padre",
+            status={"processing_status": "SUCCESS"},
+        )
+        assert science_file_id == 1
+        assert science_product_id == 1
+
+        with pytest.raises(FileNotFoundError):
+            await test_tracker.track(Path("./missing.dat"), s3_key="s3://padre/missing.dat", s3_bucket="padre")
+
+        # Track many files, more than can be in flight at once
+        items = [
+            (tmp_path / filename, f"s3://padre/{filename}", "padre", {"processing_status": "FAILED"})
+            for filename in filenames
+        ]
+        items.insert(2, (Path("./tests/test_files/ducks.txt"), "s3://padre/ducks.txt", "padre", None))
+
+        results = await test_tracker.track_many(items, concurrency=3)
+
+        assert len(results) == len(items)
+        assert isinstance(results[2]["error"], ValueError)
+        tracked = results[:2] + results[3:]
+        assert all(result["error"] is None for result in tracked)
+        assert tracked[0]["science_file_id"] == 1
+        assert tracked[0]["science_product_id"] == tracked[1]["science_product_id"]
+
+        async with test_tracker.session() as async_session:
+            assert await async_session.scalar(select(func.count()).select_from(ScienceFileTable)) == 8
+            assert await async_session.scalar(select(func.count()).select_from(ScienceProductTable)) == 4
+            status = await async_session.scalar(select(StatusTable).where(StatusTable.science_file_id == 1))
+            assert status.reprocessed_count == 1
+
+        # Failed files and status updates
+        assert len(await test_tracker.get_failed_files()) == 8
+        failed = [row async for row in test_tracker.iter_failed_files(batch_size=3, instrument="meddea")]
+        assert len(failed) == 8
+
+        await test_tracker.add_to_status_table(science_file_id=1, processing_status="SUCCESS")
+        assert len(await test_tracker.get_failed_files()) == 7
+
+        # MetaTracker methods without an async version are not available
+        for name in ["get_ancestors", "claim_failed", "query_files", "validate_many", "track_concurrent"]:
+            assert not hasattr(test_tracker, name)
+
+        await test_tracker.close()
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_async_tracker_retries_without_blocking(monkeypatch) -> None:
+    """db_retry backs off with asyncio.sleep on coroutines"""
+
+    sleeps = []
+
+    async def fake_sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+    async def run() -> None:
+        engine = create_async_engine("sqlite+aiosqlite://")
+        test_tracker = AsyncMetaTracker(engine, util.parse_science_filename)
+
+        attempts = []
+
+        async def flaky_begin():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise OperationalError("SELECT 1", {}, Exception("database is locked"))
+
+        class FlakySession:
+            def begin(self):
+                return FlakyTransaction()
+
+        class FlakyTransaction:
+            async def __aenter__(self):
+                await flaky_begin()
+                return self
+
+            async def __aexit__(self, *exc_info):
+                return False
+
+            async def run_sync(self, fn, *args, **kwargs):
+                return 42
+
+        test_tracker.session = FlakySession()
+
+        assert await test_tracker.add_to_status_table(science_file_id=1, processing_status="SUCCESS") == 42
+        assert len(attempts) == 3
+        assert len(sleeps) == 2
+
+        await engine.dispose()
+
+    asyncio.run(run())
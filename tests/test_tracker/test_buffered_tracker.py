@@ -0,0 +1,157 @@
+import os
+from pathlib import Path
+
+# Set SWXSOC_MISSION environment variable
+os.environ["SWXSOC_MISSION"] = "padre"
+
+import pytest
+from sqlalchemy import event, func, select
+from swxsoc.util import util
+
+from metatracker.database import create_engine
+from metatracker.database.tables import create_tables
+from metatracker.database.tables.science_file_table import ScienceFileTable
+from metatracker.database.tables.status_table import StatusTable, status_origin_association
+from metatracker.tracker.buffered_tracker import BufferedMetaTracker
+from metatracker.tracker.tracker import MetaTracker
+
+
+def test_buffered_tracker(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    create_tables(engine=engine)
+    tracker = MetaTracker(engine, util.parse_science_filename)
+
+    filenames = [f"padreMDA{i % 2}_2504031859{10 + i // 2}.dat" for i in range(6)]
+    for filename in filenames:
+        (tmp_path / filename).write_text("Test")
+
+    # A long interval, so nothing is written until the batch is full or flushed
+    with BufferedMetaTracker(tracker, max_batch_size=4, flush_interval=60) as buffered:
+        futures = [
+            buffered.track(tmp_path / filename, f"s3://padre/{filename}", "padre", {"processing_status": "FAILED"})
+            for filename in filenames[:3]
+        ]
+        missing = buffered.track(Path("./missing.dat"), "s3://padre/missing.dat", "padre")
+
+        # The fourth request fills the batch
+        science_file_id, science_product_id = futures[0].result(timeout=10)
+        assert science_file_id == 1
+        assert science_product_id == 1
+        with pytest.raises(FileNotFoundError):
+            missing.result(timeout=10)
+
+        # Invalid files raise the ValueError of track_many
+        invalid_file = buffered.track(Path("./tests/test_files/ducks.txt"), "s3://padre/ducks.txt", "padre")
+        assert buffered.flush(timeout=10)
+        with pytest.raises(ValueError, match="File is not valid"):
+            invalid_file.result()
+
+        futures += [
+            buffered.track(tmp_path / filename, f"s3://padre/{filename}", "padre", {"processing_status": "FAILED"})
+            for filename in filenames[3:]
+        ]
+        assert buffered.flush(timeout=10)
+        assert all(future.done() for future in futures)
+
+        # Reads go to the wrapped tracker
+        assert len(buffered.get_failed_files()) == 6
+
+        status_ids = [buffered.add_to_status_table(i, "SUCCESS") for i in (1, 2)]
+        invalid = buffered.add_to_status_table(3, "SUCCESS", origin_file_ids="1")
+
+    # Leaving the with block flushes, only the invalid status fails
+    assert [future.result() for future in status_ids] == [1, 2]
+    with pytest.raises(ValueError):
+        invalid.result()
+
+    with pytest.raises(RuntimeError):
+        buffered.track(tmp_path / filenames[0], f"s3://padre/{filenames[0]}", "padre")
+
+    with tracker.session() as session:
+        assert session.scalar(select(func.count()).select_from(ScienceFileTable)) == 6
+        assert (
+            session.scalar(
+                select(func.count()).select_from(StatusTable).where(StatusTable.processing_status == "FAILED")
+            )
+            == 4
+        )
+
+
+def test_buffered_tracker_bulk_statuses(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    create_tables(engine=engine)
+    tracker = MetaTracker(engine, util.parse_science_filename)
+
+    filenames = [f"padreMDA0_2504031859{10 + i}.dat" for i in range(4)]
+    for filename in filenames:
+        (tmp_path / filename).write_text("Test")
+    tracker.track_many([(tmp_path / filename, f"s3://padre/{filename}", "padre", None) for filename in filenames])
+    tracker.add_to_status_table(tracker.session, 1, "FAILED")
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    with BufferedMetaTracker(tracker, flush_interval=60) as buffered:
+        futures = [
+            buffered.add_to_status_table(1, "SUCCESS", origin_file_ids=[2]),
+            buffered.add_to_status_table(2, "SUCCESS", origin_file_ids=[3, 99]),
+            buffered.add_to_status_table(3, "FAILED"),
+            # A second status for the same file is applied after the first one
+            buffered.add_to_status_table(2, "FAILED", "Retried", origin_file_ids=[4]),
+        ]
+        assert buffered.flush(timeout=10)
+
+    assert [future.result() for future in futures] == [1, 2, 3, 2]
+
+    # One upsert per occurrence of a file, not one per status
+    status_writes = [statement for statement in statements if statement.startswith("INSERT INTO padre_status ")]
+    assert len(status_writes) == 2
+    assert sum(statement.startswith("INSERT INTO padre_status_origin") for statement in statements) == 1
+
+    with tracker.session() as session:
+        statuses = session.execute(
+            select(
+                StatusTable.status_id,
+                StatusTable.processing_status,
+                StatusTable.processing_status_message,
+                StatusTable.reprocessed_count,
+            ).order_by(StatusTable.status_id)
+        ).all()
+        assert statuses == [(1, "SUCCESS", None, 1), (2, "FAILED", "Retried", 1), (3, "FAILED", None, 0)]
+
+        associations = session.execute(
+            select(status_origin_association.c.status_id, status_origin_association.c.origin_file_id).order_by(
+                status_origin_association.c.status_id, status_origin_association.c.origin_file_id
+            )
+        ).all()
+        assert associations == [(1, 2), (2, 3), (2, 4)]
+
+
+def test_buffered_tracker_survives_errors(tmp_path, monkeypatch) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    create_tables(engine=engine)
+    tracker = MetaTracker(engine, util.parse_science_filename)
+
+    filename = "padreMDA0_250403185910.dat"
+    (tmp_path / filename).write_text("Test")
+
+    with BufferedMetaTracker(tracker, flush_interval=60) as buffered:
+
+        def fail(statuses: list) -> None:
+            raise RuntimeError("Lost the database")
+
+        monkeypatch.setattr(buffered, "write_statuses", fail)
+        track = buffered.track(tmp_path / filename, f"s3://padre/{filename}", "padre")
+        status = buffered.add_to_status_table(1, "SUCCESS")
+        assert buffered.flush(timeout=10)
+
+        # The files were written, the statuses of the batch get the error
+        assert track.result() == (1, 1)
+        with pytest.raises(RuntimeError, match="Lost the database"):
+            status.result()
+
+        # The background thread is still serving the queues
+        monkeypatch.undo()
+        status = buffered.add_to_status_table(1, "SUCCESS")
+        assert buffered.flush(timeout=10)
+        assert status.result() == 1
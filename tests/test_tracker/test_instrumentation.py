@@ -0,0 +1,98 @@
+import json
+import os
+from types import SimpleNamespace
+
+# Set SWXSOC_MISSION environment variable
+os.environ["SWXSOC_MISSION"] = "padre"
+
+from swxsoc.util import util
+
+from metatracker.database import create_engine
+from metatracker.database.tables import create_tables
+from metatracker.tracker import tracker
+
+
+def test_instrumentation(tmp_path) -> None:
+    engine = create_engine("sqlite://")
+
+    create_tables(engine=engine)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename, instrument=True)
+    instrumentation = test_tracker.instrumentation
+
+    assert instrumentation is not None
+    assert instrumentation.last_call is None
+
+    file_path = tmp_path / "padreMDA0_250403185914.dat"
+    file_path.write_text("Test")
+
+    test_tracker.track(
+        file=file_path,
+        s3_key="s3://padre/padreMDA0_250403185914.dat",
+        s3_bucket="padre",
+        status={"processing_status": "SUCCESS"},
+    )
+
+    # Per call stats, broken down by stage
+    last_call = instrumentation.last_call
+    assert last_call.name == "track"
+    assert last_call.statements > 0
+    assert last_call.seconds > 0
+    for stage in ["parse_file", "parse_science_product", "write_tracked_file", "write_status"]:
+        assert last_call.stages[stage].calls == 1
+    assert "describe_file" in last_call.stages
+    assert last_call.stages["parse_science_file_data"].calls == 2
+    assert last_call.stages["write_tracked_file"].statements <= last_call.statements
+
+    # Cumulative counters
+    test_tracker.track(file=file_path, s3_key="s3://padre/padreMDA0_250403185914.dat", s3_bucket="padre")
+
+    counters = json.loads(instrumentation.to_json())
+    assert counters["calls"]["track"]["calls"] == 2
+    assert counters["stages"]["write_science_file"]["calls"] == 2
+    assert counters["statements"] >= counters["calls"]["track"]["statements"]
+
+    # Retries by db_retry are reported to the tracker's instrumentation
+    tracker.record_retry(SimpleNamespace(args=(test_tracker,), fn=SimpleNamespace(__name__="write_tracked_file")))
+    assert instrumentation.to_dict()["stages"]["write_tracked_file"]["retries"] == 1
+
+    # Prometheus text file
+    prometheus_path = tmp_path / "metatracker.prom"
+    instrumentation.write_prometheus(prometheus_path)
+    prometheus_text = prometheus_path.read_text()
+    assert "# TYPE metatracker_sql_statements_total counter" in prometheus_text
+    assert 'metatracker_call_calls_total{call="track"} 2' in prometheus_text
+    assert 'metatracker_stage_retries_total{stage="write_tracked_file"} 1' in prometheus_text
+
+    # Disabling restores the plain methods
+    test_tracker.disable_instrumentation()
+    assert test_tracker.instrumentation is None
+    assert "track" not in vars(test_tracker)
+    test_tracker.track(file=file_path, s3_key="s3://padre/padreMDA0_250403185914.dat", s3_bucket="padre")
+
+
+def test_instrumentation_track_concurrent(tmp_path) -> None:
+    # Worker threads need to share the database, which an in-memory SQLite database can't do
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+
+    create_tables(engine=engine)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename, instrument=True)
+    test_tracker.reference_data_cache.ensure_loaded()
+
+    items = []
+    for i in range(4):
+        file_path = tmp_path / f"padreMDA0_2504031859{10 + i}.dat"
+        file_path.write_text("Test")
+        items.append((file_path, f"s3://padre/{file_path.name}", "padre", {"processing_status": "SUCCESS"}))
+
+    results = test_tracker.track_concurrent(items, workers=2)
+    assert all(result["error"] is None for result in results)
+
+    # Parsing and writing run on pool threads, their stats still belong to the call
+    last_call = test_tracker.instrumentation.last_call
+    assert last_call.name == "track_concurrent"
+    assert last_call.statements > 0
+    assert last_call.stages["parse_file"].calls == 4
+    assert last_call.stages["add_batch_to_tables"].statements > 0
+    assert last_call.stages["add_batch_to_tables"].statements <= last_call.statements
@@ -1,18 +1,24 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
+from types import SimpleNamespace
 
 # Set SWXSOC_MISSION environment variable
 os.environ["SWXSOC_MISSION"] = "padre"
 
+import pytest
+from sqlalchemy import event, select
 from swxsoc.util import util
 
 from metatracker import log
 from metatracker.database import create_engine, create_session
-from metatracker.database.tables import create_tables
+from metatracker.database.tables import create_tables, get_mission_tables, populate_file_level_table, register_mission
+from metatracker.database.tables.file_level_table import FileLevelTable
+from metatracker.database.tables.file_type_table import FileTypeTable
 from metatracker.database.tables.science_file_table import ScienceFileTable
 from metatracker.database.tables.science_product_table import ScienceProductTable
-from metatracker.database.tables.status_table import StatusTable
+from metatracker.database.tables.status_table import StatusTable, science_file_lineage
 from metatracker.tracker import tracker
 
 TEST_DB_HOST = "sqlite://"
@@ -471,6 +477,11 @@ def test_track() -> None:
     # Test duplicate file tracking (should not raise error but update timestamp)
     test_tracker.track(file=Path(TEST_SCIENCE_FILENAME), s3_key=s3_key, s3_bucket=s3_bucket)
 
+    # Tracking the same file again reuses its science file and science product
+    with session.begin() as sql_session:
+        assert sql_session.query(ScienceFileTable).count() == 1
+        assert sql_session.query(ScienceProductTable).count() == 1
+
     # Test bad file type
     try:
         test_tracker.track(file=Path(TEST_RANDOM_FILENAME), s3_key=s3_key, s3_bucket=s3_bucket)
@@ -567,3 +578,835 @@ def test_add_to_status_table_with_origin_files():
         assert len(status_entry.origin_files) == 2
         actual_origin_ids = {f.science_file_id for f in status_entry.origin_files}
         assert set(origin_file_ids) == actual_origin_ids
+
+    # Extending the origin files only adds the missing links, unknown ids are ignored
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    test_tracker.add_origin_files(session, status_id, [origin_file_ids[1], science_file_id, 12345])
+
+    # Nothing is loaded to deduplicate the links
+    assert not any(statement.lstrip().startswith("SELECT") for statement in statements)
+
+    with session.begin() as sql_session:
+        status_entry = sql_session.get(StatusTable, status_id)
+        assert {f.science_file_id for f in status_entry.origin_files} == {*origin_file_ids, science_file_id}
+
+    # Status queries don't join through the origin files
+    statements.clear()
+    with session.begin() as sql_session:
+        sql_session.query(StatusTable).filter(StatusTable.status_id == status_id).one()
+    assert "status_origin_association" not in statements[0]
+
+
+def test_reference_data_cache() -> None:
+    """
+    Test reference data cache refresh, TTL and invalidation
+    """
+    engine = create_engine(TEST_DB_HOST)
+    session = create_session(engine)
+    create_tables(engine=engine)
+
+    science_file_parser = util.parse_science_filename
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=science_file_parser)
+
+    # Cache is loaded lazily and serves validation from memory
+    assert test_tracker.reference_data_cache.is_stale()
+    assert test_tracker.is_valid_file_type(extension=".dat")
+    assert test_tracker.is_valid_file_level(file_level="l1")
+    assert test_tracker.is_valid_instrument(instrument_short_name="meddea")
+    assert test_tracker.get_file_type(extension=".dat") == "dat"
+    assert not test_tracker.reference_data_cache.is_stale()
+
+    # New rows are not visible until the cache is refreshed
+    with session.begin() as sql_session:
+        sql_session.add(FileTypeTable(short_name="txt", full_name="Text", description="Text File", extension=".txt"))
+    assert not test_tracker.is_valid_file_type(extension=".txt")
+
+    test_tracker.refresh_reference_data()
+    assert test_tracker.is_valid_file_type(extension=".txt")
+
+    # Populating reference tables invalidates the cache
+    populate_file_level_table(
+        session, [{"short_name": "l5", "full_name": "Level 5", "description": "Level 5 File"}], FileLevelTable
+    )
+    assert test_tracker.reference_data_cache.is_stale()
+    assert test_tracker.is_valid_file_level(file_level="l5")
+
+    # Cache expires once the TTL has elapsed
+    ttl_tracker = tracker.MetaTracker(engine=engine, science_file_parser=science_file_parser, reference_data_ttl=60)
+    ttl_tracker.reference_data_cache.ensure_loaded()
+    assert not ttl_tracker.reference_data_cache.is_stale()
+    ttl_tracker.reference_data_cache.loaded_at -= 61
+    assert ttl_tracker.reference_data_cache.is_stale()
+
+
+def test_get_configuration_index() -> None:
+    engine = create_engine(TEST_DB_HOST)
+
+    session = create_session(engine)
+
+    create_tables(engine=engine)
+
+    instrument_configurations = tracker.MetaTracker.get_instrument_configurations(session=session)
+
+    assert instrument_configurations[3] == ["meddea", "sharp"]
+
+    configuration_index = tracker.MetaTracker.get_configuration_index(instrument_configurations)
+
+    assert configuration_index[frozenset(["meddea"])] == 1
+    assert configuration_index[frozenset(["sharp"])] == 2
+    assert configuration_index[frozenset(["sharp", "meddea"])] == 3
+
+
+def test_track_many(tmp_path) -> None:
+    engine = create_engine(TEST_DB_HOST)
+
+    session = create_session(engine)
+
+    create_tables(engine=engine)
+
+    # Science File Parser
+    science_file_parser = util.parse_science_filename
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=science_file_parser)
+
+    filenames = [
+        "padreMDA0_250403185914.dat",
+        "padreMDA1_250403185914.dat",
+        "padreSP11_250403185914.dat",
+        "padreMDA0_250403185915.dat",
+    ]
+    for filename in filenames:
+        (tmp_path / filename).write_text("Test")
+
+    test_status = {"processing_status": "SUCCESS", "processing_status_message": "Batch", "origin_file_ids": []}
+    items = [(tmp_path / filename, f"s3://padre/{filename}", "padre", test_status) for filename in filenames]
+
+    # Add a missing file and an invalid file in the middle of the batch
+    items.insert(1, (Path(TEST_NON_EXISTING_SCIENCE_FILENAME), "s3://padre/missing", "padre", None))
+    items.insert(2, (Path(TEST_RANDOM_FILENAME), "s3://padre/ducks.txt", "padre", None))
+
+    results = test_tracker.track_many(items, chunk_size=2)
+
+    assert len(results) == len(items)
+    assert isinstance(results[1]["error"], FileNotFoundError)
+    assert isinstance(results[2]["error"], ValueError)
+
+    tracked = [results[0], *results[3:]]
+    assert all(result["error"] is None for result in tracked)
+    assert len({result["science_file_id"] for result in tracked}) == 4
+
+    # Both meddea files at the same time share a science product
+    assert tracked[0]["science_product_id"] == tracked[1]["science_product_id"]
+    assert len({result["science_product_id"] for result in tracked}) == 3
+
+    with session.begin() as sql_session:
+        assert sql_session.query(ScienceFileTable).count() == 4
+        assert sql_session.query(ScienceProductTable).count() == 3
+        assert sql_session.query(StatusTable).count() == 4
+
+    # Tracking the same files again reuses the existing rows and updates the statuses
+    results = test_tracker.track_many(items[3:])
+
+    assert [result["science_file_id"] for result in results] == [result["science_file_id"] for result in tracked[1:]]
+
+    with session.begin() as sql_session:
+        assert sql_session.query(ScienceFileTable).count() == 4
+        assert sql_session.query(ScienceProductTable).count() == 3
+        assert {status.reprocessed_count for status in sql_session.query(StatusTable)} == {0, 1}
+
+    # A status without a processing status fails its insert, the rest of its chunk is still tracked
+    filenames = ["padreMDA0_250403185916.dat", "padreMDA0_250403185917.dat", "padreMDA0_250403185918.dat"]
+    for filename in filenames:
+        (tmp_path / filename).write_text("Test")
+    statuses = [test_status, {"processing_status": None}, test_status]
+    items = [
+        (tmp_path / filename, f"s3://padre/{filename}", "padre", status)
+        for filename, status in zip(filenames, statuses)
+    ]
+
+    results = test_tracker.track_many(items)
+
+    assert results[0]["error"] is None
+    assert results[1]["error"] is not None
+    assert results[1]["science_file_id"] is None
+    assert results[2]["error"] is None
+
+    with session.begin() as sql_session:
+        assert sql_session.query(ScienceFileTable).count() == 6
+        assert sql_session.query(StatusTable).count() == 6
+
+
+def test_track_parses_file_once(tmp_path) -> None:
+    engine = create_engine(TEST_DB_HOST)
+
+    create_tables(engine=engine)
+
+    parsed_files = []
+
+    def science_file_parser(file: Path) -> dict:
+        parsed_files.append(file)
+        return util.parse_science_filename(file)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=science_file_parser)
+
+    file_path = tmp_path / "padreMDA0_250403185914.dat"
+    file_path.write_text("Test")
+
+    descriptor = test_tracker.describe_file(file_path)
+
+    assert descriptor.exists
+    assert descriptor.extension == ".dat"
+    assert descriptor.filename == "padreMDA0_250403185914"
+    assert descriptor.file_size == 4
+    assert not test_tracker.describe_file(Path(TEST_NON_EXISTING_SCIENCE_FILENAME)).exists
+
+    test_tracker.track(file=file_path, s3_key="s3://padre/padreMDA0_250403185914.dat", s3_bucket="padre")
+
+    assert parsed_files == [file_path]
+
+    # Parsing the same unchanged file again is served from the parser cache
+    test_tracker.track(file=file_path, s3_key="s3://padre/padreMDA0_250403185914.dat", s3_bucket="padre")
+
+    assert parsed_files == [file_path]
+
+
+def test_iter_failed_files(tmp_path) -> None:
+    engine = create_engine(TEST_DB_HOST)
+
+    session = create_session(engine)
+
+    create_tables(engine=engine)
+
+    # Science File Parser
+    science_file_parser = util.parse_science_filename
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=science_file_parser)
+
+    filenames = [
+        "padreMDA0_250403185914.dat",
+        "padreMDA0_250403185915.dat",
+        "padreSP11_250403185914.dat",
+        "padreSP11_250403185915.dat",
+        "padreMDA0_250403185916.dat",
+    ]
+    items = []
+    for i, filename in enumerate(filenames):
+        (tmp_path / filename).write_text("Test")
+        status = {"processing_status": "SUCCESS" if i == 1 else "FAILED"}
+        items.append((tmp_path / filename, f"s3://padre/{filename}", "padre", status))
+
+    test_tracker.track_many(items)
+
+    failed_files = test_tracker.get_failed_files()
+
+    assert len(failed_files) == 4
+    assert ("s3://padre/padreMDA0_250403185915.dat", "padre") not in failed_files
+
+    # Pages smaller than the amount of failed files are stitched together in status_id order
+    failed_rows = list(test_tracker.iter_failed_files(batch_size=3))
+    assert [(row.s3_key, row.s3_bucket) for row in failed_rows] == failed_files
+    assert [row.status_id for row in failed_rows] == sorted(row.status_id for row in failed_rows)
+
+    # Resume after a status id
+    resumed_rows = list(test_tracker.iter_failed_files(batch_size=2, after_status_id=failed_rows[1].status_id))
+    assert resumed_rows == failed_rows[2:]
+
+    sharp_rows = list(test_tracker.iter_failed_files(instrument="sharp"))
+    assert [row.s3_key for row in sharp_rows] == [
+        "s3://padre/padreSP11_250403185914.dat",
+        "s3://padre/padreSP11_250403185915.dat",
+    ]
+
+    # Only files last processed after a given time
+    with session.begin() as sql_session:
+        last_processing_timestamp = sql_session.query(StatusTable.last_processing_timestamp).first()[0]
+
+    assert len(list(test_tracker.iter_failed_files(since=last_processing_timestamp))) == 4
+    assert list(test_tracker.iter_failed_files(since=datetime(3000, 1, 1))) == []
+
+
+def test_tracker_reuses_session_factory(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+
+    create_tables(engine=engine)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename)
+
+    session = test_tracker.session
+
+    file_path = tmp_path / "padreMDA0_250403185914.dat"
+    file_path.write_text("Test")
+    test_tracker.track(file=file_path, s3_key="s3://padre/padreMDA0_250403185914.dat", s3_bucket="padre")
+    test_tracker.get_failed_files()
+
+    assert test_tracker.session is session
+
+    # No connection is left checked out of the pool
+    test_tracker.close()
+    assert engine.pool.checkedout() == 0
+
+
+def test_track_single_transaction(tmp_path) -> None:
+    engine = create_engine(TEST_DB_HOST)
+
+    session = create_session(engine)
+
+    create_tables(engine=engine)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename)
+
+    # Load the reference data up front so only the writes are counted
+    test_tracker.reference_data_cache.ensure_loaded()
+
+    commits = []
+    event.listen(engine, "commit", lambda *args: commits.append(args))
+
+    file_path = tmp_path / "padreMDA0_250403185914.dat"
+    file_path.write_text("Test")
+
+    test_tracker.track(
+        file=file_path,
+        s3_key="s3://padre/padreMDA0_250403185914.dat",
+        s3_bucket="padre",
+        status={"processing_status": "SUCCESS"},
+    )
+
+    assert len(commits) == 1
+
+    # A failure part way through leaves no orphan science product or file behind
+    other_file_path = tmp_path / "padreMDA0_250403185915.dat"
+    other_file_path.write_text("Test")
+
+    try:
+        test_tracker.track(
+            file=other_file_path,
+            s3_key="s3://padre/padreMDA0_250403185915.dat",
+            s3_bucket="padre",
+            status={"processing_status": "FAILED", "origin_file_ids": "not a list"},
+        )
+    except ValueError as e:
+        assert e is not None
+
+    with session.begin() as sql_session:
+        assert sql_session.query(ScienceFileTable).count() == 1
+        assert sql_session.query(ScienceProductTable).count() == 1
+        assert sql_session.query(StatusTable).count() == 1
+
+
+def test_track_science_product_without_mode(tmp_path) -> None:
+    engine = create_engine(TEST_DB_HOST)
+
+    create_tables(engine=engine)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename)
+    test_tracker.reference_data_cache.ensure_loaded()
+
+    # The parser gives padre raw files no mode
+    file_paths = [tmp_path / "padreMDA0_250403185914.dat", tmp_path / "padreMDA1_250403185914.dat"]
+    for file_path in file_paths:
+        file_path.write_text("Test")
+    assert util.parse_science_filename(file_paths[0].name)["mode"] is None
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    science_product_ids = {
+        test_tracker.track(file=file_path, s3_key=f"s3://padre/{file_path.name}", s3_bucket="padre")[1]
+        for file_path in file_paths
+    }
+
+    # Both files share one science product, upserted without the SELECT and savepoint fallback
+    assert len(science_product_ids) == 1
+    product_inserts = [statement for statement in statements if "INSERT INTO padre_science_product" in statement]
+    assert product_inserts and all("ON CONFLICT" in statement for statement in product_inserts)
+    assert not any(statement.startswith("SAVEPOINT") for statement in statements)
+
+
+def test_track_concurrent(tmp_path) -> None:
+    # Worker threads need to share the database, which an in-memory SQLite database can't do
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+
+    session = create_session(engine)
+
+    create_tables(engine=engine)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename)
+
+    filenames = [f"padreMDA{i % 2}_2504031859{10 + i // 2}.dat" for i in range(12)]
+    filenames.append("padreSP11_250403185910.dat")
+    for filename in filenames:
+        (tmp_path / filename).write_text("Test")
+
+    test_status = {"processing_status": "SUCCESS"}
+    items = [(tmp_path / filename, f"s3://padre/{filename}", "padre", test_status) for filename in filenames]
+    items.insert(3, (Path(TEST_NON_EXISTING_SCIENCE_FILENAME), "s3://padre/missing", "padre", None))
+
+    # The same file twice in one batch is tracked once
+    items.append(items[0])
+
+    results = test_tracker.track_concurrent(items, workers=4, writers=3, chunk_size=2)
+
+    assert len(results) == len(items)
+    assert isinstance(results[3]["error"], FileNotFoundError)
+
+    tracked = results[:3] + results[4:]
+    assert all(result["error"] is None for result in tracked)
+    assert tracked[-1] == tracked[0]
+
+    # Both meddea files at the same time share a science product
+    assert tracked[0]["science_product_id"] == tracked[1]["science_product_id"]
+    assert tracked[0]["science_product_id"] != tracked[2]["science_product_id"]
+
+    with session.begin() as sql_session:
+        assert sql_session.query(ScienceFileTable).count() == 13
+        assert sql_session.query(ScienceProductTable).count() == 7
+        assert sql_session.query(StatusTable).count() == 13
+
+    # Parsing in worker processes gives the same results
+    process_results = test_tracker.track_concurrent(items, workers=2, mode="process")
+
+    assert [result["science_file_id"] for result in process_results] == [
+        result["science_file_id"] for result in results
+    ]
+    assert isinstance(process_results[3]["error"], FileNotFoundError)
+
+    with session.begin() as sql_session:
+        assert sql_session.query(ScienceFileTable).count() == 13
+        assert sql_session.query(ScienceProductTable).count() == 7
+
+
+def test_validate_many(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    create_tables(engine=engine)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename)
+
+    filenames = [
+        "padreMDA0_250403185910.dat",
+        "padreSP11_250403185910.dat",
+        "padreMDA0_250403185910.txt",
+        "ducks.dat",
+        "padre_meddea_l1_20250403T185910_v0.1.0.fits",
+    ]
+    for filename in filenames:
+        (tmp_path / filename).write_text("Test")
+    paths = [tmp_path / filename for filename in filenames] + [tmp_path / "padreMDA0_250403185911.dat"]
+
+    verdicts = test_tracker.validate_many(paths, workers=2)
+
+    assert [verdict["file"] for verdict in verdicts] == paths
+    assert [verdict["valid"] for verdict in verdicts] == [True, True, False, False, True, False]
+    assert verdicts[0]["reason"] is None
+    assert verdicts[2]["reason"] == "File type is not valid: '.txt'"
+    assert verdicts[3]["reason"].startswith("File could not be parsed")
+    assert verdicts[5]["reason"] == "File does not exist"
+
+    # Nothing was written
+    with test_tracker.session.begin() as sql_session:
+        assert sql_session.query(ScienceFileTable).count() == 0
+
+    assert test_tracker.validate_many(paths, workers=2, mode="process") == verdicts
+
+    # Tracking runs the same checks, the files that can't be parsed or don't exist aside
+    for path, verdict in zip(paths[:3] + paths[4:5], verdicts[:3] + verdicts[4:5]):
+        parsed_file = test_tracker.parse_file(None, path, f"s3://padre/{path.name}", "padre")
+        assert bool(parsed_file and test_tracker.parse_science_product(None, path)) == verdict["valid"]
+
+    # Without a database, against a configuration with raw meddea files only
+    configuration = {
+        "mission_name": "padre",
+        "instruments": [
+            {"instrument_id": 1, "description": "MeDDEA", "full_name": "MeDDEA", "short_name": "meddea"},
+            {"instrument_id": 2, "description": "SHARP", "full_name": "SHARP", "short_name": "sharp"},
+        ],
+        "instrument_configurations": [
+            {"instrument_configuration_id": 1, "instrument_1_id": 1, "instrument_2_id": None},
+        ],
+        "file_levels": [{"description": "RAW File", "full_name": "RAW", "short_name": "raw"}],
+    }
+    offline_tracker = tracker.MetaTracker(None, util.parse_science_filename, mission=configuration)
+
+    verdicts = offline_tracker.validate_many(paths, check_exists=False)
+
+    assert [verdict["valid"] for verdict in verdicts] == [True, False, False, False, False, True]
+    assert verdicts[1]["reason"] == "Instrument configuration is not valid: 'sharp'"
+    assert verdicts[4]["reason"] == "File level is not valid: 'l1'"
+
+
+def test_query_products_and_files(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    create_tables(engine=engine)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename)
+
+    filenames = [f"padreMDA0_2504031859{10 + i}.dat" for i in range(5)] + [
+        f"padreSP11_2504031859{10 + i}.dat" for i in range(5)
+    ]
+    filenames.append("padre_meddea_l1_20250403T185910_v0.1.0.fits")
+    for filename in filenames:
+        (tmp_path / filename).write_text("Test")
+
+    results = test_tracker.track_many(
+        [(tmp_path / filename, f"s3://padre/{filename}", "padre", None) for filename in filenames]
+    )
+    assert all(result["error"] is None for result in results)
+
+    start = datetime(2025, 4, 3, 18, 59, 10)
+    end = datetime(2025, 4, 3, 18, 59, 13)
+
+    products = list(test_tracker.query_products(start, end, batch_size=2))
+    assert len(products) == 6
+    assert [product.reference_timestamp for product in products] == sorted(
+        product.reference_timestamp for product in products
+    )
+    assert products[0] == (1, 1, "", start)
+
+    meddea = list(test_tracker.query_products(start, end, instrument="meddea"))
+    assert [product.science_product_id for product in meddea] == [1, 2, 3]
+    assert list(test_tracker.query_products(start, end, level="l1")) == meddea[:1]
+    assert list(test_tracker.query_products(start, end, mode="unknown")) == []
+
+    # Resume after the second product
+    key = (products[1].reference_timestamp, products[1].science_product_id)
+    assert list(test_tracker.query_products(start, end, after=key)) == products[2:]
+
+    files = list(test_tracker.query_files(start, end, instrument="meddea", batch_size=1))
+    assert [file.filename for file in files] == [
+        "padreMDA0_250403185910",
+        "padre_meddea_l1_20250403T185910_v0.1.0",
+        "padreMDA0_250403185911",
+        "padreMDA0_250403185912",
+    ]
+    assert files[1].file_level == "l1"
+    assert files[1].s3_key.endswith(".fits")
+
+    files = list(test_tracker.query_files(start, end, level="l1"))
+    assert [file.science_file_id for file in files] == [11]
+
+
+def test_sync_directory(tmp_path) -> None:
+    engine = create_engine(TEST_DB_HOST)
+
+    session = create_session(engine)
+
+    create_tables(engine=engine)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename)
+
+    (tmp_path / "l0").mkdir()
+    for filename in ["padreMDA0_250403185914.dat", "padreMDA0_250403185915.dat", "l0/padreSP11_250403185914.dat"]:
+        (tmp_path / filename).write_text("Test")
+
+    summary = test_tracker.sync_directory(tmp_path, s3_bucket="padre", s3_prefix="raw/")
+
+    assert summary["scanned"] == 3
+    assert summary["unchanged"] == 0
+    assert all(result["error"] is None for result in summary["results"])
+
+    with session.begin() as sql_session:
+        science_file = sql_session.query(ScienceFileTable).filter_by(filename="padreSP11_250403185914").one()
+        assert science_file.s3_key == "raw/l0/padreSP11_250403185914.dat"
+        assert science_file.s3_bucket == "padre"
+
+    # A second run skips everything
+    summary = test_tracker.sync_directory(tmp_path, s3_bucket="padre", s3_prefix="raw/")
+
+    assert summary["scanned"] == 3
+    assert summary["unchanged"] == 3
+    assert summary["results"] == []
+
+    # New and changed files are tracked, changed files get their size updated
+    (tmp_path / "padreMDA0_250403185914.dat").write_text("Test, but longer")
+    (tmp_path / "padreMDA0_250403185916.dat").write_text("Test")
+
+    summary = test_tracker.sync_directory(tmp_path, s3_bucket="padre", s3_prefix="raw/", recursive=False)
+
+    assert summary["scanned"] == 3
+    assert summary["unchanged"] == 1
+    assert {result["file"].name for result in summary["results"]} == {
+        "padreMDA0_250403185914.dat",
+        "padreMDA0_250403185916.dat",
+    }
+
+    with session.begin() as sql_session:
+        assert sql_session.query(ScienceFileTable).count() == 4
+        science_file = sql_session.query(ScienceFileTable).filter_by(filename="padreMDA0_250403185914").one()
+        assert science_file.file_size == len("Test, but longer")
+
+    assert test_tracker.sync_directory(tmp_path, s3_bucket="padre")["unchanged"] == 4
+
+
+def test_sync_manifest(tmp_path) -> None:
+    engine = create_engine(TEST_DB_HOST)
+
+    session = create_session(engine)
+
+    create_tables(engine=engine)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename)
+
+    # S3 Inventory style CSV: bucket, URL-encoded key, size, last modified date, extra columns
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(
+        "padre,l0%2FpadreMDA0_250403185914.dat,4,2025-04-03T19:00:00.000Z,etag\n"
+        "padre,l0%2FpadreSP11_250403185914.dat,4,2025-04-03T19:00:00.000Z,etag\n"
+        "padre,ducks.txt,4,2025-04-03T19:00:00.000Z,etag\n"
+    )
+
+    summary = test_tracker.sync_manifest(manifest)
+
+    assert summary["scanned"] == 3
+    assert [result["error"] is None for result in summary["results"]] == [True, True, False]
+
+    with session.begin() as sql_session:
+        science_file = sql_session.query(ScienceFileTable).filter_by(filename="padreMDA0_250403185914").one()
+        assert science_file.s3_key == "l0/padreMDA0_250403185914.dat"
+        assert science_file.file_path == "l0/padreMDA0_250403185914.dat"
+
+    # Rows can also be passed directly, only the changed object is tracked again
+    summary = test_tracker.sync_manifest(
+        [
+            ("padre", "l0/padreMDA0_250403185914.dat", 4, "2025-04-03T19:00:00+00:00"),
+            ("padre", "l0/padreSP11_250403185914.dat", 8, "2025-04-04T19:00:00+00:00"),
+        ]
+    )
+
+    assert summary["unchanged"] == 1
+    assert [result["file"].name for result in summary["results"]] == ["padreSP11_250403185914.dat"]
+
+    with session.begin() as sql_session:
+        science_file = sql_session.query(ScienceFileTable).filter_by(filename="padreSP11_250403185914").one()
+        assert science_file.file_size == 8
+
+
+def test_lineage(tmp_path) -> None:
+    engine = create_engine(TEST_DB_HOST)
+
+    create_tables(engine=engine)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename)
+    closure_tracker = tracker.MetaTracker(
+        engine=engine, science_file_parser=util.parse_science_filename, lineage_closure=True
+    )
+
+    file_ids = {}
+    for name, seconds in zip("abcde", range(10, 15)):
+        file_path = tmp_path / f"padreMDA0_2504031859{seconds}.dat"
+        file_path.write_text("Test")
+        file_ids[name], _ = test_tracker.track(file_path, s3_key=f"s3://padre/{file_path.name}", s3_bucket="padre")
+
+    # a -> b -> c -> d and a -> d, e is unrelated. The closure table is only maintained for
+    # the links made by closure_tracker, the others are picked up by rebuilding it.
+    test_tracker.add_to_status_table(test_tracker.session, file_ids["b"], "SUCCESS", origin_file_ids=[file_ids["a"]])
+    closure_tracker.add_to_status_table(
+        closure_tracker.session, file_ids["d"], "SUCCESS", origin_file_ids=[file_ids["c"], file_ids["a"]]
+    )
+    closure_tracker.rebuild_lineage_closure()
+    closure_tracker.add_to_status_table(
+        closure_tracker.session, file_ids["c"], "SUCCESS", origin_file_ids=[file_ids["b"]]
+    )
+
+    for lineage_tracker in (test_tracker, closure_tracker):
+        descendants = lineage_tracker.get_descendants(file_ids["a"])
+        assert [(row.science_file_id, row.depth) for row in descendants] == [
+            (file_ids["b"], 1),
+            (file_ids["d"], 1),
+            (file_ids["c"], 2),
+        ]
+        assert descendants[0].s3_key == "s3://padre/padreMDA0_250403185911.dat"
+
+        assert [row.science_file_id for row in lineage_tracker.get_descendants(file_ids["a"], max_depth=1)] == [
+            file_ids["b"],
+            file_ids["d"],
+        ]
+
+        ancestors = lineage_tracker.get_ancestors(file_ids["d"])
+        assert [(row.science_file_id, row.depth) for row in ancestors] == [
+            (file_ids["a"], 1),
+            (file_ids["c"], 1),
+            (file_ids["b"], 2),
+        ]
+
+        assert lineage_tracker.get_ancestors(file_ids["a"]) == []
+        assert lineage_tracker.get_descendants(file_ids["e"]) == []
+
+    # Rebuilding gives the same closure as maintaining it incrementally
+    with closure_tracker.session.begin() as sql_session:
+        maintained = set(sql_session.execute(select(science_file_lineage)).all())
+    closure_tracker.rebuild_lineage_closure()
+    with closure_tracker.session.begin() as sql_session:
+        assert set(sql_session.execute(select(science_file_lineage)).all()) == maintained
+
+
+def test_track_many_lineage_closure(tmp_path) -> None:
+    engine = create_engine(TEST_DB_HOST)
+
+    create_tables(engine=engine)
+
+    closure_tracker = tracker.MetaTracker(
+        engine=engine, science_file_parser=util.parse_science_filename, lineage_closure=True
+    )
+
+    items = []
+    for seconds in range(10, 13):
+        file_path = tmp_path / f"padreMDA0_2504031859{seconds}.dat"
+        file_path.write_text("Test")
+        items.append((file_path, f"s3://padre/{file_path.name}", "padre", None))
+    closure_tracker.track_many(items[:2])
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    results = closure_tracker.track_many([(*items[2][:3], {"processing_status": "SUCCESS", "origin_file_ids": [1, 2]})])
+
+    # The ids of the new statuses are read once for the associations and the closure
+    status_id_reads = [
+        statement
+        for statement in statements
+        if statement.startswith("SELECT")
+        and "padre_status.status_id" in statement
+        and "FROM padre_status \n" in statement
+    ]
+    assert len(status_id_reads) == 1
+    assert [row.science_file_id for row in closure_tracker.get_ancestors(results[0]["science_file_id"])] == [1, 2]
+
+
+def test_reprocessing_queue(tmp_path) -> None:
+    # Workers in several threads need to share the database
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+
+    create_tables(engine=engine)
+
+    test_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename)
+
+    items = []
+    for seconds in range(10, 30):
+        file_path = tmp_path / f"padreMDA0_2504031859{seconds}.dat"
+        file_path.write_text("Test")
+        items.append((file_path, f"s3://padre/{file_path.name}", "padre", {"processing_status": "FAILED"}))
+    test_tracker.track_many(items)
+
+    # A claim leases the oldest failed statuses
+    claimed = test_tracker.claim_failed(batch_size=3)
+    assert [row.status_id for row in claimed] == [1, 2, 3]
+    assert claimed[0].s3_key == "s3://padre/padreMDA0_250403185910.dat"
+    assert len({row.lease_token for row in claimed}) == 1
+
+    # Completing needs the lease token
+    lease_token = claimed[0].lease_token
+    assert not test_tracker.complete(1, "not-the-token")
+    assert test_tracker.complete(1, lease_token)
+    assert test_tracker.release(lease_token, status_ids=[2]) == 1
+
+    # Released statuses can be claimed again, leased ones can't
+    claimed = test_tracker.claim_failed(batch_size=2)
+    assert [row.status_id for row in claimed] == [2, 4]
+
+    # Expired leases can be claimed again
+    expired = test_tracker.claim_failed(batch_size=1, lease_seconds=-1)
+    assert [row.status_id for row in expired] == [5]
+    assert [row.status_id for row in test_tracker.claim_failed(batch_size=1)] == [5]
+    assert not test_tracker.complete(5, expired[0].lease_token)
+
+    # Many workers drain the backlog without claiming a status twice
+    def drain() -> list:
+        worker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename)
+        status_ids = []
+        while True:
+            rows = worker.claim_failed(batch_size=2)
+            if not rows:
+                return status_ids
+            for row in rows:
+                assert worker.complete(row.status_id, row.lease_token)
+                status_ids.append(row.status_id)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        drained = [status_id for status_ids in executor.map(lambda _: drain(), range(4)) for status_id in status_ids]
+
+    assert sorted(drained) == list(range(6, 21))
+
+    # Statuses 2 to 5 are still leased
+    assert len(test_tracker.get_failed_files()) == 4
+
+
+def test_multiple_missions(tmp_path) -> None:
+    engine = create_engine(TEST_DB_HOST)
+
+    hermes_configuration = register_mission(
+        {
+            "mission_name": "hermes",
+            "instruments": [
+                {"instrument_id": 1, "description": "EEA", "full_name": "EEA", "short_name": "eea"},
+                {"instrument_id": 2, "description": "NEMISIS", "full_name": "NEMISIS", "short_name": "nemisis"},
+                {"instrument_id": 3, "description": "MERIT", "full_name": "MERIT", "short_name": "merit"},
+            ],
+            "instrument_configurations": [
+                {
+                    "instrument_configuration_id": 1,
+                    "instrument_1_id": 1,
+                    "instrument_2_id": None,
+                    "instrument_3_id": None,
+                },
+                {
+                    "instrument_configuration_id": 2,
+                    "instrument_1_id": 2,
+                    "instrument_2_id": None,
+                    "instrument_3_id": None,
+                },
+                {
+                    "instrument_configuration_id": 3,
+                    "instrument_1_id": 3,
+                    "instrument_2_id": None,
+                    "instrument_3_id": None,
+                },
+            ],
+        }
+    )
+
+    # Both missions share the engine, each in its own tables
+    create_tables(engine=engine)
+    create_tables(engine=engine, mission="hermes")
+
+    def hermes_parser(file: Path) -> dict:
+        return {
+            "instrument": "merit",
+            "mode": None,
+            "test": False,
+            "time": SimpleNamespace(value=datetime(2025, 4, 3, 18, 59, 14)),
+            "level": "l1",
+            "version": "1.0.0",
+            "descriptor": None,
+        }
+
+    padre_tracker = tracker.MetaTracker(engine=engine, science_file_parser=util.parse_science_filename)
+    hermes_tracker = tracker.MetaTracker(engine=engine, science_file_parser=hermes_parser, mission="hermes")
+
+    assert hermes_tracker.configuration is hermes_configuration
+    assert hermes_tracker.tables is get_mission_tables("hermes")
+    assert hermes_tracker.tables.ScienceFileTable.__tablename__ == "hermes_science_file"
+    assert "instrument_3_id" in hermes_tracker.tables.InstrumentConfigurationTable.__table__.c
+    assert padre_tracker.tables.ScienceFileTable is ScienceFileTable
+
+    padre_file = tmp_path / "padreMDA0_250403185914.dat"
+    padre_file.write_text("Test")
+    hermes_file = tmp_path / "hermes_MERIT_l1_20250403T185914_v1.0.0.cdf"
+    hermes_file.write_text("Test")
+
+    padre_file_id, _ = padre_tracker.track(padre_file, "s3://padre/padreMDA0_250403185914.dat", "padre")
+    hermes_file_id, hermes_product_id = hermes_tracker.track(hermes_file, f"s3://hermes/{hermes_file.name}", "hermes")
+
+    assert padre_file_id == hermes_file_id == 1
+    assert hermes_tracker.reference_data.configuration_index[frozenset(["merit"])] == 3
+
+    with hermes_tracker.session.begin() as sql_session:
+        hermes_files = sql_session.query(hermes_tracker.tables.ScienceFileTable).all()
+        assert [science_file.filename for science_file in hermes_files] == [hermes_file.stem]
+        hermes_product = sql_session.get(hermes_tracker.tables.ScienceProductTable, hermes_product_id)
+        assert hermes_product.instrument_configuration_id == 3
+
+    with padre_tracker.session.begin() as sql_session:
+        assert [science_file.filename for science_file in sql_session.query(ScienceFileTable)] == [padre_file.stem]
+
+    with pytest.raises(ValueError):
+        tracker.MetaTracker(engine=engine, science_file_parser=hermes_parser, mission="unknown")